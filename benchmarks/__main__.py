@@ -0,0 +1,113 @@
+import argparse
+import json
+import platform
+import sys
+
+from datetime import datetime, timezone
+from importlib import metadata
+
+from benchmarks import e2e, micro
+
+SUITES = {
+    "micro": micro.run,
+    "e2e": e2e.run,
+}
+
+PACKAGES = ("fastapi", "starlette", "pydantic", "lxml", "orjson", "aiohttp-xmlrpc")
+
+
+def package_versions() -> dict:
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # A case regresses when its median is slower than the baseline median by more than tolerance
+    regressions = []
+
+    print(f"{'case':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case, result in sorted(results.items()):
+        before = baseline.get(case, {}).get("median_s")
+        after = result.get("median_s")
+
+        if before is None or after is None:
+            print(f"{case:<40} {'-':>12} {'-':>12} {'-':>8}")
+            continue
+
+        change = after / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(case)
+            flag = "  REGRESSION"
+
+        print(f"{case:<40} {before * 1e3:>10.3f}ms {after * 1e3:>10.3f}ms {change:>+8.1%}{flag}")
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark XML-RPC parsing, serialization and dispatch through XMLRPCMiddleware"
+    )
+    # Checked after parsing, argparse refuses the empty list of a "*" positional against choices
+    parser.add_argument(
+        "suites", nargs="*", metavar="suite", default=list(SUITES),
+        help=f"suites to run, {' and '.join(SUITES)}, all by default"
+    )
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="timed repeats per case")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("-b", "--baseline", help="compare with results previously written by --output")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline, 0.1 is 10%%")
+    args = parser.parse_args(argv)
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites {', '.join(unknown)}, choose from {', '.join(SUITES)}")
+
+    results = {}
+    for suite in args.suites:
+        results |= SUITES[suite](repeat=args.repeat, selected=lambda name: args.filter in name)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "packages": package_versions(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+        return 0
+
+    for case, result in results.items():
+        if "error" in result:
+            print(f"{case:<40} error: {result['error']}")
+        else:
+            print(f"{case:<40} {result['median_s'] * 1e3:>10.3f}ms {result['ops_per_s']:>12.1f}/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import asyncio
+
+from typing import NamedTuple
+
+from starlette.types import ASGIApp, Message
+
+
+class ASGIResponse(NamedTuple):
+    status: int
+    headers: list
+    body: bytes
+
+
+class ASGIClient:
+    # Calls an ASGI application in process, without sockets or an HTTP server
+
+    def __init__(self, app: ASGIApp, chunk_size: int = 64 * 1024):
+        self.app = app
+        self.chunk_size = chunk_size
+
+    async def post(self, path: str, body: bytes, content_type: str = "text/xml") -> ASGIResponse:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+
+        chunks = [body[i:i + self.chunk_size] for i in range(0, len(body), self.chunk_size)] or [b""]
+        chunks.reverse()
+
+        # Once the body is read the client stays connected until the response is complete,
+        # streaming responses listen for the disconnect while they send
+        finished = asyncio.Event()
+
+        async def receive() -> Message:
+            if chunks:
+                chunk = chunks.pop()
+                return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        start = {}
+        body_parts = []
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                body_parts.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+
+        return ASGIResponse(start.get("status", 500), start.get("headers", []), b"".join(body_parts))
@@ -0,0 +1,101 @@
+import asyncio
+
+import orjson
+
+from fastapi import Body, FastAPI
+
+from benchmarks.asgi import ASGIClient
+from benchmarks.payloads import values, method_call
+from benchmarks.timing import measure_async
+from fastapi_xmlrpc.binary import json_default
+from fastapi_xmlrpc.errors import *
+from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+# jsonrpc calls the direct dispatch app over JSON-RPC
+MODES = ("json", "direct", "trusted", "jsonrpc")
+
+
+def create_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="bench", function_name="scalars")
+    async def scalars(value: list = Body(...)):
+        return value
+
+    @router.xml_rpc(namespace="bench", function_name="deep_struct")
+    async def deep_struct(value: dict = Body(...)):
+        return value
+
+    @router.xml_rpc(namespace="bench", function_name="wide_array")
+    async def wide_array(value: list[dict] = Body(...)):
+        return value
+
+    @router.xml_rpc(namespace="bench", function_name="base64_blob")
+    async def base64_blob(value: bytes = Body(...)):
+        return value
+
+    return router
+
+
+def create_app(mode: str) -> FastAPI:
+    router = create_router()
+
+    app = FastAPI()
+    app.add_middleware(
+        XMLRPCMiddleware, router=router, direct_dispatch=mode in ("direct", "jsonrpc"), trusted_clients=mode == "trusted"
+    )
+    app.include_router(router)
+
+    app.add_exception_handler(RequestValidationError, request_validation_error_handler)
+    app.add_exception_handler(XMLRPCError, xmlrpc_error_handler)
+    app.add_exception_handler(HTTPException, http_error_handler)
+    app.add_exception_handler(Exception, global_error_handler)
+
+    return app
+
+
+async def _run(*, repeat: int, selected) -> dict:
+    results = {}
+    calls = values()
+    xml_bodies = {name: method_call(f"bench.{name}", value) for name, value in calls.items()}
+    jsonrpc_bodies = {
+        name: orjson.dumps({"jsonrpc": "2.0", "method": f"bench.{name}", "params": [value], "id": 1}, default=json_default)
+        for name, value in calls.items()
+    }
+
+    for mode in MODES:
+        client = ASGIClient(create_app(mode))
+        bodies, content_type, success_head = (
+            (jsonrpc_bodies, "application/json-rpc", b'{"jsonrpc":"2.0","result"')
+            if mode == "jsonrpc" else (xml_bodies, "text/xml", XMLRPCHandler.SUCCESS_HEAD)
+        )
+
+        for name, body in bodies.items():
+            case = f"e2e.{mode}.{name}"
+            if not selected(case):
+                continue
+
+            path = f"/bench/{name}"
+
+            # A payload the stack can't round trip yet is reported, not timed
+            try:
+                response = await client.post(path, body, content_type)
+            except Exception as exc:
+                results[case] = {"error": f"{exc.__class__.__name__}: {str(exc)[:200]}"}
+                continue
+
+            if response.status != 200 or not response.body.startswith(success_head):
+                results[case] = {"error": f"{response.status}: {response.body[:200].decode(errors='replace')}"}
+                continue
+
+            results[case] = await measure_async(lambda: client.post(path, body, content_type), repeat=repeat)
+            results[case]["request_bytes"] = len(body)
+            results[case]["response_bytes"] = len(response.body)
+
+    return results
+
+
+def run(*, repeat: int = 5, selected=lambda name: True) -> dict:
+    return asyncio.run(_run(repeat=repeat, selected=selected))
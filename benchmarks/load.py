@@ -0,0 +1,429 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import aiohttp
+
+from benchmarks import e2e
+from benchmarks.__main__ import package_versions
+from benchmarks.payloads import values, method_call
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+# Payload name -> weight of the default mix, base64_blob is left out as it measures the network more than the server
+DEFAULT_MIX = {"scalars": 10, "deep_struct": 3, "wide_array": 1}
+
+PERCENTILES = (50, 95, 99, 99.9)
+
+OK, FAULT, ERROR = "ok", "fault", "error"
+
+
+def create_app():
+    # uvicorn --factory entry point, every worker builds the e2e benchmark application
+    return e2e.create_app(os.environ.get("BENCH_MODE", "json"))
+
+
+class Call(NamedTuple):
+    method_name: str
+    path: str
+    body: bytes
+    weight: float
+
+
+class Sample(NamedTuple):
+    method_name: str
+    latency: float
+    outcome: str
+
+
+def build_calls(mix: dict[str, float], custom: list[tuple[str, str, float]]) -> list[Call]:
+    payloads = values()
+    calls = []
+
+    for name, weight in mix.items():
+        if name not in payloads:
+            raise ValueError(f"Unknown payload {name}, one of {', '.join(payloads)}")
+        method_name = f"bench.{name}"
+        calls.append(Call(method_name, "/bench/" + name, method_call(method_name, payloads[name]), weight))
+
+    for method_name, params, weight in custom:
+        body = XMLRPCHandler.format_call(method_name, json.loads(params))
+        calls.append(Call(method_name, "/" + method_name.replace(".", "/", 1), body, weight))
+
+    if not calls:
+        raise ValueError("The mix is empty")
+    return calls
+
+
+class Server:
+    # uvicorn in a subprocess, listening on localhost
+
+    def __init__(self, app: str, *, factory: bool, workers: int, port: int, mode: str):
+        self.port = port
+        self.command = [
+            sys.executable, "-m", "uvicorn", app,
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ]
+        if factory:
+            self.command.append("--factory")
+        self.env = dict(os.environ, BENCH_MODE=mode)
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "Server":
+        self.process = subprocess.Popen(self.command, env=self.env)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+
+        self.__exit__()
+        raise RuntimeError("Server didn't start listening in 30s")
+
+    def __exit__(self, *exc_info) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def rss(self) -> Optional[int]:
+        # Resident memory of uvicorn and its workers, from /proc, None where there is no /proc
+        try:
+            return sum(_rss(pid) for pid in _descendants(self.process.pid))
+        except OSError:
+            return None
+
+
+def _descendants(pid: int) -> list[int]:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # The process name may contain spaces and parentheses, fields after it are fixed
+        parent = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending.extend(children.get(current, ()))
+    return pids
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+class RSSSampler(threading.Thread):
+
+    def __init__(self, server: Optional[Server], interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.peak = None
+        self.last = None
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        if self.server is None:
+            return
+        while True:
+            rss = self.server.rss()
+            if rss is not None:
+                self.last = rss
+                self.peak = max(self.peak or 0, rss)
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+async def _call(session: aiohttp.ClientSession, url: str, call: Call, start: float, samples: Optional[list]) -> None:
+    try:
+        async with session.post(url + call.path, data=call.body, headers={"Content-Type": "text/xml"}) as response:
+            body = await response.read()
+        if response.status != 200 or not body.startswith(b"<?xml"):
+            outcome = ERROR
+        elif body.startswith(XMLRPCHandler.FAULT_HEAD):
+            outcome = FAULT
+        else:
+            outcome = OK
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        outcome = ERROR
+
+    if samples is not None:
+        samples.append(Sample(call.method_name, time.perf_counter() - start, outcome))
+
+
+async def closed_loop(session, url, calls, rnd, *, concurrency: int, duration: float, samples) -> None:
+    # Every worker sends its next call as soon as the previous one is answered
+    weights = [call.weight for call in calls]
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await _call(session, url, rnd.choices(calls, weights)[0], time.perf_counter(), samples)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(session, url, calls, rnd, *, rate: float, duration: float, samples) -> None:
+    # Calls are sent on a fixed schedule whatever the server does, latency counts from the scheduled time,
+    # so a slow server shows up in the latency instead of lowering the rate
+    weights = [call.weight for call in calls]
+    tasks = set()
+    start = time.perf_counter()
+
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        task = asyncio.create_task(_call(session, url, rnd.choices(calls, weights)[0], scheduled, samples))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
+
+
+async def _generate(url, calls, seed, *, concurrency, rate, duration, warmup, timeout) -> list[Sample]:
+    rnd = random.Random(seed)
+    connector = aiohttp.TCPConnector(limit=0 if rate else concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        samples = []
+        for phase_duration, phase_samples in ((warmup, None), (duration, samples)):
+            if phase_duration <= 0:
+                continue
+            if rate:
+                await open_loop(session, url, calls, rnd, rate=rate, duration=phase_duration, samples=phase_samples)
+            else:
+                await closed_loop(
+                    session, url, calls, rnd, concurrency=concurrency, duration=phase_duration, samples=phase_samples
+                )
+        return samples
+
+
+def generate(url, calls, seed, **options) -> list[Sample]:
+    return asyncio.run(_generate(url, calls, seed, **options))
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    # Nearest rank
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * p / 100 + 0.5) - 1))]
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict:
+    latencies = sorted(sample.latency for sample in samples)
+    requests = len(samples)
+    faults = sum(sample.outcome == FAULT for sample in samples)
+    errors = sum(sample.outcome == ERROR for sample in samples)
+
+    return {
+        "requests": requests,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "faults": faults,
+        "errors": errors,
+        "fault_rate": faults / requests if requests else 0.0,
+        "error_rate": errors / requests if requests else 0.0,
+        "latency_ms": {
+            **{f"p{p:g}": percentile(latencies, p) * 1e3 for p in PERCENTILES},
+            "mean": sum(latencies) / requests * 1e3 if requests else 0.0,
+            "max": latencies[-1] * 1e3 if latencies else 0.0,
+        },
+    }
+
+
+def run(args, calls: list[Call]) -> dict:
+    server = None if args.url else Server(
+        args.app, factory=args.factory, workers=args.workers, port=args.port, mode=args.mode
+    )
+    url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{args.port}"
+
+    # Load is split evenly over the generator processes, one process can't saturate several workers
+    options = {
+        "concurrency": max(1, args.concurrency // args.processes),
+        "rate": args.rate / args.processes if args.rate else None,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "timeout": args.timeout,
+    }
+
+    if server is not None:
+        server.__enter__()
+    try:
+        sampler = RSSSampler(server)
+        sampler.start()
+        start = time.perf_counter()
+
+        if args.processes == 1:
+            samples = generate(url, calls, args.seed, **options)
+        else:
+            with ProcessPoolExecutor(args.processes) as executor:
+                futures = [executor.submit(generate, url, calls, args.seed + i, **options) for i in range(args.processes)]
+                samples = [sample for future in futures for sample in future.result()]
+
+        elapsed = time.perf_counter() - start - args.warmup
+        sampler.stop()
+    finally:
+        if server is not None:
+            server.__exit__()
+
+    results = {"load.total": summarize(samples, elapsed)}
+    for call in calls:
+        results[f"load.{call.method_name}"] = summarize(
+            [sample for sample in samples if sample.method_name == call.method_name], elapsed
+        )
+
+    results["load.total"]["server"] = {"rss_peak_bytes": sampler.peak, "rss_end_bytes": sampler.last}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # A case regresses when its throughput drops or its p99 grows by more than tolerance
+    regressions = []
+
+    print(f"{'case':<32} {'rps':>10} {'base rps':>10} {'p99 ms':>10} {'base p99':>10}")
+    for case, result in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            print(f"{case:<32} {result['rps']:>10.1f} {'-':>10} {result['latency_ms']['p99']:>10.2f} {'-':>10}")
+            continue
+
+        rps, base_rps = result["rps"], before["rps"]
+        p99, base_p99 = result["latency_ms"]["p99"], before["latency_ms"]["p99"]
+
+        flag = ""
+        if (base_rps and rps < base_rps * (1 - tolerance)) or (base_p99 and p99 > base_p99 * (1 + tolerance)):
+            regressions.append(case)
+            flag = "  REGRESSION"
+
+        print(f"{case:<32} {rps:>10.1f} {base_rps:>10.1f} {p99:>10.2f} {base_p99:>10.2f}{flag}")
+
+    return regressions
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for item in filter(None, text.split(",")):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load",
+        description="Load test an XML-RPC server on localhost, by default uvicorn serving the e2e benchmark app"
+    )
+    parser.add_argument("--app", default="benchmarks.load:create_app", help="uvicorn application import string")
+    parser.add_argument("--no-factory", dest="factory", action="store_false", help="--app is an app, not a factory")
+    parser.add_argument("--mode", choices=e2e.MODES, default="json", help="dispatch mode of the default app")
+    parser.add_argument("--url", help="drive an already running server instead of starting one, RSS isn't reported")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-m", "--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="payload=weight pairs sent to bench.<payload>, default %(default)s")
+    parser.add_argument("--call", nargs=3, action="append", default=[], metavar=("METHOD", "PARAMS", "WEIGHT"),
+                        help="add a method with JSON encoded params to the mix, e.g. --call eps.test '[\"x\"]' 1")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="closed loop: calls in flight")
+    parser.add_argument("-R", "--rate", type=float, help="open loop: calls per second, instead of --concurrency")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="load generator processes")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a call counts as an error")
+    parser.add_argument("--seed", type=int, default=1729)
+    parser.add_argument("-o", "--output", help="write the run as JSON to this file")
+    parser.add_argument("-b", "--baseline", help="compare with a run previously written by --output")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+                        help="allowed throughput drop and p99 growth against the baseline, 0.1 is 10%%")
+    args = parser.parse_args(argv)
+
+    mix = {} if args.call and args.mix is DEFAULT_MIX else args.mix
+    calls = build_calls(mix, [(method, params, float(weight)) for method, params, weight in args.call])
+
+    results = run(args, calls)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "packages": package_versions(),
+            "app": args.url or args.app,
+            "mode": args.mode,
+            "workers": args.workers,
+            "processes": args.processes,
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": {call.method_name: call.weight for call in calls},
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+        return 0
+
+    print(f"{'case':<32} {'requests':>9} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'p99.9':>8} {'faults':>7} {'errors':>7}")
+    for case, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"{case:<32} {result['requests']:>9} {result['rps']:>9.1f} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+            f"{latency['p99']:>8.2f} {latency['p99.9']:>8.2f} {result['fault_rate']:>7.2%} {result['error_rate']:>7.2%}"
+        )
+
+    server = results["load.total"]["server"]
+    if server["rss_peak_bytes"] is not None:
+        print(f"\nserver RSS peak {server['rss_peak_bytes'] / 2 ** 20:.1f} MiB, end {server['rss_end_bytes'] / 2 ** 20:.1f} MiB")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
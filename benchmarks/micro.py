@@ -0,0 +1,27 @@
+from benchmarks.payloads import values, method_call, fault
+from benchmarks.timing import measure
+from fastapi_xmlrpc.parser.decoder import decode_method_call
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+def run(*, repeat: int = 5, selected=lambda name: True) -> dict:
+    results = {}
+
+    for name, value in values().items():
+        body = method_call(f"bench.{name}", value)
+
+        cases = {
+            f"micro.handle.{name}": lambda: XMLRPCHandler.handle(body),
+            f"micro.decode_method_call.{name}": lambda: decode_method_call(body),
+            f"micro.format_success.{name}": lambda: XMLRPCHandler.format_success(value),
+        }
+
+        for case, func in cases.items():
+            if selected(case):
+                results[case] = measure(func, repeat=repeat)
+
+    exception = fault()
+    if selected("micro.format_error.fault"):
+        results["micro.format_error.fault"] = measure(lambda: XMLRPCHandler.format_error(exception), repeat=repeat)
+
+    return results
@@ -0,0 +1,69 @@
+import random
+import string
+import xmlrpc.client
+
+from datetime import datetime
+
+from aiohttp_xmlrpc.common import Binary
+
+from fastapi_xmlrpc.parser.exceptions import InvalidArguments
+
+# Fixed seed, every run benchmarks the same documents
+SEED = 1729
+
+
+def scalars(rnd: random.Random):
+    return [
+        rnd.randrange(-2 ** 31, 2 ** 31 - 1),
+        rnd.random() * 1e6,
+        "".join(rnd.choices(string.ascii_letters, k=24)),
+        True,
+    ]
+
+
+def deep_struct(rnd: random.Random, depth: int = 12, width: int = 3):
+    if depth == 0:
+        return {"id": rnd.randrange(1000), "name": "".join(rnd.choices(string.ascii_letters, k=8))}
+
+    return {
+        f"level_{depth}_{i}": deep_struct(rnd, depth - 1, width) if i == 0 else rnd.randrange(1000)
+        for i in range(width)
+    }
+
+
+def wide_array(rnd: random.Random, size: int = 5000):
+    return [
+        {
+            "id": i,
+            "name": "".join(rnd.choices(string.ascii_letters, k=12)),
+            "score": rnd.random(),
+            "active": bool(i % 2),
+            "created": datetime(2022, 1, 1 + i % 28),
+        }
+        for i in range(size)
+    ]
+
+
+def base64_blob(rnd: random.Random, size: int = 1024 * 1024):
+    return Binary(rnd.randbytes(size))
+
+
+def fault():
+    return InvalidArguments("Invalid arguments: " + "x" * 64)
+
+
+# name -> python value sent as the only param and returned as the result
+def values():
+    rnd = random.Random(SEED)
+    return {
+        "scalars": scalars(rnd),
+        "deep_struct": deep_struct(rnd),
+        "wide_array": wide_array(rnd),
+        "base64_blob": base64_blob(rnd),
+    }
+
+
+def method_call(method_name: str, value) -> bytes:
+    if isinstance(value, Binary):
+        value = bytes(value)
+    return xmlrpc.client.dumps((value,), method_name, allow_none=True).encode()
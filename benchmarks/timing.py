@@ -0,0 +1,45 @@
+import statistics
+import time
+import timeit
+
+from typing import Awaitable, Callable
+
+
+def summary(times: list[float], number: int) -> dict:
+    median = statistics.median(times)
+    return {
+        "number": number,
+        "repeat": len(times),
+        "min_s": min(times),
+        "median_s": median,
+        "max_s": max(times),
+        "ops_per_s": 1 / median if median else None,
+    }
+
+
+def measure(func: Callable[[], object], *, repeat: int = 5) -> dict:
+    # Calls per repeat are picked like `python -m timeit`, so that one repeat takes at least 0.2s
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return summary(times, number)
+
+
+async def measure_async(func: Callable[[], Awaitable[object]], *, repeat: int = 5, min_time: float = 0.2) -> dict:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        times.append((time.perf_counter() - start) / number)
+
+    return summary(times, number)
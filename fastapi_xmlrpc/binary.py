@@ -0,0 +1,162 @@
+import base64
+import binascii
+import hashlib
+import io
+
+from tempfile import SpooledTemporaryFile
+from typing import Any, BinaryIO, Iterator, Optional
+
+from aiohttp_xmlrpc.common import Binary
+
+__all__ = (
+    "BinaryFile", "Base64Sink", "INLINE_BINARY_SIZE", "SPOOL_MAX_SIZE", "encode_chunks", "json_default",
+    "is_binary_content"
+)
+
+
+# Decoded base64 values up to this size stay Binary (bytes), larger ones become a BinaryFile
+INLINE_BINARY_SIZE = 1024 * 1024
+# BinaryFile data is kept in memory up to this size and moved to a temporary file above it
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+# Multiple of 3, so every chunk but the last encodes to base64 without padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+class BinaryFile:
+    # Decoded <base64> value too large to be kept as bytes, a read only file positioned at 0.
+    # Returned from an endpoint, it is streamed back as <base64> in chunks.
+
+    __slots__ = ("file", "size")
+
+    def __init__(self, file: BinaryIO, size: int):
+        self.file = file
+        self.size = size
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BinaryFile":
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        file.write(data)
+        file.seek(0)
+        return cls(file, len(data))
+
+    def __reduce__(self):
+        # Open files can't be pickled, values decoded or rendered in a process pool are sent with their content
+        return BinaryFile.from_bytes, (self.getvalue(),)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"<BinaryFile {self.size} bytes>"
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def chunks(self, chunk_size: int = ENCODE_CHUNK_SIZE) -> Iterator[bytes]:
+        # Iterates the whole content, whatever the current position is, and keeps the position
+        position = self.file.tell()
+        self.file.seek(0)
+        try:
+            while chunk := self.file.read(chunk_size):
+                yield chunk
+        finally:
+            self.file.seek(position)
+
+    def getvalue(self) -> bytes:
+        position = self.file.tell()
+        self.file.seek(0)
+        try:
+            return self.file.read()
+        finally:
+            self.file.seek(position)
+
+    def digest(self) -> str:
+        sha = hashlib.sha256()
+        for chunk in self.chunks():
+            sha.update(chunk)
+        return sha.hexdigest()
+
+
+class Base64Sink:
+    # Decodes base64 text as the parser delivers it, without holding the whole text.
+    # Whitespace may split the text anywhere, so characters are decoded in groups of 4.
+
+    __slots__ = ("pending", "chunks", "size", "file")
+
+    def __init__(self):
+        self.pending = ""
+        self.chunks = []
+        self.size = 0
+        self.file: Optional[SpooledTemporaryFile] = None
+
+    def write(self, text: str) -> None:
+        text = self.pending + "".join(text.split())
+        end = len(text) - len(text) % 4
+        self.pending = text[end:]
+
+        if end:
+            self._append(binascii.a2b_base64(text[:end]))
+
+    def _append(self, data: bytes) -> None:
+        self.size += len(data)
+
+        if self.file is not None:
+            self.file.write(data)
+            return
+
+        self.chunks.append(data)
+        if self.size > INLINE_BINARY_SIZE:
+            self.file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            for chunk in self.chunks:
+                self.file.write(chunk)
+            self.chunks.clear()
+
+    def close(self) -> Binary | BinaryFile:
+        if self.pending:
+            # Same as base64.b64decode, incorrect padding raises binascii.Error
+            self._append(binascii.a2b_base64(self.pending))
+            self.pending = ""
+
+        if self.file is None:
+            return Binary(b"".join(self.chunks))
+
+        self.file.seek(0)
+        return BinaryFile(self.file, self.size)
+
+
+def encode_chunks(value: Binary | BinaryFile | BinaryIO, chunk_size: int = ENCODE_CHUNK_SIZE) -> Iterator[bytes]:
+    if isinstance(value, BinaryFile):
+        chunks = value.chunks(chunk_size)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        view = memoryview(value)
+        chunks = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+    else:
+        chunks = iter(lambda: value.read(chunk_size), b"")
+
+    for chunk in chunks:
+        yield base64.b64encode(chunk)
+
+
+def json_default(value: Any) -> str:
+    # Base64 values of endpoints dispatched through JSON are passed as base64 text
+    if isinstance(value, BinaryFile):
+        return b"".join(encode_chunks(value)).decode()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError
+
+
+def is_binary_content(value: Any) -> bool:
+    # Results streamed as <base64>, plain bytes stay <string> like in aiohttp_xmlrpc
+    if isinstance(value, Binary):
+        return len(value) > INLINE_BINARY_SIZE
+    return isinstance(value, (BinaryFile, io.BufferedIOBase, io.RawIOBase))
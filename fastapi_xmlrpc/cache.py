@@ -0,0 +1,206 @@
+import asyncio
+import base64
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional, Union
+
+import orjson
+
+from starlette.types import Message, Send
+
+from fastapi_xmlrpc.binary import BinaryFile
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+# Keys of JSON-RPC calls start with it, their entries hold encoded JSON-RPC results instead of XML responses
+JSONRPC_KEY = "jsonrpc"
+
+
+def _default(value: Any):
+    if isinstance(value, BinaryFile):
+        return ["__file__", value.digest()]
+    if isinstance(value, bytes):
+        return ["__base64__", base64.b64encode(value).decode()]
+    raise TypeError
+
+
+def canonical_args(method_args: list) -> Optional[bytes]:
+    # Equal decoded arguments give equal keys, 1, 1.0 and True stay different.
+    # None for arguments orjson can't encode, like integers beyond 64 bits, calls with them aren't cached
+    try:
+        return orjson.dumps(method_args, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return None
+
+
+class CachedResponse(NamedTuple):
+    start: Message
+    body: bytes
+
+    async def send(self, send: Send) -> None:
+        await send(self.start)
+        await send({"type": "http.response.body", "body": self.body})
+
+
+class ResponseRecorder:
+    # Wraps ASGI send and keeps a copy of a complete, single message, successful XML-RPC response
+
+    __slots__ = ("send", "start", "body", "cacheable")
+
+    def __init__(self, send: Send):
+        self.send = send
+        self.start = None
+        self.body = None
+        self.cacheable = True
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+        elif message["type"] == "http.response.body":
+            # Streamed responses are not kept
+            if message.get("more_body", False) or self.body is not None:
+                self.cacheable = False
+            self.body = message.get("body", b"")
+
+        await self.send(message)
+
+    def response(self, faults: bool = False) -> Optional[CachedResponse]:
+        if not self.cacheable or self.start is None or self.body is None or self.start["status"] != 200:
+            return None
+        if not self.body.startswith(XMLRPCHandler.SUCCESS_HEAD):
+            if not faults or not self.body.startswith(XMLRPCHandler.FAULT_HEAD):
+                return None
+        return CachedResponse(self.start, self.body)
+
+
+class ResponseCache:
+    # LRU cache of serialized responses of one method, entries expire after ttl seconds.
+    # Calls are looked up once they passed the dependencies of the route, so a hit is never served to a caller
+    # the route would refuse, key must tell apart callers the endpoint answers differently
+
+    __slots__ = ("method_name", "ttl", "max_entries", "key_function", "entries", "hits", "misses", "evictions")
+
+    def __init__(
+            self,
+            method_name: str,
+            *,
+            ttl: float,
+            max_entries: int = 1024,
+            key: Optional[Callable[[list], Hashable]] = None
+    ):
+        self.method_name = method_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.key_function = key
+
+        self.entries: OrderedDict[Hashable, tuple[float, Union[CachedResponse, bytes]]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, method_name: str, method_args: list, jsonrpc: bool = False) -> Optional[Hashable]:
+        # None when the call can't be cached
+        if self.key_function is not None:
+            key = method_name, self.key_function(method_args)
+        else:
+            canonical = canonical_args(method_args)
+            if canonical is None:
+                return None
+            key = method_name, canonical
+        return (JSONRPC_KEY, key) if jsonrpc else key
+
+    def get(self, key: Hashable) -> Optional[Union[CachedResponse, bytes]]:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, key: Hashable, response: Union[CachedResponse, bytes]) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *method_args: Any) -> bool:
+        # Drops the entries of both XML-RPC and JSON-RPC calls
+        removed = [
+            self.entries.pop(self.key(self.method_name, list(method_args), jsonrpc), None) for jsonrpc in (False, True)
+        ]
+        return any(entry is not None for entry in removed)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    # Concurrent calls of one method with equal arguments share a single execution,
+    # the first call runs the endpoint and the others get a copy of its response, fault included.
+    # Followers of a shed or timed out call run on their own. Calls join once they passed the dependencies
+    # of the route, equal calls of different callers get the same response
+
+    __slots__ = ("method_name", "calls", "executions", "collapsed", "fallbacks")
+
+    def __init__(self, method_name: str):
+        self.method_name = method_name
+
+        self.calls: dict[Hashable, asyncio.Future] = {}
+
+        self.executions = 0
+        self.collapsed = 0
+        # Collapsed calls that ran on their own, the shared call failed, was shed, timed out or can't be copied
+        self.fallbacks = 0
+
+    def key(self, method_name: str, method_args: list, jsonrpc: bool = False) -> Optional[Hashable]:
+        # None when the call can't share an execution, it runs on its own
+        canonical = canonical_args(method_args)
+        if canonical is None:
+            return None
+        key = method_name, canonical
+        return (JSONRPC_KEY, key) if jsonrpc else key
+
+    def join(self, key: Hashable) -> Optional[asyncio.Future]:
+        # Future of the running call with this key, or None when the caller has to run it
+        future = self.calls.get(key)
+        if future is not None:
+            self.collapsed += 1
+            return future
+
+        self.calls[key] = asyncio.get_running_loop().create_future()
+        self.executions += 1
+        return None
+
+    def finish(self, key: Hashable, response: Optional[Union[CachedResponse, bytes]]) -> None:
+        future = self.calls.pop(key)
+        future.set_result(response)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.calls),
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,181 @@
+import asyncio
+import gzip
+
+from typing import Any, Iterable, Optional, Sequence
+
+import aiohttp
+
+from fastapi_xmlrpc.deadline import DEADLINE_HEADER, DeadlineExceeded, remaining
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import TransportError, InvalidData, xml2py_exception
+from fastapi_xmlrpc.parser.parser import MULTICALL_METHOD, XMLRPCHandler
+
+__all__ = ("XMLRPCClient",)
+
+
+MULTICALL_BATCH_SIZE = 100
+
+
+class _Method:
+    __slots__ = ("client", "name")
+
+    def __init__(self, client: "XMLRPCClient", name: str):
+        self.client = client
+        self.name = name
+
+    def __getattr__(self, name: str) -> "_Method":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _Method(self.client, f"{self.name}.{name}")
+
+    def __call__(self, *args):
+        return self.client.call(self.name, *args)
+
+
+class XMLRPCClient:
+    # Calls are encoded and decoded with the server's codec, faults are raised as the exception
+    # registered for their faultCode.
+    #
+    # Connections are kept alive and pooled by the aiohttp connector, at most limit_per_host
+    # requests are in flight per host, the rest wait for a free connection.
+    #
+    # The server is told how long the client waits with DEADLINE_HEADER, from timeout and,
+    # for calls made inside an endpoint, from the time left to the deadline of that call.
+    #
+    #     async with XMLRPCClient("http://localhost:8000") as client:
+    #         name = await client.eps.test("name")
+
+    def __init__(
+            self,
+            url: str,
+            *,
+            limit: int = 100,
+            limit_per_host: int = 10,
+            keepalive_timeout: float = 30,
+            timeout: Optional[float] = None,
+            headers: Optional[dict] = None,
+            method_paths: bool = False,
+            compress_threshold: Optional[int] = None,
+            compress_level: int = 6,
+            session: Optional[aiohttp.ClientSession] = None
+    ):
+        self.url = url.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = {"Content-Type": "text/xml", **(headers or {})}
+        # XMLRPCMiddleware looks the endpoint up by methodName, calls are posted to url whatever their method.
+        # With method_paths every method is posted to its own path under url, namespace.function -> /namespace/function,
+        # so the body size limit and the offload policy of the method apply before its body is parsed.
+        # Only for servers that include the routers under url
+        self.method_paths = method_paths
+        # Request bodies of at least compress_threshold bytes are sent gzipped,
+        # responses are decompressed by aiohttp, which asks for gzip and deflate
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+        self.session = session
+        self.own_session = session is None
+
+    async def __aenter__(self) -> "XMLRPCClient":
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def __getattr__(self, name: str) -> _Method:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _Method(self, name)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily, aiohttp sessions must be created inside a running event loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None and self.own_session:
+            await self.session.close()
+            self.session = None
+
+    def _url(self, method_name: str) -> str:
+        if self.method_paths and method_name != MULTICALL_METHOD:
+            return self.url + "/" + method_name.replace(".", "/", 1)
+        return self.url
+
+    async def call(self, method_name: str, *args) -> Any:
+        body = XMLRPCHandler.format_call(method_name, args)
+
+        headers = self.headers
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            body = gzip.compress(body, self.compress_level)
+            headers = {**headers, "Content-Encoding": "gzip"}
+
+        # Calls made within a deadline give up at that deadline
+        timeout, left = self.timeout, remaining()
+        if left == 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {method_name} was called")
+        if left is not None and (timeout.total is None or left < timeout.total):
+            timeout = aiohttp.ClientTimeout(total=left)
+        if timeout.total is not None:
+            headers = {**headers, DEADLINE_HEADER: f"{timeout.total:.3f}"}
+
+        async with self._get_session().post(
+                self._url(method_name), data=body, headers=headers, timeout=timeout
+        ) as response:
+            content = await response.read()
+
+            if "xml" not in response.headers.get("Content-Type", ""):
+                raise TransportError(f"{response.status} {response.reason}: {content[:200].decode(errors='replace')}")
+
+        return decode_method_response(content)
+
+    async def map(self, calls: Iterable[tuple[str, Sequence]], *, return_exceptions: bool = False) -> list:
+        # Runs the calls concurrently over the pooled connections, results keep the order of calls
+        return await asyncio.gather(
+            *(self.call(method_name, *args) for method_name, args in calls),
+            return_exceptions=return_exceptions
+        )
+
+    async def multicall(
+            self,
+            calls: Iterable[tuple[str, Sequence]],
+            *,
+            batch_size: int = MULTICALL_BATCH_SIZE,
+            return_exceptions: bool = False
+    ) -> list:
+        # Sends the calls in system.multicall batches of batch_size, batches run concurrently.
+        # A failed call raises its fault, or is returned in its place with return_exceptions
+        calls = [{"methodName": method_name, "params": list(args)} for method_name, args in calls]
+        batches = [calls[i:i + batch_size] for i in range(0, len(calls), batch_size)]
+
+        responses = await asyncio.gather(*(self.call(MULTICALL_METHOD, batch) for batch in batches))
+
+        results = []
+        for batch, response in zip(batches, responses):
+            if not isinstance(response, list) or len(response) != len(batch):
+                raise InvalidData(f"{MULTICALL_METHOD} didn't return one result per call")
+
+            for result in response:
+                if isinstance(result, list) and len(result) == 1:
+                    results.append(result[0])
+                    continue
+
+                if isinstance(result, dict) and "faultCode" in result:
+                    exc = xml2py_exception(int(result["faultCode"]), result.get("faultString", ""))
+                else:
+                    exc = InvalidData(f"Invalid {MULTICALL_METHOD} result")
+
+                if not return_exceptions:
+                    raise exc
+                results.append(exc)
+
+        return results
@@ -0,0 +1,181 @@
+import zlib
+
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import Message, Send
+
+from fastapi_xmlrpc.parser.exceptions import PayloadTooLarge
+
+__all__ = (
+    "Compression", "Decompressor", "CompressingSend", "UnsupportedContentEncoding", "decompressor", "negotiate"
+)
+
+
+# gzip container, zlib container (what HTTP calls deflate), raw deflate stream
+WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "x-gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+# Preferred first when the client accepts several with the same q
+RESPONSE_ENCODINGS = ("gzip", "deflate")
+
+
+class UnsupportedContentEncoding(ValueError):
+    pass
+
+
+class Decompressor:
+    # Inflates a request body chunk by chunk, as it is received
+
+    __slots__ = ("encoding", "decompressobj", "started", "size")
+
+    def __init__(self, encoding: str):
+        if encoding not in WBITS:
+            raise UnsupportedContentEncoding(encoding)
+
+        self.encoding = encoding
+        self.decompressobj = zlib.decompressobj(WBITS[encoding])
+        self.started = False
+        # Inflated bytes so far
+        self.size = 0
+
+    def decompress(self, chunk: bytes, limit: Optional[int] = None) -> bytes:
+        # Raises zlib.error on corrupted data and PayloadTooLarge once more than limit bytes are inflated,
+        # output is capped so a small bomb chunk never inflates in full
+        if not chunk:
+            return b""
+
+        max_length = 0 if limit is None else limit - self.size + 1
+        try:
+            data = self.decompressobj.decompress(chunk, max_length)
+        except zlib.error:
+            # Some clients send deflate without the zlib header
+            if self.started or self.encoding != "deflate":
+                raise
+            self.decompressobj = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self.decompressobj.decompress(chunk, max_length)
+
+        self.started = True
+        return self._count(data, limit)
+
+    def flush(self, limit: Optional[int] = None) -> bytes:
+        data = self.decompressobj.flush()
+        if not self.decompressobj.eof:
+            raise zlib.error("Compressed body is truncated")
+        return self._count(data, limit)
+
+    def _count(self, data: bytes, limit: Optional[int]) -> bytes:
+        self.size += len(data)
+        if limit is not None and self.size > limit:
+            raise PayloadTooLarge(f"Decompressed request body exceeds {limit} bytes")
+        return data
+
+
+def decompressor(content_encoding: Optional[str]) -> Optional[Decompressor]:
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return None
+    return Decompressor(encoding)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    # Picks a response encoding from Accept-Encoding, None means identity
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in RESPONSE_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Compression:
+    # Response compression of XMLRPCMiddleware, bodies smaller than minimum_size are sent as they are.
+    # Streamed responses are compressed chunk by chunk, each chunk is flushed so it can be decoded on arrival
+
+    __slots__ = ("level", "minimum_size")
+
+    def __init__(self, level: int = 6, minimum_size: int = 1024):
+        self.level = level
+        self.minimum_size = minimum_size
+
+    def wrap(self, accept_encoding: str, send: Send) -> Send:
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return send
+        return CompressingSend(send, encoding, self.level, self.minimum_size)
+
+
+class CompressingSend:
+
+    __slots__ = ("send", "encoding", "level", "minimum_size", "start", "compressobj")
+
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+
+        self.start: Optional[Message] = None
+        self.compressobj = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body message tells whether the response is worth compressing
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            # Start messages of cached responses are shared, headers are changed on a copy
+            headers = MutableHeaders(raw=list(start.get("headers", ())))
+
+            if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                await self.send(start)
+                return await self.send(message)
+
+            self.compressobj = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[self.encoding])
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = self.compressobj.compress(body) + self.compressobj.flush(zlib.Z_SYNC_FLUSH)
+            else:
+                body = self.compressobj.compress(body) + self.compressobj.flush()
+                headers["Content-Length"] = str(len(body))
+
+            await self.send(dict(start, headers=headers.raw))
+            return await self.send(dict(message, body=body))
+
+        if self.compressobj is None:
+            return await self.send(message)
+
+        if more_body:
+            body = self.compressobj.compress(body) + self.compressobj.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            body = self.compressobj.compress(body) + self.compressobj.flush()
+
+        await self.send(dict(message, body=body))
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi_xmlrpc.parser.exceptions import ServerError, register_exception
+
+__all__ = ("DeadlineExceeded", "DEADLINE_HEADER", "deadline", "remaining", "parse_timeout", "run_with_deadline")
+
+
+# Seconds the client is still willing to wait for the response, set by XMLRPCClient
+# from its timeout and from the deadline of the call it is made in
+DEADLINE_HEADER = "X-XMLRPC-Timeout"
+
+
+class DeadlineExceeded(ServerError):
+    code = -32604
+
+
+register_exception(DeadlineExceeded, DeadlineExceeded.code)
+
+T = TypeVar("T")
+
+
+# time.monotonic() the running call must be answered by, None without a deadline
+_deadline: ContextVar[Optional[float]] = ContextVar("xmlrpc_deadline", default=None)
+
+
+def deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    # Seconds left to the deadline of the running call, endpoints can skip work that can't finish in time.
+    # Async endpoints are cancelled at the deadline, sync ones run to the end in their thread
+    value = _deadline.get()
+    if value is None:
+        return None
+    return max(value - time.monotonic(), 0.0)
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    # Raises ValueError for values that aren't a non negative number of seconds
+    if value is None:
+        return None
+    timeout = float(value)
+    if not timeout >= 0:
+        raise ValueError(value)
+    return timeout
+
+
+async def run_with_deadline(awaitable: Awaitable[T], deadline: Optional[float]) -> T:
+    # Awaits with the deadline visible through remaining(), cancelled and raised as DeadlineExceeded
+    # when it passes. Runs in the calling task, the awaitable is cancelled with it
+    if deadline is None:
+        return await awaitable
+
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Deadline exceeded before the call started")
+
+    task = asyncio.current_task()
+    expired = False
+
+    def expire() -> None:
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    timer = asyncio.get_running_loop().call_later(timeout, expire)
+    token = _deadline.set(deadline)
+    try:
+        return await awaitable
+    except asyncio.CancelledError:
+        # Cancellations from elsewhere, a disconnected client or a shutdown, go on as they are
+        if not expired:
+            raise
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        raise DeadlineExceeded(f"Deadline of {timeout:.3f}s exceeded") from None
+    finally:
+        timer.cancel()
+        _deadline.reset(token)
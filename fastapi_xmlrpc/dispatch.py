@@ -0,0 +1,197 @@
+import asyncio
+import inspect
+
+from contextlib import AsyncExitStack
+from collections.abc import AsyncGenerator, AsyncIterator, Generator, Iterator
+from typing import Any, NamedTuple, Optional, Union, get_args, get_origin
+
+from aiohttp_xmlrpc.common import Binary
+
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute, run_endpoint_function, serialize_response
+from starlette.background import BackgroundTasks
+from starlette.concurrency import iterate_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from fastapi_xmlrpc.binary import BinaryFile, is_binary_content
+from fastapi_xmlrpc.lazy import LazyArray
+from fastapi_xmlrpc.plan import DecodePlan
+from fastapi_xmlrpc.responses import XMLRPCResponse, XMLRPCStreamingResponse, XMLRPCBinaryResponse
+from fastapi_xmlrpc.schemas import Base64
+
+
+STREAM_RETURN_TYPES = (Iterator, AsyncIterator, Generator, AsyncGenerator)
+
+# Parameters and results of these types can't go through JSON
+BINARY_TYPES = (bytes, Base64, BinaryFile)
+# Parameters of these types get large <base64> values as BinaryFile, others as bytes
+FILE_TYPES = (Base64, BinaryFile)
+
+
+class DispatchResult(NamedTuple):
+    content: Any
+    background: Optional[BackgroundTasks]
+    sub_response: Response
+
+
+async def run_route(route: APIRoute, request: Request, body: Any, plan: Optional[DecodePlan] = None) -> DispatchResult:
+    # Same steps as fastapi.routing.get_request_handler, but the body is passed
+    # as already decoded python values, so nothing is encoded to or parsed from JSON.
+    # With a plan, body parameters are built by it without validation
+    dependant = route.dependant if plan is None else plan.dependant
+    is_coroutine = asyncio.iscoroutinefunction(dependant.call)
+
+    values, errors, background_tasks, sub_response, _ = await solve_dependencies(
+        request=request,
+        dependant=dependant,
+        body=body,
+        dependency_overrides_provider=route.dependency_overrides_provider,
+    )
+    if errors:
+        raise RequestValidationError(errors, body=body)
+
+    if plan is not None:
+        values.update(plan.decode(body))
+
+    raw_response = await run_endpoint_function(
+        dependant=dependant, values=values, is_coroutine=is_coroutine
+    )
+
+    # Binary results are rendered as they are, jsonable_encoder would decode them as text
+    if isinstance(raw_response, (Response, Binary)) or is_binary_content(raw_response):
+        return DispatchResult(raw_response, background_tasks, sub_response)
+
+    if isinstance(raw_response, (Iterator, AsyncIterator)):
+        # Pull the first item here, so errors raised before anything is streamed are raised from run_route
+        # and answered by the exception handlers of the application, like errors of other endpoints
+        content = await prefetch(iterate_items(raw_response))
+        return DispatchResult(content, background_tasks, sub_response)
+
+    content = await serialize_response(
+        field=route.secure_cloned_response_field,
+        response_content=raw_response,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+        is_coroutine=is_coroutine,
+    )
+
+    return DispatchResult(content, background_tasks, sub_response)
+
+
+async def check_dependencies(route: APIRoute, request: Request, body: Any) -> None:
+    # Runs the dependencies of route, security included, without the endpoint and raises what they raise.
+    # Cached and collapsed calls are answered without running the route, they must pass its dependencies first
+    if not route.dependant.dependencies:
+        return
+
+    async with AsyncExitStack() as stack:
+        _, errors, _, _, _ = await solve_dependencies(
+            request=Request(dict(request.scope, fastapi_astack=stack), request.receive),
+            dependant=Dependant(dependencies=route.dependant.dependencies),
+            body=body,
+            dependency_overrides_provider=route.dependency_overrides_provider,
+        )
+    if errors:
+        raise RequestValidationError(errors, body=body)
+
+
+def build_response(route: APIRoute, result: DispatchResult, rendered: Optional[bytes] = None) -> Response:
+    if isinstance(result.content, Response):
+        response = result.content
+        if response.background is None:
+            response.background = result.background
+        return response
+
+    if rendered is not None:
+        response = Response(rendered, media_type=XMLRPCResponse.media_type, background=result.background)
+    elif isinstance(result.content, AsyncIterator):
+        response = XMLRPCStreamingResponse(result.content, background=result.background)
+    elif is_binary_content(result.content):
+        response = XMLRPCBinaryResponse(result.content, background=result.background)
+    else:
+        response = XMLRPCResponse(result.content, background=result.background)
+    if route.status_code is not None:
+        response.status_code = route.status_code
+
+    response.headers.raw.extend(result.sub_response.headers.raw)
+    if result.sub_response.status_code:
+        response.status_code = result.sub_response.status_code
+
+    return response
+
+
+def is_stream_endpoint(endpoint) -> bool:
+    if inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint):
+        return True
+
+    return_type = inspect.signature(endpoint).return_annotation
+    return (get_origin(return_type) or return_type) in STREAM_RETURN_TYPES
+
+
+def _is_annotated_with(annotation, types: tuple) -> bool:
+    if get_origin(annotation) is Union:
+        return any(_is_annotated_with(arg, types) for arg in get_args(annotation))
+    return isinstance(annotation, type) and issubclass(annotation, types)
+
+
+def is_binary_endpoint(endpoint) -> bool:
+    sig = inspect.signature(endpoint)
+    annotations = [parameter.annotation for parameter in sig.parameters.values()] + [sig.return_annotation]
+    return any(_is_annotated_with(annotation, BINARY_TYPES) for annotation in annotations)
+
+
+def file_params(endpoint) -> frozenset:
+    return frozenset(
+        name for name, parameter in inspect.signature(endpoint).parameters.items()
+        if _is_annotated_with(parameter.annotation, FILE_TYPES)
+    )
+
+
+def lazy_param(endpoint) -> Optional[int]:
+    # Index of the LazyArray parameter, items of its array are fed to the endpoint while the body is parsed
+    args = inspect.getfullargspec(endpoint).args
+    parameters = inspect.signature(endpoint).parameters
+
+    lazy = [
+        index for index, name in enumerate(args)
+        if (get_origin(parameters[name].annotation) or parameters[name].annotation) is LazyArray
+    ]
+    if not lazy:
+        return None
+    if len(lazy) > 1 or lazy[0] != len(args) - 1:
+        raise TypeError(f"{endpoint.__qualname__}: only the last parameter can be a LazyArray")
+    return lazy[0]
+
+
+async def iterate_items(items: Iterator | AsyncIterator):
+    # Sync iterators may block, so they are advanced in the threadpool like sync endpoints
+    if not isinstance(items, AsyncIterator):
+        items = iterate_in_threadpool(items)
+
+    async for item in items:
+        yield jsonable_encoder(item)
+
+
+async def prefetch(items: AsyncIterator) -> AsyncIterator:
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        return _chain((), items)
+
+    return _chain((first,), items)
+
+
+async def _chain(head: tuple, items: AsyncIterator):
+    for item in head:
+        yield item
+
+    async for item in items:
+        yield item
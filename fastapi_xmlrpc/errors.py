@@ -1,13 +1,23 @@
+import logging
+
+from typing import Any, NamedTuple, Optional
+
+import orjson
+
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from starlette.exceptions import HTTPException
+from starlette.exceptions import ExceptionMiddleware, HTTPException
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.datastructures import Headers
+from starlette.types import Message, Receive, Scope, Send
 
-from fastapi_xmlrpc.parser.exceptions import XMLRPCError, MethodNotFound, InvalidData
+from fastapi_xmlrpc.parser.decoder import decode_method_outcome
+from fastapi_xmlrpc.parser.exceptions import XMLRPCError, MethodNotFound, InvalidData, ServerError, exception_fault
 from fastapi_xmlrpc.responses import XMLRPCResponse
 
+logger = logging.getLogger("fastapi_xmlrpc")
+
 
 def sp(number: int, singular: str, plural: str):
     if str(number)[-1] == "1" and number != 11:
@@ -22,19 +32,79 @@ async def xmlrpc_error_handler(
     return XMLRPCResponse(exc)
 
 
+def validation_error(exc: RequestValidationError) -> InvalidData:
+    errors = exc.errors()
+    errors_str = ", ".join([f"{e['loc'][0]}: {e['msg']}" for e in errors])
+    errors_num = len(errors)
+
+    return InvalidData(f"Invalid data. {errors_num} {sp(errors_num, 'error', 'errors')} found. {errors_str}")
+
+
+def unexpected_error(exc: Exception) -> ServerError:
+    # Entries of system.multicall and JSON-RPC calls are answered with a fault where a single call would get a 500.
+    # Only XMLRPCError texts are sent to clients, the others are logged
+    logger.error("Unexpected error in an XML-RPC call", exc_info=exc)
+    return ServerError("Internal Server Error")
+
+
+def exception_middleware(app, exc: Exception) -> ExceptionMiddleware:
+    # ExceptionMiddleware of app around a call raising exc, it answers exc with the handler registered for it.
+    # Handlers of Exception and 500 belong to ServerErrorMiddleware, exceptions without a handler are re-raised to it
+    async def raise_exc(scope: Scope, receive: Receive, send: Send) -> None:
+        raise exc
+
+    handlers = {
+        key: handler for key, handler in getattr(app, "exception_handlers", {}).items() if key not in (500, Exception)
+    }
+    return ExceptionMiddleware(raise_exc, handlers=handlers, debug=getattr(app, "debug", False))
+
+
+class HandledError(NamedTuple):
+    # The result of a successful response, or the fault of any other
+    result: Any = None
+    fault: Optional[dict] = None
+
+
+async def handle_error(scope: Scope, receive: Receive, exc: Exception) -> HandledError:
+    # Entries of system.multicall and JSON-RPC calls are answered by the exception handlers of the application,
+    # like single calls. Faults keep their faultCode and faultString, other error responses are a ServerError
+    # with their text. Exceptions without a handler are faults as they are, or unexpected errors
+    start, chunks = None, []
+
+    async def capture(message: Message) -> None:
+        nonlocal start
+        if message["type"] == "http.response.start":
+            start = message
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await exception_middleware(scope.get("app"), exc)(scope, receive, capture)
+    except XMLRPCError as unhandled:
+        return HandledError(fault=exception_fault(unhandled))
+    except Exception as unhandled:
+        return HandledError(fault=exception_fault(unexpected_error(unhandled)))
+
+    body = b"".join(chunks)
+    content_type = Headers(raw=start["headers"]).get("content-type", "")
+    try:
+        if "xml" in content_type:
+            return HandledError(*decode_method_outcome(body))
+        # JSON responses are results, the JSON path renders them as XML for single calls
+        if "json" in content_type and start["status"] == 200:
+            return HandledError(orjson.loads(body))
+    except (XMLRPCError, orjson.JSONDecodeError):
+        pass
+    return HandledError(fault=exception_fault(ServerError(body.decode("utf-8", "replace"))))
+
+
 async def request_validation_error_handler(
         request: Request,
         exc: RequestValidationError,
 ):
     headers = Headers(raw=request.scope['headers'])
 
-    errors = exc.errors()
-    errors_str = ", ".join([f"{e['loc'][0]}: {e['msg']}" for e in errors])
-    errors_num = len(errors)
-
-    return XMLRPCResponse(
-        InvalidData(f"Invalid data. {errors_num} {sp(errors_num, 'error', 'errors')} found. {errors_str}")
-    )
+    return XMLRPCResponse(validation_error(exc))
 
 
 
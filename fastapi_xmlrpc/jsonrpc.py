@@ -0,0 +1,418 @@
+import asyncio
+import base64
+import time
+import zlib
+
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+import orjson
+
+from starlette.background import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from fastapi_xmlrpc.binary import BinaryFile, is_binary_content, json_default
+from fastapi_xmlrpc.compression import Compression, UnsupportedContentEncoding, decompressor
+from fastapi_xmlrpc.deadline import DEADLINE_HEADER, DeadlineExceeded, parse_timeout, run_with_deadline
+from fastapi_xmlrpc.dispatch import check_dependencies, run_route
+from fastapi_xmlrpc.errors import HandledError, handle_error
+from fastapi_xmlrpc.limits import Overloaded, acquire_all, hold
+from fastapi_xmlrpc.metrics import Metrics, UNKNOWN_METHOD
+from fastapi_xmlrpc.parser.exceptions import (
+    InvalidArguments,
+    InvalidData,
+    MethodNotFound,
+    ParseError,
+    PayloadTooLarge,
+    ServerError,
+    exception_fault
+)
+
+__all__ = ("JSONRPCResponder", "JSONRPC_CONTENT_TYPES", "is_jsonrpc")
+
+
+JSONRPC_VERSION = "2.0"
+JSONRPC_CONTENT_TYPES = ("application/json-rpc", "application/jsonrpc")
+
+# Metrics label of batch requests, the rpc. prefix is reserved by JSON-RPC, so no method can have it
+BATCH_METHOD = "rpc.batch"
+
+
+def is_jsonrpc(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() in JSONRPC_CONTENT_TYPES
+
+
+def _error(exc: BaseException, request_id: Any = None) -> dict:
+    return {"jsonrpc": JSONRPC_VERSION, **_fault_error(exception_fault(exc)), "id": request_id}
+
+
+def _fault_error(fault: dict) -> dict:
+    # Errors carry the faultCode and faultString an XML-RPC client would get for the same exception
+    return {"error": {"code": fault["faultCode"], "message": fault.get("faultString", "")}}
+
+
+def _outcome(handled: HandledError) -> dict:
+    return {"result": handled.result} if handled.fault is None else _fault_error(handled.fault)
+
+
+def _default(value: Any) -> Any:
+    # Binary results are sent as base64 text, the way JSON dispatch passes base64 arguments
+    if isinstance(value, BinaryFile):
+        try:
+            return json_default(value)
+        finally:
+            value.close()
+    return json_default(value)
+
+
+class JSONRPCResponder:
+    # JSON-RPC 2.0 over the methods of XMLRPCMiddleware, for requests with one of JSONRPC_CONTENT_TYPES.
+    # Methods are called by the same namespace.function names with positional or named params, dispatched directly
+    # with the same concurrency limits, deadlines, caches and single flights. Errors are answered by the exception
+    # handlers of the application and have the codes of the faults they answer with.
+    # Batches run up to concurrency calls at a time, notifications are run and get no response.
+    #
+    #     {"jsonrpc": "2.0", "method": "eps.test", "params": ["name"], "id": 1}
+
+    __slots__ = (
+        "endpoints", "paths", "concurrency", "metrics", "compression", "max_body_size", "trusted_clients",
+        "scope", "method_name", "fault_code", "request_size", "parse_time", "dispatch_time", "serialize_time",
+        "deadline"
+    )
+
+    def __init__(
+            self,
+            *,
+            endpoints: dict,
+            paths: dict,
+            concurrency: int,
+            metrics: Optional[Metrics] = None,
+            compression: Optional[Compression] = None,
+            max_body_size: Optional[int] = None,
+            trusted_clients: bool = False
+    ):
+        self.endpoints = endpoints
+        self.paths = paths
+        self.concurrency = concurrency
+        self.metrics = metrics
+        self.compression = compression
+        self.max_body_size = max_body_size
+        self.trusted_clients = trusted_clients
+
+        self.scope: Scope = {}
+        self.method_name = None
+        # Error code of single calls, batches are counted without one
+        self.fault_code = None
+
+        self.request_size = 0
+        self.parse_time = None
+        self.dispatch_time = None
+        self.serialize_time = None
+        self.deadline = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.compression is not None:
+            send = self.compression.wrap(Headers(scope=scope).get("Accept-Encoding", ""), send)
+
+        if self.metrics is None:
+            return await self.handle(scope, receive, send)
+
+        start = time.perf_counter()
+        size = 0
+
+        async def counting_send(message) -> None:
+            nonlocal size
+            if message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.handle(scope, receive, counting_send)
+        finally:
+            self._observe(time.perf_counter() - start, size)
+
+    def _observe(self, latency: float, response_size: int) -> None:
+        method_name = self.method_name
+        if method_name != BATCH_METHOD and method_name not in self.endpoints:
+            method_name = UNKNOWN_METHOD
+
+        phases = {"parse": self.parse_time, "dispatch": self.dispatch_time, "serialize": self.serialize_time}
+
+        self.metrics.observe(
+            method_name,
+            latency=latency,
+            phases={phase: duration for phase, duration in phases.items() if duration is not None},
+            request_size=self.request_size,
+            response_size=response_size,
+            fault_code=self.fault_code
+        )
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.scope = scope
+        headers = Headers(scope=scope)
+
+        try:
+            content_length = headers.get("Content-Length")
+            content_length = int(content_length) if content_length is not None else None
+            timeout = parse_timeout(headers.get(DEADLINE_HEADER))
+            body_decompressor = decompressor(headers.get("Content-Encoding"))
+        except UnsupportedContentEncoding as exc:
+            response = PlainTextResponse(f"Content-Encoding {exc} is not supported", status_code=415)
+            return await response(scope, receive, send)
+        except ValueError:
+            response = PlainTextResponse(
+                f"Content-Length and {DEADLINE_HEADER} headers must be numbers", status_code=400
+            )
+            return await response(scope, receive, send)
+
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+
+        # Method names are known only after the whole body is parsed, the limit of the method
+        # at the request path applies to the body
+        path_endpoint = self.paths.get(scope["path"])
+        if path_endpoint is not None:
+            self.method_name = path_endpoint.name
+        max_size = self._max_body_size(path_endpoint)
+
+        if max_size is not None and content_length is not None and content_length > max_size:
+            return await self._reject_too_large(max_size, "header", receive, send)
+
+        start = time.perf_counter()
+        try:
+            body = await self._read_body(receive, body_decompressor, max_size)
+        except PayloadTooLarge:
+            return await self._reject_too_large(max_size, "body", receive, send)
+        except zlib.error as exc:
+            response = PlainTextResponse(f"Invalid {body_decompressor.encoding} body, {exc}", status_code=400)
+            return await response(scope, receive, send)
+
+        try:
+            payload = orjson.loads(body)
+        except orjson.JSONDecodeError as exc:
+            return await self._respond(_error(ParseError(f"Invalid JSON, {exc}")), receive, send)
+        self.parse_time = time.perf_counter() - start
+
+        background = BackgroundTasks()
+
+        start = time.perf_counter()
+        if isinstance(payload, list):
+            self.method_name = BATCH_METHOD
+            if not payload:
+                return await self._respond(_error(InvalidData("Empty batch")), receive, send)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run(call):
+                async with semaphore:
+                    return await self._call(call, receive, background)
+
+            results = [result for result in await asyncio.gather(*map(run, payload)) if result is not None]
+        else:
+            if isinstance(payload, dict) and isinstance(payload.get("method"), str):
+                self.method_name = payload["method"]
+
+            results = await self._call(payload, receive, background)
+            if results is not None and "error" in results:
+                self.fault_code = results["error"]["code"]
+        self.dispatch_time = time.perf_counter() - start
+
+        # Only notifications, nothing to respond with
+        if results is None or results == []:
+            return await Response(status_code=204, background=background)(scope, receive, send)
+
+        await self._respond(results, receive, send, background=background)
+
+    async def _read_body(self, receive: Receive, body_decompressor, max_size: Optional[int]) -> bytes:
+        chunks = []
+        body_length = 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            body_length += len(chunk)
+            if max_size is not None and body_length > max_size:
+                raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+
+            if body_decompressor is not None:
+                chunk = body_decompressor.decompress(chunk, max_size)
+            chunks.append(chunk)
+
+            if not message.get("more_body", False):
+                break
+
+        if body_decompressor is not None:
+            chunks.append(body_decompressor.flush(max_size))
+
+        self.request_size = body_length
+        return b"".join(chunks)
+
+    def _max_body_size(self, endpoint) -> Optional[int]:
+        if endpoint is not None and endpoint.options.max_body_size is not None:
+            return endpoint.options.max_body_size
+        return self.max_body_size
+
+    async def _reject_too_large(self, max_size: int, reason: str, receive: Receive, send: Send) -> None:
+        if self.metrics is not None:
+            self.metrics.reject(self.method_name if self.method_name in self.endpoints else UNKNOWN_METHOD, reason)
+
+        exc = PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+        await self._respond(_error(exc), receive, send, status_code=413)
+
+    async def _respond(self, content: Any, receive: Receive, send: Send, **kwargs) -> None:
+        start = time.perf_counter()
+        response = Response(orjson.dumps(content, default=_default), media_type="application/json", **kwargs)
+        self.serialize_time = time.perf_counter() - start
+        await response(self.scope, receive, send)
+
+    async def _call(self, call: Any, receive: Receive, background: BackgroundTasks) -> Optional[dict]:
+        if not isinstance(call, dict) or call.get("jsonrpc") != JSONRPC_VERSION or not isinstance(call.get("method"), str):
+            return _error(InvalidData("Invalid Request"))
+
+        request_id = call.get("id")
+        if not isinstance(request_id, (str, int, float, type(None))) or isinstance(request_id, bool):
+            return _error(InvalidData("Invalid Request, id must be a string, a number or null"))
+        # Requests without an id are notifications
+        notification = "id" not in call
+
+        params = call.get("params", [])
+        if not isinstance(params, (list, dict)):
+            return _error(InvalidData("Invalid Request, params must be an array or an object"), request_id)
+
+        scope = self.scope
+        try:
+            endpoint = self.endpoints.get(call["method"])
+            if endpoint is None:
+                raise MethodNotFound("Method not found")
+
+            scope = dict(self.scope, path=endpoint.route.path, endpoint=endpoint.route.endpoint, path_params={})
+            outcome = await self._dispatch(endpoint, params, scope, receive, background)
+        except Exception as exc:
+            outcome = _outcome(await handle_error(scope, receive, exc))
+
+        return None if notification else {"jsonrpc": JSONRPC_VERSION, **outcome, "id": request_id}
+
+    async def _dispatch(
+            self, endpoint, params: list | dict, scope: Scope, receive: Receive, background: BackgroundTasks
+    ) -> dict:
+        # {"result": ...} or {"error": ...} of the call. Like XML-RPC calls, calls of cached and single flight methods
+        # are answered from the cache or by an equal running call once they passed the dependencies of the route
+        body = self._body(endpoint, params)
+
+        cache, single_flight = endpoint.options.cache, endpoint.options.single_flight
+        method_args = self._method_args(endpoint, params)
+        key = flight_key = None
+        if method_args is not None:
+            key = cache.key(endpoint.name, method_args, jsonrpc=True) if cache is not None else None
+            if single_flight is not None:
+                flight_key = single_flight.key(endpoint.name, method_args, jsonrpc=True)
+
+        if key is not None or flight_key is not None:
+            await check_dependencies(endpoint.route, Request(scope, receive), body)
+
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return orjson.loads(cached)
+
+        if flight_key is not None:
+            future = single_flight.join(flight_key)
+            if future is not None:
+                if self.metrics is not None:
+                    self.metrics.collapse(endpoint.name)
+
+                shared = await asyncio.shield(future)
+                if shared is not None:
+                    return orjson.loads(shared)
+
+                single_flight.fallbacks += 1
+                flight_key = None
+
+        shared = None
+        try:
+            interrupted = False
+            try:
+                content, tasks = await run_with_deadline(
+                    self._run(endpoint, body, scope, receive), self._deadline(endpoint)
+                )
+                if tasks is not None:
+                    background.add_task(tasks)
+                outcome = {"result": content}
+            except Exception as exc:
+                # Faults of shed and timed out calls aren't shared, the followers may have a slot or time left
+                interrupted = isinstance(exc, (Overloaded, DeadlineExceeded))
+                outcome = _outcome(await handle_error(scope, receive, exc))
+
+            if key is None and flight_key is None:
+                return outcome
+
+            # Files in the result are read and closed by encoding it
+            encoded = orjson.dumps(outcome, default=_default)
+            if not interrupted:
+                shared = encoded
+        finally:
+            if flight_key is not None:
+                single_flight.finish(flight_key, shared)
+
+        if key is not None and "result" in outcome:
+            cache.set(key, encoded)
+        return orjson.loads(encoded)
+
+    @staticmethod
+    def _body(endpoint, params: list | dict) -> Any:
+        # Same body as XML-RPC calls get, named params are passed by their names
+        if isinstance(params, dict):
+            unknown = params.keys() - set(endpoint.args)
+            if unknown:
+                raise InvalidArguments(f"Unknown params {', '.join(sorted(unknown))}")
+            if len(endpoint.args) > 1 or endpoint.embed:
+                return params
+            return params.get(endpoint.args[0]) if endpoint.args else None
+
+        if len(endpoint.args) < len(params):
+            raise InvalidArguments('error')
+        if len(params) > 1 or endpoint.embed:
+            return dict(zip(endpoint.args, params))
+        return params[0] if params else None
+
+    @staticmethod
+    def _method_args(endpoint, params: list | dict) -> Optional[list]:
+        # Arguments the cache and single flight keys are made of, None when named params skip one of the parameters
+        if isinstance(params, list):
+            return params
+        names = endpoint.args[:len(params)]
+        if params.keys() != set(names):
+            return None
+        return [params[name] for name in names]
+
+    def _deadline(self, endpoint) -> Optional[float]:
+        timeout = endpoint.options.timeout
+        if timeout is None:
+            return self.deadline
+        deadline = time.monotonic() + timeout
+        return deadline if self.deadline is None else min(deadline, self.deadline)
+
+    async def _run(self, endpoint, body: Any, scope: Scope, receive: Receive):
+        limits = endpoint.options.limits
+        await acquire_all(limits)
+        with hold(limits):
+            result = await run_route(
+                endpoint.route, Request(scope, receive), body, endpoint.plan if self.trusted_clients else None
+            )
+
+            content = result.content
+            if isinstance(content, Response):
+                raise ServerError(f"{endpoint.name} returned a response, it can't be called over JSON-RPC")
+            if isinstance(content, AsyncIterator):
+                content = [item async for item in content]
+            elif is_binary_content(content) and not isinstance(content, (bytes, BinaryFile)):
+                # Files returned by the endpoint
+                try:
+                    content = base64.b64encode(await run_in_threadpool(content.read)).decode()
+                finally:
+                    content.close()
+
+        return content, result.background
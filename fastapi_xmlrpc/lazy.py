@@ -0,0 +1,122 @@
+import asyncio
+
+from collections import deque
+from typing import Any, Callable, Generic, Iterable, Optional, TypeVar
+
+from fastapi.exceptions import RequestValidationError
+
+__all__ = ("LazyArray", "LAZY_QUEUE_SIZE")
+
+
+T = TypeVar("T")
+
+# Decoded items waiting for the endpoint, the body isn't read further while the queue is full
+LAZY_QUEUE_SIZE = 64
+
+
+class LazyArray(Generic[T]):
+    # Parameter type of arrays too large to be held in memory, the endpoint iterates the items
+    # while the rest of the request body is still being received and parsed.
+    # Only the last parameter of an endpoint can be lazy, items are validated as they are consumed.
+    #
+    #     @router.xml_rpc(namespace="bulk", function_name="import_rows")
+    #     async def import_rows(source: str = Body(...), rows: LazyArray[Row] = Body(...)):
+    #         async for row in rows:
+    #             ...
+    #
+    # Calls that don't stream, small bodies, multicall entries and JSON-RPC, get the decoded list as a LazyArray
+
+    __slots__ = ("items", "max_size", "closed", "error", "abandoned", "convert", "getter", "putter")
+
+    def __init__(self, max_size: int = LAZY_QUEUE_SIZE):
+        self.items = deque()
+        self.max_size = max_size
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        # Set once the endpoint is done, items put after that are dropped
+        self.abandoned = False
+        # Applied to every item as it is consumed, validation or the decoding plan of trusted clients
+        self.convert: Optional[Callable[[Any], Any]] = None
+
+        # The consumer waiting for an item and the producer waiting for space, one of each at most
+        self.getter: Optional[asyncio.Future] = None
+        self.putter: Optional[asyncio.Future] = None
+
+    @classmethod
+    def from_items(cls, items: Iterable) -> "LazyArray":
+        lazy = cls()
+        lazy.items.extend(items)
+        lazy.closed = True
+        return lazy
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value, field):
+        if isinstance(value, list):
+            value = cls.from_items(value)
+        elif not isinstance(value, cls):
+            raise TypeError('array expected')
+
+        if field.sub_fields and value.convert is None:
+            value.convert = _item_validator(field)
+        return value
+
+    async def put(self, item: Any) -> None:
+        while len(self.items) >= self.max_size and not self.abandoned:
+            self.putter = asyncio.get_running_loop().create_future()
+            await self.putter
+
+        if not self.abandoned:
+            self.items.append(item)
+            _wake(self.getter)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        # error is raised to the endpoint after the items received before it
+        self.closed = True
+        self.error = error
+        _wake(self.getter)
+
+    def abandon(self) -> None:
+        self.abandoned = True
+        self.items.clear()
+        _wake(self.putter)
+
+    def __aiter__(self) -> "LazyArray[T]":
+        return self
+
+    async def __anext__(self) -> T:
+        while not self.items:
+            if self.closed:
+                if self.error is not None:
+                    raise self.error
+                raise StopAsyncIteration
+            self.getter = asyncio.get_running_loop().create_future()
+            await self.getter
+
+        # The reference is dropped here, consumed items are freed as soon as the endpoint lets them go
+        item = self.items.popleft()
+        _wake(self.putter)
+        return item if self.convert is None else self.convert(item)
+
+
+def _wake(future: Optional[asyncio.Future]) -> None:
+    if future is not None and not future.done():
+        future.set_result(None)
+
+
+def _item_validator(field) -> Callable[[Any], Any]:
+    item_field = field.sub_fields[0]
+    index = 0
+
+    def validate(item: Any) -> Any:
+        nonlocal index
+        value, errors = item_field.validate(item, {}, loc=("body", field.alias, index))
+        index += 1
+        if errors:
+            raise RequestValidationError([errors])
+        return value
+
+    return validate
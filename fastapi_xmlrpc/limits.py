@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterator, Optional, Sequence
+
+from fastapi.dependencies.models import Dependant
+
+from fastapi_xmlrpc.metrics import Histogram, LATENCY_BUCKETS
+from fastapi_xmlrpc.parser.exceptions import ServerError
+
+__all__ = ("ConcurrencyLimit", "Overloaded", "acquire_all", "release_all", "hold", "hold_in_threads")
+
+
+class Overloaded(ServerError):
+    # Sent as a ServerError fault, clients see the same faultCode
+    pass
+
+
+class ConcurrencyLimit:
+    # At most max_concurrency calls run at a time, up to max_queue more wait for a free slot in arrival order,
+    # calls beyond that are shed with an Overloaded fault right away.
+    # Set per method with xml_rpc(max_concurrency=...), per namespace with XmlRpcAPIRouter.limit_namespace
+
+    __slots__ = ("name", "max_concurrency", "max_queue", "running", "waiters", "admitted", "shed", "wait_time")
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int = 0):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+
+        self.running = 0
+        self.waiters: deque[asyncio.Future] = deque()
+
+        self.admitted = 0
+        self.shed = 0
+        # Time admitted calls spent in the queue, 0 for the ones that found a free slot
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+
+    async def acquire(self) -> None:
+        if self.running < self.max_concurrency and not self.waiters:
+            self.running += 1
+            self._admit(0.0)
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            self.shed += 1
+            raise Overloaded(f"{self.name} is overloaded, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        start = time.perf_counter()
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # The slot was handed over, but the waiting call went away
+                self.release()
+            elif future in self.waiters:
+                self.waiters.remove(future)
+            raise
+
+        self._admit(time.perf_counter() - start)
+
+    def release(self) -> None:
+        # The slot goes straight to the first waiter, so running stays the same
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def _admit(self, wait_time: float) -> None:
+        self.admitted += 1
+        self.wait_time.observe(wait_time)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "wait_seconds": self.wait_time.sum,
+        }
+
+
+async def acquire_all(limits: Sequence[ConcurrencyLimit]) -> None:
+    # Always in the same order, method then namespace, so calls can't wait on each other in a cycle
+    acquired = []
+    try:
+        for limit in limits:
+            await limit.acquire()
+            acquired.append(limit)
+    except BaseException:
+        release_all(acquired)
+        raise
+
+
+def release_all(limits: Sequence[ConcurrencyLimit]) -> None:
+    for limit in reversed(limits):
+        limit.release()
+
+
+class HeldSlots:
+    # Slots of a running call. A cancelled call of a sync endpoint goes on in its worker thread,
+    # the slots are released when the thread is done, not when the call is cancelled
+
+    __slots__ = ("limits", "loop", "lock", "threads", "done")
+
+    def __init__(self, limits: Sequence[ConcurrencyLimit]):
+        self.limits = limits
+        self.loop = asyncio.get_running_loop()
+        self.lock = threading.Lock()
+        self.threads = 0
+        self.done = False
+
+    def enter_thread(self) -> None:
+        with self.lock:
+            if self.done:
+                # The call was cancelled before its thread started, the endpoint isn't run at all
+                raise asyncio.CancelledError()
+            self.threads += 1
+
+    def exit_thread(self) -> None:
+        with self.lock:
+            self.threads -= 1
+            release = self.done and not self.threads
+        if release:
+            try:
+                self.loop.call_soon_threadsafe(release_all, self.limits)
+            except RuntimeError:
+                # The loop is closed, there is nothing to release the slots to
+                pass
+
+    def release(self) -> None:
+        with self.lock:
+            self.done = True
+            release = not self.threads
+        if release:
+            release_all(self.limits)
+
+
+_held: ContextVar[Optional[HeldSlots]] = ContextVar("xmlrpc_held_slots", default=None)
+
+
+@contextmanager
+def hold(limits: Sequence[ConcurrencyLimit]) -> Iterator[None]:
+    # Releases the acquired slots of limits when the block is done, see HeldSlots
+    if not limits:
+        yield
+        return
+
+    held = HeldSlots(limits)
+    token = _held.set(held)
+    try:
+        yield
+    finally:
+        _held.reset(token)
+        held.release()
+
+
+def hold_in_threads(dependant: Dependant) -> None:
+    # Makes the sync endpoint of dependant keep the slots of its call while it runs in a worker thread.
+    # The context of the call is copied to the thread by run_in_threadpool
+    call = dependant.call
+    if asyncio.iscoroutinefunction(call) or getattr(call, "holds_slots", False):
+        return
+
+    @wraps(call)
+    def holding(*args, **kwargs):
+        held = _held.get()
+        if held is None:
+            return call(*args, **kwargs)
+
+        held.enter_thread()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            held.exit_thread()
+
+    holding.holds_slots = True
+    dependant.call = holding
@@ -0,0 +1,245 @@
+import re
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from starlette.types import Message, Send
+
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+if TYPE_CHECKING:
+    # fastapi_xmlrpc.limits builds its wait time histograms from this module
+    from fastapi_xmlrpc.limits import ConcurrencyLimit
+
+__all__ = ("Metrics", "MethodMetrics", "Histogram", "ResponseMeter", "CONTENT_TYPE", "UNKNOWN_METHOD")
+
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PHASES = ("parse", "dispatch", "serialize")
+
+# Calls of methods without an endpoint share one label, so clients can't grow the label set
+UNKNOWN_METHOD = "unknown"
+
+FAULT_CODE = re.compile(rb"<name>faultCode</name><value><(?:i4|int)>(-?\d+)</")
+
+
+class Histogram:
+    # Prometheus style histogram, counts are kept per bucket and accumulated on export
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class MethodMetrics:
+    __slots__ = ("latency", "phases", "request_size", "response_size", "faults", "collapsed", "rejected")
+
+    def __init__(self, latency_buckets: Sequence[float], size_buckets: Sequence[float]):
+        self.latency = Histogram(latency_buckets)
+        self.phases = {phase: Histogram(latency_buckets) for phase in PHASES}
+        self.request_size = Histogram(size_buckets)
+        self.response_size = Histogram(size_buckets)
+        self.faults: dict[int, int] = {}
+        # Calls answered with the response of an equal call running at the same time
+        self.collapsed = 0
+        # Requests refused for their body size, by where they were refused: "header" or "body"
+        self.rejected: dict[str, int] = {}
+
+
+class ResponseMeter:
+    # Wraps ASGI send, counts response bytes and picks the fault code out of the first body chunk
+
+    __slots__ = ("send", "status", "size", "fault_code", "first_chunk")
+
+    def __init__(self, send: Send):
+        self.send = send
+        self.status = None
+        self.size = 0
+        self.fault_code = None
+        self.first_chunk = True
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            self.size += len(body)
+
+            if self.first_chunk and body:
+                self.first_chunk = False
+                if body.startswith(XMLRPCHandler.FAULT_HEAD):
+                    match = FAULT_CODE.search(body, len(XMLRPCHandler.FAULT_HEAD), 512)
+                    if match is not None:
+                        self.fault_code = int(match.group(1))
+
+        await self.send(message)
+
+
+class Metrics:
+    # Per method metrics of XMLRPCMiddleware, served in Prometheus text format on GET path
+
+    __slots__ = ("path", "latency_buckets", "size_buckets", "methods", "limits")
+
+    def __init__(
+            self,
+            path: str = "/metrics",
+            *,
+            latency_buckets: Sequence[float] = LATENCY_BUCKETS,
+            size_buckets: Sequence[float] = SIZE_BUCKETS
+    ):
+        self.path = path
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.size_buckets = tuple(sorted(size_buckets))
+
+        self.methods: dict[str, MethodMetrics] = {}
+        # Concurrency limits of the methods, by limit name, they keep their own counters
+        self.limits: dict[str, "ConcurrencyLimit"] = {}
+
+    def method(self, method_name: str) -> MethodMetrics:
+        metrics = self.methods.get(method_name)
+        if metrics is None:
+            metrics = self.methods[method_name] = MethodMetrics(self.latency_buckets, self.size_buckets)
+        return metrics
+
+    def observe(
+            self,
+            method_name: str,
+            *,
+            latency: float,
+            phases: dict[str, float],
+            request_size: int,
+            response_size: int,
+            fault_code: Optional[int] = None
+    ) -> None:
+        metrics = self.method(method_name)
+
+        metrics.latency.observe(latency)
+        for phase, duration in phases.items():
+            metrics.phases[phase].observe(duration)
+        metrics.request_size.observe(request_size)
+        metrics.response_size.observe(response_size)
+
+        if fault_code is not None:
+            metrics.faults[fault_code] = metrics.faults.get(fault_code, 0) + 1
+
+    def collapse(self, method_name: str) -> None:
+        self.method(method_name).collapsed += 1
+
+    def reject(self, method_name: str, reason: str) -> None:
+        rejected = self.method(method_name).rejected
+        rejected[reason] = rejected.get(reason, 0) + 1
+
+    def register_limits(self, limits: Sequence["ConcurrencyLimit"]) -> None:
+        for limit in limits:
+            self.limits[limit.name] = limit
+
+    def reset(self) -> None:
+        self.methods.clear()
+
+    def render(self) -> bytes:
+        lines = []
+
+        def histogram(name: str, help_text: str, histograms):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, value in histograms:
+                for bound, count in value.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {value.sum}")
+                lines.append(f"{name}_count{{{labels}}} {value.count}")
+
+        methods = sorted((_label(name), metrics) for name, metrics in self.methods.items())
+
+        histogram(
+            "xmlrpc_request_duration_seconds",
+            "Time from the first request byte to the last response byte.",
+            ((f'method="{name}"', metrics.latency) for name, metrics in methods)
+        )
+        histogram(
+            "xmlrpc_phase_duration_seconds",
+            "Time spent parsing the request, in the endpoint and serializing the response.",
+            (
+                (f'method="{name}",phase="{phase}"', metrics.phases[phase])
+                for name, metrics in methods
+                for phase in PHASES
+                if metrics.phases[phase].count
+            )
+        )
+        histogram(
+            "xmlrpc_request_size_bytes",
+            "Size of request bodies.",
+            ((f'method="{name}"', metrics.request_size) for name, metrics in methods)
+        )
+        histogram(
+            "xmlrpc_response_size_bytes",
+            "Size of response bodies.",
+            ((f'method="{name}"', metrics.response_size) for name, metrics in methods)
+        )
+
+        lines.append("# HELP xmlrpc_faults_total Fault responses by faultCode.")
+        lines.append("# TYPE xmlrpc_faults_total counter")
+        for name, metrics in methods:
+            for code, count in sorted(metrics.faults.items()):
+                lines.append(f'xmlrpc_faults_total{{method="{name}",code="{code}"}} {count}')
+
+        lines.append("# HELP xmlrpc_single_flight_collapsed_total Calls that shared the execution of an equal call.")
+        lines.append("# TYPE xmlrpc_single_flight_collapsed_total counter")
+        for name, metrics in methods:
+            if metrics.collapsed:
+                lines.append(f'xmlrpc_single_flight_collapsed_total{{method="{name}"}} {metrics.collapsed}')
+
+        lines.append("# HELP xmlrpc_rejected_requests_total Requests rejected because their body is too large.")
+        lines.append("# TYPE xmlrpc_rejected_requests_total counter")
+        for name, metrics in methods:
+            for reason, count in sorted(metrics.rejected.items()):
+                lines.append(f'xmlrpc_rejected_requests_total{{method="{name}",reason="{reason}"}} {count}')
+
+        limits = sorted((_label(name), limit) for name, limit in self.limits.items())
+
+        lines.append("# HELP xmlrpc_concurrency_running Calls holding a slot of a concurrency limit.")
+        lines.append("# TYPE xmlrpc_concurrency_running gauge")
+        for name, limit in limits:
+            lines.append(f'xmlrpc_concurrency_running{{limit="{name}"}} {limit.running}')
+
+        lines.append("# HELP xmlrpc_concurrency_queued Calls waiting for a slot of a concurrency limit.")
+        lines.append("# TYPE xmlrpc_concurrency_queued gauge")
+        for name, limit in limits:
+            lines.append(f'xmlrpc_concurrency_queued{{limit="{name}"}} {limit.queued}')
+
+        lines.append("# HELP xmlrpc_concurrency_shed_total Calls answered with a fault because the queue was full.")
+        lines.append("# TYPE xmlrpc_concurrency_shed_total counter")
+        for name, limit in limits:
+            lines.append(f'xmlrpc_concurrency_shed_total{{limit="{name}"}} {limit.shed}')
+
+        histogram(
+            "xmlrpc_concurrency_wait_seconds",
+            "Time admitted calls waited for a slot of a concurrency limit.",
+            ((f'limit="{name}"', limit.wait_time) for name, limit in limits)
+        )
+
+        lines.append("")
+        return "\n".join(lines).encode()
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
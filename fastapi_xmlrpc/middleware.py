@@ -1,78 +1,374 @@
+import asyncio
+import time
+import zlib
 import orjson
 
+from collections.abc import AsyncIterator
+from copy import deepcopy
 from inspect import (
     signature,
     getfullargspec,
     Parameter
 )
 from functools import wraps
-from typing import NamedTuple
+from typing import NamedTuple, Optional, Sequence
 
 from fastapi.params import Body
 from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from starlette.datastructures import MutableHeaders
+from starlette.background import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
 from starlette.types import ASGIApp, Scope, Receive, Send, Message
 
-from fastapi_xmlrpc.parser.exceptions import ParseError, InvalidArguments
-from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+from fastapi_xmlrpc.binary import BinaryFile, is_binary_content, json_default
+from fastapi_xmlrpc.cache import ResponseRecorder
+from fastapi_xmlrpc.compression import Compression, UnsupportedContentEncoding, decompressor
+from fastapi_xmlrpc.deadline import DeadlineExceeded, DEADLINE_HEADER, parse_timeout, run_with_deadline
+from fastapi_xmlrpc.dispatch import (
+    run_route,
+    build_response,
+    check_dependencies,
+    is_stream_endpoint,
+    is_binary_endpoint,
+    file_params,
+    lazy_param
+)
+from fastapi_xmlrpc.errors import exception_middleware, handle_error
+from fastapi_xmlrpc.parser.exceptions import (
+    ParseError,
+    InvalidArguments,
+    MethodNotFound,
+    PayloadTooLarge,
+    ServerError
+)
+from fastapi_xmlrpc.jsonrpc import JSONRPCResponder, is_jsonrpc
+from fastapi_xmlrpc.lazy import LazyArray
+from fastapi_xmlrpc.limits import ConcurrencyLimit, Overloaded, acquire_all, hold
+from fastapi_xmlrpc.metrics import Metrics, ResponseMeter, CONTENT_TYPE, UNKNOWN_METHOD
+from fastapi_xmlrpc.offload import OffloadPolicy, estimate_size
+from fastapi_xmlrpc.plan import DecodePlan
+from fastapi_xmlrpc.profiling import Profiler
+from fastapi_xmlrpc.parser.decoder import XMLRPCBufferedParser, XMLRPCStreamParser
+from fastapi_xmlrpc.parser.parser import MULTICALL_METHOD, XMLRPCHandler
 from fastapi_xmlrpc.responses import XMLRPCResponse
-from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter, XmlRpcMethodOptions
+from fastapi_xmlrpc.snapshot import Snapshot, MethodSnapshot
 from open_api.schema_generator import SchemaGenerator
 
 
+# Bodies up to this size are decoded with expat instead of building an lxml tree
+FAST_DECODER_MAX_SIZE = 16 * 1024
+
+# How many system.multicall entries of one request run at the same time
+MULTICALL_CONCURRENCY = 10
+
+
 class Error(BaseModel):
     faultCode: int
     faultMessage: str
 
 
 class EndpointParam(NamedTuple):
+    name: str
     args: list[str]
     embed: bool
+    route: APIRoute
+    stream: bool
+    binary: bool
+    file_args: frozenset
+    # Index of the LazyArray parameter, always the last one
+    lazy: Optional[int]
+    options: XmlRpcMethodOptions
+    plan: DecodePlan
+    # Offload policy of the router of the endpoint
+    offload_policy: Optional[OffloadPolicy]
+
+
+def json_to_xml(body: bytes) -> bytes:
+    try:
+        return XMLRPCHandler.format_success(orjson.loads(body))
+    except orjson.JSONDecodeError:
+        return body
+
+
+def include_prefix(router: XmlRpcAPIRouter, included: dict[str, APIRoute]) -> Optional[str]:
+    # The prefix include_router put before the paths of the routes of router, None when it wasn't included.
+    # Every route of the router must be at the prefix followed by its own path, with its own endpoint and class
+    if not router.routes:
+        return None
+
+    first = router.routes[0]
+    for path, route in included.items():
+        if route.endpoint is not first.endpoint or type(route) is not type(first) or not path.endswith(first.path):
+            continue
+        prefix = path[:len(path) - len(first.path)]
+        if all(
+            getattr(included.get(prefix + item.path), "endpoint", None) is item.endpoint for item in router.routes
+        ):
+            return prefix
+    return None
+
+
+def build_body(endpoint: EndpointParam, method_args: list):
+    # Large base64 values are passed as files only to parameters annotated with Base64
+    if any(isinstance(arg, BinaryFile) for arg in method_args):
+        method_args = [
+            arg.getvalue() if isinstance(arg, BinaryFile) and name not in endpoint.file_args else arg
+            for name, arg in zip(endpoint.args, method_args)
+        ]
+
+    # If endpoint has one or more arguments, send them as structure
+    # where key is argument name and value is any supported type
+    if len(method_args) > 1 or endpoint.embed:
+        return dict(
+            zip(
+                endpoint.args,
+                method_args
+            )
+        )
+    # If endpoint has only one argument, send data as flat structure without argument key
+    elif len(method_args) == 1:
+        return method_args[0]
+
+    return None
 
 
 class XMLRPCResponder:
 
     __slots__ = (
-        "app", "endpoints", "router", "scope", "message", "method_name", "method_args", "initial_message", "send"
+        "app", "endpoints", "paths", "offload_policy", "direct_dispatch", "fast_decoder_max_size", "multicall_concurrency",
+        "metrics", "profiler", "compression", "max_body_size", "trusted_clients", "scope", "message", "method_name", "method_args", "endpoint",
+        "initial_message", "send", "request_size", "parse_time", "dispatch_start", "dispatch_time", "serialize_time",
+        "served_from", "deadline", "interrupted"
     )
 
-    def __init__(self, app: ASGIApp, *, endpoints: dict[str, EndpointParam], router: XmlRpcAPIRouter) -> None:
+    def __init__(
+            self,
+            app: ASGIApp,
+            *,
+            endpoints: dict[str, EndpointParam],
+            paths: dict[str, EndpointParam],
+            offload_policy: Optional[OffloadPolicy] = None,
+            direct_dispatch: bool = False,
+            fast_decoder_max_size: int = FAST_DECODER_MAX_SIZE,
+            multicall_concurrency: int = MULTICALL_CONCURRENCY,
+            metrics: Optional[Metrics] = None,
+            profiler: Optional[Profiler] = None,
+            compression: Optional[Compression] = None,
+            max_body_size: Optional[int] = None,
+            trusted_clients: bool = False
+    ) -> None:
         self.app = app
         self.endpoints = endpoints
-        self.router = router
+        self.paths = paths
+        self.offload_policy = offload_policy
+        self.direct_dispatch = direct_dispatch
+        self.fast_decoder_max_size = fast_decoder_max_size
+        self.multicall_concurrency = multicall_concurrency
+        self.metrics = metrics
+        self.profiler = profiler
+        self.compression = compression
+        self.max_body_size = max_body_size
+        self.trusted_clients = trusted_clients
 
         self.scope: Scope = {}
         self.message: Message = {}
 
         self.method_name = None
         self.method_args = None
+        self.endpoint: Optional[EndpointParam] = None
 
         self.initial_message = None
 
+        # Phase timings in seconds, None for phases the request didn't reach
+        self.request_size = 0
+        self.parse_time = None
+        self.dispatch_start = None
+        self.dispatch_time = None
+        self.serialize_time = None
+        # "cache" or "single-flight" when the response was a copy of another one
+        self.served_from = None
+        # time.monotonic() the client stops waiting at, from the DEADLINE_HEADER of the request
+        self.deadline = None
+        # The call was shed or timed out, its fault isn't shared with the followers of its single flight
+        self.interrupted = False
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        self.scope = scope.copy()
+        if self.compression is not None:
+            send = self.compression.wrap(Headers(scope=scope).get("Accept-Encoding", ""), send)
 
-        headers = MutableHeaders(scope=self.scope)
+        if self.profiler is not None and self.profiler.enabled:
+            send = self._send_with_server_timing(send)
+
+        if self.metrics is None:
+            return await self.handle(scope, receive, send)
+
+        start = time.perf_counter()
+        send = meter = ResponseMeter(send)
+        try:
+            await self.handle(scope, receive, send)
+        finally:
+            self._observe(time.perf_counter() - start, meter)
+
+    def _observe(self, latency: float, meter: ResponseMeter) -> None:
+        method_name = self.method_name
+        if method_name != MULTICALL_METHOD and method_name not in self.endpoints:
+            method_name = UNKNOWN_METHOD
+
+        phases = {"parse": self.parse_time, "dispatch": self.dispatch_time, "serialize": self.serialize_time}
+
+        self.metrics.observe(
+            method_name,
+            latency=latency,
+            phases={phase: duration for phase, duration in phases.items() if duration is not None},
+            request_size=self.request_size,
+            response_size=meter.size,
+            fault_code=meter.fault_code
+        )
 
-        self.message = await receive()
+    def _send_with_server_timing(self, send: Send) -> Send:
+        async def wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Cached start messages are shared, the header goes into a copy
+                header = (b"server-timing", self._server_timing().encode("latin-1"))
+                message = dict(message, headers=[*message.get("headers", ()), header])
+            await send(message)
 
-        # Read body
-        body = self.message["body"]
-        while self.message.get("more_body", False):
-            self.message = await receive()
-            body += self.message["body"]
+        return wrapper
 
-        # Check Content-Length header
-        body_length = len(body)
+    def _server_timing(self) -> str:
+        # Sent with the response start, so streamed results only count up to their first chunk
+        timings = []
+        if self.parse_time is not None:
+            timings.append(f"parse;dur={self.parse_time * 1000:.3f}")
+        if self.dispatch_start is not None:
+            serialize_time = self.serialize_time or 0.0
+            dispatch_time = time.perf_counter() - self.dispatch_start - serialize_time
+            timings.append(f"dispatch;dur={dispatch_time * 1000:.3f}")
+            timings.append(f"serialize;dur={serialize_time * 1000:.3f}")
+        elif self.served_from is not None:
+            timings.append(f'{self.served_from};desc="hit"')
+        else:
+            timings.append('error;desc="rejected"')
+        return ", ".join(timings)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.scope = scope.copy()
+
+        headers = MutableHeaders(scope=self.scope)
+
+        # Check Content-Length header, chunked bodies come without one and are measured as they arrive
         content_length_header = headers.get("Content-Length")
-        if content_length_header is None:
+        if content_length_header is None and "chunked" not in headers.get("Transfer-Encoding", "").lower():
             response = PlainTextResponse(
                 "Content-Length header not found",
                 status_code=400
             )
             return await response(self.scope, receive, send)
-        elif int(content_length_header) != body_length:
+
+        try:
+            content_length = int(content_length_header) if content_length_header is not None else None
+        except ValueError:
+            response = PlainTextResponse("Content-Length header must be an integer", status_code=400)
+            return await response(self.scope, receive, send)
+
+        try:
+            timeout = parse_timeout(headers.get(DEADLINE_HEADER))
+        except ValueError:
+            response = PlainTextResponse(f"{DEADLINE_HEADER} header must be a number of seconds", status_code=400)
+            return await response(self.scope, receive, send)
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+
+        # Oversized requests are refused before any of the body is read.
+        # Until the method name is parsed, the limit of the method at the request path applies
+        path_endpoint = self.paths.get(self.scope["path"])
+        max_size = self._max_body_size(path_endpoint)
+        if max_size is not None and content_length is not None and content_length > max_size:
+            self.method_name = path_endpoint.name if path_endpoint is not None else None
+            return await self._reject_too_large(max_size, "header", receive, send)
+
+        # Compressed bodies are inflated chunk by chunk before parsing
+        try:
+            body_decompressor = decompressor(headers.get("Content-Encoding"))
+        except UnsupportedContentEncoding as exc:
+            response = PlainTextResponse(f"Content-Encoding {exc} is not supported", status_code=415)
+            return await response(self.scope, receive, send)
+
+        # Small bodies are buffered and decoded in one pass,
+        # for larger ones every chunk is parsed as soon as it arrives,
+        # huge ones are buffered and decoded outside the event loop when the router asks for it.
+        # The size of a compressed body is unknown until it is inflated, so it is always parsed as it arrives
+        # Chunked bodies are parsed as they arrive too, their size is unknown up front.
+        # Until the method name is parsed, the policy of the method at the request path applies
+        offload_policy = path_endpoint.offload_policy if path_endpoint is not None else self.offload_policy
+        # Bodies of lazy endpoints are never offloaded, their items are fed to the endpoint as they are parsed
+        offload = (
+            offload_policy is not None and content_length is not None and offload_policy.should_offload(content_length)
+            and (path_endpoint is None or path_endpoint.lazy is None)
+        )
+        if offload or (
+                body_decompressor is None and content_length is not None and content_length <= self.fast_decoder_max_size
+        ):
+            parser = XMLRPCBufferedParser()
+        else:
+            parser = XMLRPCStreamParser()
+
+        body_length = 0
+        method_checked = False
+        lazy_endpoint = None
+        start = time.perf_counter()
+        try:
+            while True:
+                self.message = await receive()
+                chunk = self.message.get("body", b"")
+                body_length += len(chunk)
+                if max_size is not None and body_length > max_size:
+                    raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+
+                if body_decompressor is not None:
+                    chunk = body_decompressor.decompress(chunk, max_size)
+                parser.feed(chunk)
+
+                # The limit of the called method applies as soon as its name is parsed
+                if not method_checked and parser.method_name is not None:
+                    method_checked = True
+                    endpoint = self.endpoints.get(parser.method_name)
+                    max_size = self._max_body_size(endpoint)
+                    if max_size is not None and max(body_length, parser.size) > max_size:
+                        raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+
+                    # The rest of the body is read by _dispatch_lazy
+                    if endpoint is not None and endpoint.lazy is not None:
+                        lazy_endpoint = endpoint
+                        break
+
+                if not self.message.get("more_body", False):
+                    break
+
+            if lazy_endpoint is None and body_decompressor is not None:
+                parser.feed(body_decompressor.flush(max_size))
+        except PayloadTooLarge:
+            self.request_size = body_length
+            self.method_name = parser.method_name or (path_endpoint.name if path_endpoint is not None else None)
+            return await self._reject_too_large(max_size, "body", receive, send)
+        except ParseError as exc:
+            return await XMLRPCResponse(exc)(self.scope, receive, send)
+        except zlib.error as exc:
+            response = PlainTextResponse(f"Invalid {body_decompressor.encoding} body, {exc}", status_code=400)
+            return await response(self.scope, receive, send)
+
+        if lazy_endpoint is not None:
+            return await self._dispatch_lazy(
+                lazy_endpoint, parser, body_decompressor, max_size, body_length, start, receive, send
+            )
+
+        self.request_size = body_length
+        if content_length is not None and content_length != body_length:
             response = PlainTextResponse(
                 f"Content-Length header value and body length mismatch, {content_length_header} != {body_length}",
                 status_code=400
@@ -80,44 +376,415 @@ class XMLRPCResponder:
             return await response(self.scope, receive, send)
 
         try:
-            self.method_name, self.method_args = XMLRPCHandler.handle(body)
+            if offload:
+                self.method_name, self.method_args = await offload_policy.run("parse", body_length, parser.close)
+            else:
+                self.method_name, self.method_args = parser.close()
         except ParseError as exc:
             return await XMLRPCResponse(exc)(self.scope, receive, send)
 
-        if len(self.endpoints[self.scope['path']].args) < len(self.method_args):
+        self.parse_time = time.perf_counter() - start
+
+        # Buffered bodies are checked against the limit of the called method once it is known
+        if not method_checked:
+            max_size = self._max_body_size(self.endpoints.get(self.method_name))
+            if max_size is not None and max(body_length, parser.size) > max_size:
+                return await self._reject_too_large(max_size, "body", receive, send)
+
+        # Entries of a multicall run within their own method timeouts, the client deadline covers all of them
+        if self.method_name == MULTICALL_METHOD:
+            return await self._within_deadline(
+                lambda send: self._timed_dispatch(self.multicall(receive, send)), self.deadline, receive, send
+            )
+
+        # Methods are looked up by name in the index of the included routes, the request path doesn't matter
+        endpoint = self.endpoint = self.endpoints.get(self.method_name)
+        if endpoint is None:
+            return await XMLRPCResponse(MethodNotFound("Method not found"))(self.scope, receive, send)
+
+        if len(endpoint.args) < len(self.method_args):
             return await XMLRPCResponse(InvalidArguments('error'))(self.scope, receive, send)
 
-        headers["Content-Type"] = "application/json"
+        # The scope gets what route matching adds, direct dispatch skips the router of the application
+        self.scope.update(path=endpoint.route.path, endpoint=endpoint.route.endpoint, path_params={})
+
+        cache, single_flight = endpoint.options.cache, endpoint.options.single_flight
+
+        key = cache.key(self.method_name, self.method_args) if cache is not None else None
+        flight_key = single_flight.key(self.method_name, self.method_args) if single_flight is not None else None
+        if flight_key is None:
+            single_flight = None
+
+        # A response of another call is only shared once this call passed the dependencies of the route
+        if key is not None or single_flight is not None:
+            if not await self._check_dependencies(endpoint, receive, send):
+                return
+
+        # Cached methods are answered with the stored XML bytes, without dispatch
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                self.served_from = "cache"
+                return await cached.send(send)
+
+        # A call equal to a running one waits for its response instead of running the endpoint again
+        if single_flight is not None:
+            future = single_flight.join(flight_key)
+            if future is not None:
+                if self.metrics is not None:
+                    self.metrics.collapse(self.method_name)
+
+                # Shielded, a disconnected follower must not cancel the response of the others
+                shared = await asyncio.shield(future)
+                if shared is not None:
+                    self.served_from = "single-flight"
+                    return await shared.send(send)
+
+                single_flight.fallbacks += 1
+                single_flight = None
+
+        if key is not None or single_flight is not None:
+            send = recorder = ResponseRecorder(send)
+
+        try:
+            await self._within_deadline(
+                lambda send: self._run(endpoint, receive, send), self._deadline(endpoint), receive, send
+            )
+        except BaseException:
+            if single_flight is not None:
+                single_flight.finish(flight_key, None)
+            raise
 
-        self.scope["path"] = self._gen_endpoint_path(self.method_name)
+        if single_flight is not None:
+            # Followers get the faults of the endpoint, but run on their own when the call was shed or timed out,
+            # they may have a slot or time left
+            single_flight.finish(flight_key, None if self.interrupted else recorder.response(faults=True))
 
+        if key is not None and (cached := recorder.response()) is not None:
+            cache.set(key, cached)
+
+    async def _check_dependencies(self, endpoint: EndpointParam, receive: Receive, send: Send) -> bool:
+        # False when the call was answered with the error of a dependency
         self.send = send
+        try:
+            await check_dependencies(endpoint.route, Request(self.scope, receive), self._build_body())
+        except Exception as exc:
+            await self._handle_exception(exc, receive)
+            return False
+        return True
+
+    async def _dispatch_lazy(
+            self,
+            endpoint: EndpointParam,
+            parser: XMLRPCStreamParser,
+            body_decompressor,
+            max_size: Optional[int],
+            body_length: int,
+            start: float,
+            receive: Receive,
+            send: Send
+    ) -> None:
+        # The endpoint is called as soon as the array of its LazyArray parameter starts. Items decoded from
+        # every chunk are fed to it while the rest of the body is received, the body is read only as fast
+        # as the endpoint consumes them, so at most a queue and a chunk of items are held at a time.
+        # Cache and single flight don't apply, the arguments are never complete before the call
+        self.method_name = endpoint.name
+        target = parser.target
+        target.stream_param(endpoint.lazy)
+        items = LazyArray()
+        task = None
+
+        def call(method_args: list) -> asyncio.Task:
+            self.method_name, self.method_args, self.endpoint = endpoint.name, method_args, endpoint
+            self.parse_time = time.perf_counter() - start
+            self.scope.update(path=endpoint.route.path, endpoint=endpoint.route.endpoint, path_params={})
+
+            call_task = asyncio.ensure_future(self._within_deadline(
+                lambda send: self._run(endpoint, receive, send), self._deadline(endpoint), receive, send
+            ))
+            # Items decoded after the endpoint is done are dropped
+            call_task.add_done_callback(lambda _: items.abandon())
+            return call_task
+
+        async def feed() -> None:
+            nonlocal task
+            if task is None and target.lazy_items is not None:
+                task = call([*target.args, items])
+
+            decoded = target.lazy_items
+            while decoded:
+                batch = decoded.copy()
+                decoded.clear()
+                for item in batch:
+                    await items.put(item)
+
+        more_body = self.message.get("more_body", False)
+        try:
+            try:
+                if not more_body and body_decompressor is not None:
+                    parser.feed(body_decompressor.flush(max_size))
+                await feed()
+
+                while more_body and (task is None or not task.done()):
+                    self.message = await receive()
+                    chunk = self.message.get("body", b"")
+                    more_body = self.message.get("more_body", False)
+
+                    body_length += len(chunk)
+                    if max_size is not None and body_length > max_size:
+                        raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+
+                    if body_decompressor is not None:
+                        chunk = body_decompressor.decompress(chunk, max_size)
+                        if not more_body:
+                            chunk += body_decompressor.flush(max_size)
+                    parser.feed(chunk)
+                    await feed()
+
+                if not more_body:
+                    _, method_args = parser.close()
+                    await feed()
+                    if len(method_args) > len(endpoint.args):
+                        raise InvalidArguments('error')
+            except zlib.error as exc:
+                raise ParseError(f"Invalid {body_decompressor.encoding} body, {exc}")
+            finally:
+                self.request_size = body_length
+        except (ParseError, PayloadTooLarge, InvalidArguments) as exc:
+            # The endpoint gets the error from the items, and answers with its fault
+            if task is not None:
+                if isinstance(exc, PayloadTooLarge) and self.metrics is not None:
+                    self.metrics.reject(endpoint.name, "body")
+                items.close(exc)
+                return await task
+            if isinstance(exc, PayloadTooLarge):
+                return await self._reject_too_large(max_size, "body", receive, send)
+            return await XMLRPCResponse(exc)(self.scope, receive, send)
+        except BaseException:
+            if task is not None:
+                task.cancel()
+            raise
+
+        items.close()
+        # Without a lazy array in the body, the endpoint is called with the decoded arguments
+        if task is None:
+            task = call(method_args)
+        await task
+
+    async def _run(self, endpoint: EndpointParam, receive: Receive, send: Send) -> None:
+        limits = endpoint.options.limits
+        if await self._admit(limits, receive, send):
+            with hold(limits):
+                await self._timed_dispatch(self.dispatch(endpoint, receive, send))
+
+    def _deadline(self, endpoint: EndpointParam) -> Optional[float]:
+        # The earlier of the client deadline and the method timeout
+        timeout = endpoint.options.timeout
+        if timeout is None:
+            return self.deadline
+        deadline = time.monotonic() + timeout
+        return deadline if self.deadline is None else min(deadline, self.deadline)
+
+    async def _within_deadline(self, dispatch, deadline: Optional[float], receive: Receive, send: Send) -> None:
+        # dispatch(send) is cancelled at the deadline and answered with DeadlineExceeded,
+        # unless the response already started, then the connection is dropped
+        if deadline is None:
+            return await dispatch(send)
+
+        started = False
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await run_with_deadline(dispatch(tracking_send), deadline)
+        except DeadlineExceeded as exc:
+            if started:
+                raise
+            self.interrupted = True
+            await XMLRPCResponse(exc)(self.scope, receive, send)
+
+    async def _admit(self, limits: Sequence[ConcurrencyLimit], receive: Receive, send: Send) -> bool:
+        # Waits for a slot of every concurrency limit of the method, False when the call was shed.
+        # Queue wait isn't a part of the dispatch time, it is exported by the limits
+        if not limits:
+            return True
 
+        try:
+            await acquire_all(limits)
+        except Overloaded as exc:
+            self.interrupted = True
+            await XMLRPCResponse(exc)(self.scope, receive, send)
+            return False
+        return True
+
+    def _max_body_size(self, endpoint: Optional[EndpointParam]) -> Optional[int]:
+        if endpoint is not None and endpoint.options.max_body_size is not None:
+            return endpoint.options.max_body_size
+        return self.max_body_size
+
+    async def _reject_too_large(self, max_size: int, reason: str, receive: Receive, send: Send) -> None:
+        # The rest of the body is never read, the server closes the connection after the response
+        if self.metrics is not None:
+            method_name = self.method_name if self.method_name in self.endpoints else UNKNOWN_METHOD
+            self.metrics.reject(method_name, reason)
+
+        response = XMLRPCResponse(PayloadTooLarge(f"Request body exceeds {max_size} bytes"), status_code=413)
+        await response(self.scope, receive, send)
+
+    async def _timed_dispatch(self, dispatch) -> None:
+        # Serialization time is measured where it happens and taken out of the dispatch time,
+        # streamed results are serialized while the endpoint is iterated and count as dispatch
+        self.serialize_time = 0.0
+        start = self.dispatch_start = time.perf_counter()
+
+        # Sampled calls are profiled from dispatch until the response is sent
+        profiler = self.profiler
+        if profiler is not None and profiler.should_sample(self.method_name):
+            dispatch = profiler.profile(self.method_name, dispatch)
+
+        try:
+            await dispatch
+        finally:
+            self.dispatch_time = time.perf_counter() - start - self.serialize_time
+
+    async def dispatch(self, endpoint: EndpointParam, receive: Receive, send: Send) -> None:
+        # Iterator, binary and lazy values can't go through JSON, so they are always dispatched directly,
+        # as are calls of trusted clients, the JSON path would validate them
+        if (
+                self.direct_dispatch or self.trusted_clients
+                or endpoint.stream or endpoint.binary or endpoint.lazy is not None
+        ):
+            return await self.dispatch_direct(endpoint, receive, send)
+
+        headers = MutableHeaders(scope=self.scope)
+        headers["Content-Type"] = "application/json"
+
+        self.send = send
+
+        # The JSON body is posted to the path of the route through the rest of the application, the middleware
+        # added before this one, the exception handlers and the router of the application all apply.
+        # Exceptions without a handler go on to ServerErrorMiddleware
         await self.app(self.scope, self.receive_with_xmlrpc, self.send_with_xmlrpc)
 
-    async def receive_with_xmlrpc(self) -> Message:
-        assert self.message["type"] == "http.request"
+    async def dispatch_direct(self, endpoint: EndpointParam, receive: Receive, send: Send) -> None:
+        # Call the route dependant with decoded arguments and render the result as XML,
+        # skipping the JSON request/response round trip through the application
+        request = Request(self.scope, receive)
+        self.send = send
+
+        try:
+            result = await run_route(endpoint.route, request, self._build_body(), self._plan(endpoint))
+        except Exception as exc:
+            return await self._handle_exception(exc, receive)
+
+        start = time.perf_counter()
+        response = build_response(endpoint.route, result, await self._render_offloaded(result.content))
+        self.serialize_time += time.perf_counter() - start
+
+        await response(self.scope, receive, send)
+
+    async def _handle_exception(self, exc: Exception, receive: Receive) -> None:
+        # Answered as the application would answer it, JSON responses of its handlers rendered as XML
+        await exception_middleware(self.scope.get("app"), exc)(self.scope, receive, self.send_with_xmlrpc)
 
-        body = ""
+    async def _render_offloaded(self, content) -> Optional[bytes]:
+        offload_policy = self.endpoint.offload_policy
+        if offload_policy is None or isinstance(content, (Response, AsyncIterator)) or is_binary_content(content):
+            return None
 
-        # If endpoint has one or more arguments, send them as structure
-        # where key is argument name and value is any supported type
-        if len(self.method_args) > 1 or self.endpoints[self.scope["path"]].embed:
-            args = dict(
-                zip(
-                    self.endpoints[self.scope["path"]].args,
-                    self.method_args
-                )
+        size = estimate_size(content)
+        if not offload_policy.should_offload(size):
+            return None
+
+        return await offload_policy.run("serialize", size, XMLRPCHandler.format_success, content)
+
+    async def multicall(self, receive: Receive, send: Send) -> None:
+        # system.multicall, every entry is {"methodName": ..., "params": [...]}
+        if len(self.method_args) != 1 or not isinstance(self.method_args[0], list):
+            response = XMLRPCResponse(InvalidArguments(f"{MULTICALL_METHOD} expects an array of calls"))
+            return await response(self.scope, receive, send)
+
+        semaphore = asyncio.Semaphore(self.multicall_concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await self._multicall_entry(call, receive)
+
+        results = await asyncio.gather(*map(run, self.method_args[0]))
+
+        background = BackgroundTasks()
+        for _, tasks in results:
+            if tasks is not None:
+                background.add_task(tasks)
+
+        start = time.perf_counter()
+        response = XMLRPCResponse([value for value, _ in results], background=background)
+        self.serialize_time += time.perf_counter() - start
+
+        await response(self.scope, receive, send)
+
+    async def _multicall_entry(self, call, receive: Receive):
+        scope = self.scope
+        try:
+            if not isinstance(call, dict) or not isinstance(call.get("params", []), list):
+                raise InvalidArguments("Multicall entry must be a struct with methodName and params")
+
+            method_name = call.get("methodName")
+            if method_name == MULTICALL_METHOD:
+                raise InvalidArguments(f"Recursive {MULTICALL_METHOD} is not allowed")
+
+            method_args = call.get("params", [])
+
+            endpoint = self.endpoints.get(str(method_name))
+            if endpoint is None:
+                raise MethodNotFound("Method not found")
+            if len(endpoint.args) < len(method_args):
+                raise InvalidArguments('error')
+
+            scope = dict(self.scope, path=endpoint.route.path, endpoint=endpoint.route.endpoint, path_params={})
+            # A shed or timed out entry is a fault in the results
+            return await run_with_deadline(
+                self._run_multicall_entry(endpoint, method_args, scope, receive), self._deadline(endpoint)
             )
-            body = orjson.dumps(args)
-        # If endpoint has only one argument, send json data as flat structure without argument key
-        elif len(self.method_args) == 1:
-            body = orjson.dumps(self.method_args[0])
+        except Exception as exc:
+            # Answered by the exception handlers of the application, like a single call
+            handled = await handle_error(scope, receive, exc)
+            return ([handled.result] if handled.fault is None else handled.fault), None
+
+    async def _run_multicall_entry(self, endpoint: EndpointParam, method_args: list, scope: Scope, receive: Receive):
+        # Every entry takes its own slot
+        limits = endpoint.options.limits
+        await acquire_all(limits)
+        with hold(limits):
+            result = await run_route(
+                endpoint.route, Request(scope, receive), build_body(endpoint, method_args), self._plan(endpoint)
+            )
+
+            content = result.content
+            if isinstance(content, Response):
+                raise ServerError(f"{endpoint.name} returned a response, it can't be a part of {MULTICALL_METHOD}")
+            if isinstance(content, AsyncIterator):
+                content = [item async for item in content]
 
-        self.message["body"] = body
+        return [content], result.background
+
+    async def receive_with_xmlrpc(self) -> Message:
+        assert self.message["type"] == "http.request"
+
+        body = self._build_body()
+        self.message["body"] = "" if body is None else orjson.dumps(body, default=json_default)
 
         return self.message
 
+    def _plan(self, endpoint: EndpointParam) -> Optional[DecodePlan]:
+        return endpoint.plan if self.trusted_clients else None
+
+    def _build_body(self):
+        return build_body(self.endpoint, self.method_args)
+
     async def send_with_xmlrpc(self, message: Message):
         match message.get('type'):
             case "http.response.start":
@@ -126,18 +793,21 @@ class XMLRPCResponder:
             case 'http.response.body':
                 headers = MutableHeaders(raw=self.initial_message["headers"])
 
-                if 'xml' in headers['content-type']:
+                # Only JSON results are rendered as XML, faults and plain responses of error handlers go as they are
+                if 'json' not in headers.get('content-type', ''):
                     await self._send(message)
                     return
 
-                try:
-                    message_body_loads = orjson.loads(message['body'])
-                    body = XMLRPCHandler.format_success(message_body_loads)
-                except orjson.JSONDecodeError:
-                    body = message['body']
+                offload_policy = self.endpoint.offload_policy
+                size = len(message['body'])
+                start = time.perf_counter()
+                if offload_policy is not None and offload_policy.should_offload(size):
+                    body = await offload_policy.run("serialize", size, json_to_xml, message['body'])
+                else:
+                    body = json_to_xml(message['body'])
+                self.serialize_time += time.perf_counter() - start
 
                 headers["Content-Type"] = "application/xml"
-                headers["Content-Encoding"] = "utf-8"
                 headers["Content-Length"] = str(len(body))
                 message["body"] = body
 
@@ -147,91 +817,284 @@ class XMLRPCResponder:
         await self.send(self.initial_message)
         await self.send(message)
 
-    def _gen_endpoint_path(self, method_name: str, namespace_separator=".") -> str:
-        return self.router.prefix + "/" + method_name.replace(namespace_separator, "/", 1)
+
+class RouteArtifacts(NamedTuple):
+    endpoint: EndpointParam
+    openapi_extra: dict
+    responses: dict
+
+
+def build_route_artifacts(route: APIRoute, router: XmlRpcAPIRouter) -> RouteArtifacts:
+    sig = signature(route.endpoint)
+    args = sig.parameters
+    embed = False
+
+    response = getattr(route, 'response_model') or str
+
+    request_body = [
+        arg.annotation for arg in args.values()
+        if arg.default is Parameter.empty or type(arg.default) == Body
+    ]
+
+    method_name = router.method_name(route.path)
+
+    # Schemas are shared between routes by SchemaGenerator, every route gets its own copy
+    # because custom_openapi moves their definitions into components
+    openapi_extra = {
+        "requestBody": {
+            "content": {
+                "application/xml": {
+                    "schema": deepcopy(SchemaGenerator()(
+                        request_body, method_name=method_name
+                    ).schema(ref_template="#/components/schemas/{model}"))
+                }
+            },
+            "required": True,
+        }
+    }
+
+    responses = {
+        200: {
+            "content": {
+                "application/xml": {
+                    "schema": deepcopy(SchemaGenerator()(
+                        [response], res=True
+                    ).schema(ref_template="#/components/schemas/{model}")),
+                }
+            },
+        },
+        500: {
+            "content": {
+                "application/xml": {
+                    "schema": deepcopy(SchemaGenerator()(
+                        [Error], res=True, is_fault=True
+                    ).schema(ref_template="#/components/schemas/{model}")),
+                }
+            },
+        },
+    }
+
+    if len(args) == 1 and getattr(args[list(args)[0]], 'default', False):
+        if getattr(sig.parameters[list(args)[0]].default, "embed", False):
+            embed = True
+
+    endpoint = EndpointParam(
+        name=method_name,
+        args=getfullargspec(route.endpoint).args,
+        embed=embed,
+        route=route,
+        stream=is_stream_endpoint(route.endpoint),
+        binary=is_binary_endpoint(route.endpoint),
+        file_args=file_params(route.endpoint),
+        lazy=lazy_param(route.endpoint),
+        options=router.method_options.get(route.path, XmlRpcMethodOptions()),
+        plan=DecodePlan(route),
+        offload_policy=router.offload_policy
+    )
+
+    return RouteArtifacts(endpoint=endpoint, openapi_extra=openapi_extra, responses=responses)
+
+
+def snapshot_route_artifacts(route: APIRoute, router: XmlRpcAPIRouter, method: MethodSnapshot) -> RouteArtifacts:
+    # Same artifacts as build_route_artifacts, without inspecting the endpoint or generating schemas
+    endpoint = EndpointParam(
+        name=method.method_name,
+        args=method.args,
+        embed=method.embed,
+        route=route,
+        stream=method.stream,
+        binary=method.binary,
+        file_args=method.file_args,
+        lazy=method.lazy,
+        options=router.method_options.get(route.path, XmlRpcMethodOptions()),
+        plan=DecodePlan(route),
+        offload_policy=router.offload_policy
+    )
+
+    return RouteArtifacts(endpoint=endpoint, openapi_extra=method.openapi_extra, responses=method.responses)
 
 
 class XMLRPCMiddleware:
-    __slots__ = ("app", "router", "endpoints")
+    __slots__ = (
+        "app", "routers", "endpoints", "paths", "bound", "offload_policy", "direct_dispatch", "fast_decoder_max_size",
+        "multicall_concurrency", "metrics", "profiler", "compression", "max_body_size", "trusted_clients"
+    )
 
     # On every add_middleware, add_exception_handler call, build_middleware_stack invoked
     # So every middleware is reinitialized
-    def __init__(self, app: ASGIApp, *, router: XmlRpcAPIRouter):
-        print('---')
+    def __init__(
+            self,
+            app: ASGIApp,
+            *,
+            router: Optional[XmlRpcAPIRouter] = None,
+            routers: Sequence[XmlRpcAPIRouter] = (),
+            direct_dispatch: bool = False,
+            fast_decoder_max_size: int = FAST_DECODER_MAX_SIZE,
+            multicall_concurrency: int = MULTICALL_CONCURRENCY,
+            metrics: Optional[Metrics] = None,
+            profiler: Optional[Profiler] = None,
+            compression: Optional[Compression] = None,
+            max_body_size: Optional[int] = None,
+            trusted_clients: bool = False,
+            snapshot: Optional[Snapshot] = None
+    ):
         self.app = app
-        self.router = router
+        self.routers = (router, *routers) if router is not None else tuple(routers)
+        if not self.routers:
+            raise ValueError("XMLRPCMiddleware needs at least one router")
+        self.direct_dispatch = direct_dispatch
+        self.fast_decoder_max_size = fast_decoder_max_size
+        self.multicall_concurrency = multicall_concurrency
+        self.metrics = metrics
+        self.profiler = profiler
+        self.compression = compression
+        # Largest accepted request body in bytes, per method limits are set with xml_rpc(max_body_size=...).
+        # Compressed bodies are limited both as received and as inflated
+        self.max_body_size = max_body_size
+        # Arguments of trusted clients are built into the parameter types by the decoding plan of the endpoint,
+        # models are constructed without validation, only scalars not decoded as their declared type are converted.
+        # Only for clients that always send valid arguments
+        self.trusted_clients = trusted_clients
+
+        # Every method is parsed and rendered with the policy of its router. Bodies posted to other paths
+        # are parsed before the method is known, they are offloaded only when all routers share a policy
+        policies = {id(router.offload_policy): router.offload_policy for router in self.routers}
+        self.offload_policy = next(iter(policies.values())) if len(policies) == 1 else None
 
+        # methodName -> endpoint, every call is dispatched through it,
+        # and route path -> endpoint for the limits that apply before the method name is parsed
         self.endpoints = {}
+        self.paths = {}
 
-        for route in self.router.routes:
-            sig = signature(route.endpoint)
-            args = sig.parameters
-            embed = False
-
-            response = getattr(route, 'response_model') or str
-
-            request_body = [
-                arg.annotation for arg in args.values()
-                if arg.default is Parameter.empty or type(arg.default) == Body
-            ]
-
-            method_name = route.path.replace('/', '.').lstrip('.')
-
-            openapi_extra = {
-                "requestBody": {
-                    "content": {
-                        "application/xml": {
-                            "schema": SchemaGenerator()(
-                                request_body, method_name=method_name
-                            ).schema(ref_template="#/components/schemas/{model}")
-                        }
-                    },
-                    "required": True,
-                }
-            }
-
-            responses = {
-                200: {
-                    "content": {
-                        "application/xml": {
-                            "schema": SchemaGenerator()(
-                                [response], res=True
-                            ).schema(ref_template="#/components/schemas/{model}"),
-                        }
-                    },
-                },
-                500: {
-                    "content": {
-                        "application/xml": {
-                            "schema": SchemaGenerator()(
-                                [Error], res=True, is_fault=True
-                            ).schema(ref_template="#/components/schemas/{model}"),
-                        }
-                    },
-                },
-            }
-
-            route.openapi_extra = openapi_extra
-            route.responses = responses
-
-            if route.path in self.endpoints:
-                raise ValueError(f"Duplicated {route.path} registered")
-
-            if len(args) == 1 and getattr(args[list(args)[0]], 'default', False):
-                if getattr(sig.parameters[list(args)[0]].default, "embed", False):
-                    embed = True
-
-            self.endpoints[route.path] = EndpointParam(args=getfullargspec(route.endpoint).args, embed=embed)
+        for router in self.routers:
+            # Options are a part of the artifacts below, see XmlRpcAPIRouter.limit_namespace
+            router.frozen = True
+            for route in router.routes:
+                # Artifacts are computed once per route and reused when the middleware is rebuilt,
+                # or taken from the startup snapshot, see fastapi_xmlrpc.snapshot
+                artifacts = getattr(route, "xmlrpc_artifacts", None)
+                if artifacts is None:
+                    method = snapshot.methods.get(route.path) if snapshot is not None else None
+                    if method is not None:
+                        artifacts = snapshot_route_artifacts(route, router, method)
+                    else:
+                        artifacts = build_route_artifacts(route, router)
+                    route.xmlrpc_artifacts = artifacts
+
+                route.openapi_extra = artifacts.openapi_extra
+                route.responses = artifacts.responses
+
+                endpoint = artifacts.endpoint
+                if endpoint.name in self.endpoints:
+                    raise ValueError(f"Duplicated {endpoint.name} registered")
+                if route.path in self.paths:
+                    raise ValueError(f"Duplicated {route.path} registered")
+
+                self.endpoints[endpoint.name] = endpoint
+                self.paths[route.path] = endpoint
+
+        # The index over the routes included in the application, see _bind
+        self.bound = None
+
+        if metrics is not None:
+            for router in self.routers:
+                metrics.register_limits(router.get_limits())
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            return await self.app(scope, receive, self._send_lifespan(send))
+
+        # Websocket scopes go to the application as they are
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if self.metrics is not None and scope["path"] == self.metrics.path:
+            if scope["method"] in ("GET", "HEAD"):
+                response = Response(self.metrics.render(), media_type=CONTENT_TYPE)
+                return await response(scope, receive, send)
+
+        if self.profiler is not None and self.profiler.serves(scope):
+            return await self.profiler.admin(scope, receive, send)
+
         headers = MutableHeaders(raw=scope["headers"])
 
         # Check Content-Type header
         content_type_header = headers.get("Content-Type", '')
 
         if "xml" in content_type_header:
-            responder = XMLRPCResponder(self.app, endpoints=self.endpoints, router=self.router)
+            endpoints, paths = self._bind(scope.get("app"))
+            responder = XMLRPCResponder(
+                self.app,
+                endpoints=endpoints,
+                paths=paths,
+                offload_policy=self.offload_policy,
+                direct_dispatch=self.direct_dispatch,
+                fast_decoder_max_size=self.fast_decoder_max_size,
+                multicall_concurrency=self.multicall_concurrency,
+                metrics=self.metrics,
+                profiler=self.profiler,
+                compression=self.compression,
+                max_body_size=self.max_body_size,
+                trusted_clients=self.trusted_clients
+            )
+            await responder(scope, receive, send)
+            return
+
+        # JSON-RPC 2.0 calls of the same methods, see JSONRPCResponder
+        if is_jsonrpc(content_type_header):
+            endpoints, paths = self._bind(scope.get("app"))
+            responder = JSONRPCResponder(
+                endpoints=endpoints,
+                paths=paths,
+                concurrency=self.multicall_concurrency,
+                metrics=self.metrics,
+                compression=self.compression,
+                max_body_size=self.max_body_size,
+                trusted_clients=self.trusted_clients
+            )
             await responder(scope, receive, send)
             return
 
         await self.app(scope, receive, send)
+
+    def _send_lifespan(self, send: Send) -> Send:
+        # Executors of the offload policies are shut down once the application is, their workers don't outlive it
+        async def wrapper(message: Message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                policies = {id(router.offload_policy): router.offload_policy for router in self.routers}
+                for policy in policies.values():
+                    if policy is not None:
+                        await run_in_threadpool(policy.shutdown)
+            await send(message)
+
+        return wrapper
+
+    def _bind(self, app) -> tuple[dict[str, EndpointParam], dict[str, EndpointParam]]:
+        # Calls are dispatched through the copies of the routes include_router added to the application,
+        # they carry the include level dependencies and the dependency overrides of the application.
+        # The middleware is built before include_router is called, so the index is bound at the first request.
+        # Methods of routers the application didn't include aren't served
+        bound = self.bound
+        if bound is not None and bound[0] is app:
+            return bound[1], bound[2]
+
+        included = {}
+        for route in getattr(getattr(app, "router", None), "routes", ()):
+            if isinstance(route, APIRoute):
+                included.setdefault(route.path, route)
+
+        endpoints, paths = {}, {}
+        for router in self.routers:
+            prefix = include_prefix(router, included)
+            if prefix is None:
+                continue
+
+            for own_route in router.routes:
+                route = included[prefix + own_route.path]
+                endpoint = own_route.xmlrpc_artifacts.endpoint._replace(route=route, plan=DecodePlan(route))
+
+                endpoints[endpoint.name] = endpoint
+                paths[route.path] = endpoint
+
+        self.bound = (app, endpoints, paths)
+        return endpoints, paths
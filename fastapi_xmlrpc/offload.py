@@ -0,0 +1,71 @@
+import asyncio
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Payloads of at least this many bytes are parsed/serialized outside the event loop
+OFFLOAD_THRESHOLD = 1024 * 1024
+
+
+class OffloadPolicy:
+    # The executor is created on first use and shut down with the application by XMLRPCMiddleware,
+    # executors passed in are left to their owner
+
+    __slots__ = ("threshold", "use_processes", "max_workers", "executor", "own_executor", "offloaded", "offloaded_bytes")
+
+    def __init__(
+            self,
+            threshold: int = OFFLOAD_THRESHOLD,
+            *,
+            use_processes: bool = False,
+            max_workers: Optional[int] = None,
+            executor: Optional[Executor] = None
+    ):
+        self.threshold = threshold
+        self.use_processes = use_processes
+        self.max_workers = max_workers
+        self.executor = executor
+        self.own_executor = False
+
+        self.offloaded = {"parse": 0, "serialize": 0}
+        self.offloaded_bytes = {"parse": 0, "serialize": 0}
+
+    def should_offload(self, size: int) -> bool:
+        return size >= self.threshold
+
+    async def run(self, kind: str, size: int, func: Callable, *args) -> Any:
+        # With a process pool func and args must be picklable
+        if self.executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self.executor = executor_class(max_workers=self.max_workers)
+            self.own_executor = True
+
+        self.offloaded[kind] += 1
+        self.offloaded_bytes[kind] += size
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def stats(self) -> dict:
+        return {
+            f"{kind}_{counter}": value
+            for counter, values in (("offloaded", self.offloaded), ("offloaded_bytes", self.offloaded_bytes))
+            for kind, value in values.items()
+        }
+
+    def shutdown(self, wait: bool = True):
+        # A later call creates a new executor
+        if self.executor is not None and self.own_executor:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+            self.own_executor = False
+
+
+def estimate_size(value: Any, depth: int = 8) -> int:
+    # Rough XML size of a result, containers are extrapolated from their first item
+    if isinstance(value, (str, bytes)):
+        return len(value) + 20
+    if depth and isinstance(value, dict):
+        return sum(estimate_size(key, 0) + estimate_size(item, depth - 1) for key, item in value.items()) + 40
+    if depth and isinstance(value, (list, tuple)) and value:
+        return len(value) * (estimate_size(value[0], depth - 1) + 15) + 30
+    return 32
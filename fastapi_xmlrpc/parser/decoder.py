@@ -0,0 +1,324 @@
+from datetime import datetime
+from xml.parsers import expat
+
+from aiohttp_xmlrpc.common import Binary, TIME_FORMATS
+
+from lxml import etree
+
+from fastapi_xmlrpc.binary import Base64Sink
+from fastapi_xmlrpc.parser.exceptions import ParseError, xml2py_exception
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+def str_to_time(text):
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, time_format)
+        except ValueError:
+            pass
+
+    raise ValueError("It's impossible to parse dataetime with formats %s", TIME_FORMATS)
+
+
+# Same conversions as aiohttp_xmlrpc.common.xml2py, applied to the element text
+SCALAR_TYPES = {
+    "string": lambda x: str(x or "").strip(),
+    "base64": lambda x: Binary.fromstring(x),
+    "boolean": lambda x: bool(int(x)),
+    "dateTime.iso8601": str_to_time,
+    "double": lambda x: float(x),
+    "integer": lambda x: int(x),
+    "int": lambda x: int(x),
+    "i4": lambda x: int(x),
+    "nil": lambda x: None,
+}
+
+UNSET = object()
+
+# Bodies larger than this with a <base64> value are decoded by lxml instead of expat
+EXPAT_BASE64_MAX_SIZE = 8 * 1024
+
+# Tags from <params> to the array of a param
+LAZY_ARRAY_PATH = ["params", "param", "value", "array"]
+
+
+class MethodCallTarget:
+    # Builds (method_name, args) from parser events in a single pass, without a tree or XPath.
+    # Implements the lxml parser target interface, expat handlers are bound to the same methods.
+
+    __slots__ = (
+        "method_name", "args", "tags", "values", "containers", "text", "sink", "lazy_param", "lazy_items", "refused"
+    )
+
+    def __init__(self):
+        self.method_name = None
+        self.args = []
+
+        self.tags = []
+        # One slot per open <value>, filled by its typed child
+        self.values = []
+        # Open arrays (list) and structs ([dict, name, value])
+        self.containers = []
+        self.text = []
+        # Decoder of the open <base64>, its text is decoded as it arrives instead of being collected
+        self.sink = None
+
+        # Index of the param whose array items are taken by the middleware as they are decoded, see LazyArray.
+        # lazy_items is the list of that array, the items decoded since it was last emptied
+        self.lazy_param = None
+        self.lazy_items = None
+
+        # Raised from close too, lxml closes the target when a handler fails and raises what close raises
+        self.refused = None
+
+    def doctype(self, name, pubid, system):
+        # lxml passes text to a target with internal entities expanded, so documents with a DTD are refused
+        # before any of it is parsed, like expat does with _reject
+        self.refused = ParseError('DTD and entity declarations are not allowed')
+        raise self.refused
+
+    def start(self, tag, attrib):
+        self.tags.append(tag)
+        self.text.clear()
+
+        if tag == "base64":
+            self.sink = Base64Sink()
+        elif tag == "value":
+            self.values.append(UNSET)
+        elif tag == "array":
+            self.containers.append([])
+            if self.lazy_param is not None and self.lazy_items is None:
+                self._take_lazy_items()
+        elif tag == "struct":
+            self.containers.append([{}, None, None])
+
+    def data(self, data):
+        if self.sink is not None:
+            self.sink.write(data)
+        else:
+            self.text.append(data)
+
+    def end(self, tag):
+        tags = self.tags
+        tags.pop()
+        text = "".join(self.text) or None
+        self.text.clear()
+
+        if tag == "base64" and self.sink is not None:
+            sink, self.sink = self.sink, None
+            if self.values:
+                self.values[-1] = sink.close()
+        elif tag in SCALAR_TYPES:
+            if self.values:
+                self.values[-1] = SCALAR_TYPES[tag](text)
+        elif tag == "value":
+            value = self.values.pop()
+            if value is UNSET:
+                value = (text or "").strip()
+            self._deliver(value)
+        elif tag == "array" or tag == "struct":
+            container = self.containers.pop()
+            if self.values:
+                self.values[-1] = container if tag == "array" else container[0]
+        elif tag == "name":
+            if self.containers and tags and tags[-1] == "member":
+                self.containers[-1][1] = text
+        elif tag == "member":
+            if self.containers:
+                struct = self.containers[-1]
+                struct[0][struct[1]] = struct[2]
+                struct[1] = struct[2] = None
+        elif tag == "methodName":
+            if self.method_name is None:
+                self.method_name = text
+
+    def stream_param(self, index: int):
+        # Items of the array of param index are collected in lazy_items from now on,
+        # the array may already be open when the method name and the first items come in one chunk
+        self.lazy_param = index
+        self._take_lazy_items()
+
+    def _take_lazy_items(self):
+        if len(self.args) == self.lazy_param and self.containers and self.tags[1:5] == LAZY_ARRAY_PATH:
+            self.lazy_items = self.containers[0]
+
+    def _deliver(self, value):
+        parent = self.tags[-1] if self.tags else None
+
+        if parent == "data":
+            self.containers[-1].append(value)
+        elif parent == "member":
+            self.containers[-1][2] = value
+        elif parent == "param" and len(self.tags) > 1 and self.tags[-2] == "params":
+            self.args.append(value)
+
+    def close(self):
+        if self.refused is not None:
+            raise self.refused
+        if self.method_name is None:
+            raise ParseError('methodName not found')
+        return self.method_name, self.args
+
+    @staticmethod
+    def fallback(body: bytes):
+        return XMLRPCHandler.handle(body)
+
+
+class MethodResponseTarget(MethodCallTarget):
+    # Decodes a methodResponse, a fault is raised as the exception registered for its faultCode
+
+    __slots__ = ("fault",)
+
+    def __init__(self):
+        super().__init__()
+        self.fault = None
+
+    def _deliver(self, value):
+        if self.tags and self.tags[-1] == "fault":
+            self.fault = value
+        else:
+            super()._deliver(value)
+
+    def close(self):
+        result, fault = self.outcome()
+        if fault is not None:
+            raise xml2py_exception(int(fault["faultCode"]), fault.get("faultString", ""))
+        return result
+
+    def outcome(self):
+        # (result, None), or (None, fault) with the fault struct as it was sent
+        if self.refused is not None:
+            raise self.refused
+        if self.fault is not None:
+            if not isinstance(self.fault, dict) or "faultCode" not in self.fault:
+                raise ParseError('Invalid fault')
+            return None, self.fault
+
+        if len(self.args) != 1:
+            raise ParseError('methodResponse must contain exactly one param')
+        return self.args[0], None
+
+    @classmethod
+    def fallback(cls, body: bytes):
+        try:
+            return etree.fromstring(body, etree.XMLParser(target=cls(), resolve_entities=False))
+        except etree.XMLSyntaxError:
+            raise ParseError('Syntax error while parsing an XML document')
+
+
+class MethodOutcomeTarget(MethodResponseTarget):
+    # Decodes a methodResponse into (result, fault), the fault isn't raised
+
+    __slots__ = ()
+
+    def close(self):
+        return self.outcome()
+
+
+def _reject(*args):
+    raise ParseError('DTD and entity declarations are not allowed')
+
+
+def decode_method_call(body: bytes):
+    return decode_chunks((body,))
+
+
+def decode_method_response(body: bytes):
+    return decode_chunks((body,), MethodResponseTarget)
+
+
+def decode_method_outcome(body: bytes):
+    return decode_chunks((body,), MethodOutcomeTarget)
+
+
+def decode_chunks(chunks, target_class=MethodCallTarget):
+    # expat hands long text to python slower than lxml, bodies with large <base64> values are decoded by lxml.
+    # A tag split between two chunks is missed, the body is decoded by expat then, just slower
+    if sum(map(len, chunks)) > EXPAT_BASE64_MAX_SIZE and any(b"<base64" in chunk for chunk in chunks):
+        return _decode_with_lxml(chunks, target_class)
+
+    target = target_class()
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_NEVER)
+    parser.StartDoctypeDeclHandler = _reject
+    parser.EntityDeclHandler = _reject
+    parser.StartElementHandler = target.start
+    parser.EndElementHandler = target.end
+    parser.CharacterDataHandler = target.data
+
+    try:
+        for chunk in chunks:
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+    except expat.ExpatError as exc:
+        # Expat knows only a few encodings, lxml handles the rest
+        if exc.code == expat.errors.codes[expat.errors.XML_ERROR_UNKNOWN_ENCODING]:
+            return target_class.fallback(b"".join(chunks))
+        raise ParseError('Syntax error while parsing an XML document')
+
+    return target.close()
+
+
+def _decode_with_lxml(chunks, target_class):
+    parser = etree.XMLParser(target=target_class(), resolve_entities=False)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+    except etree.XMLSyntaxError:
+        raise ParseError('Syntax error while parsing an XML document')
+
+
+# Buffers a body and decodes it with expat, same interface as XMLRPCStreamParser
+class XMLRPCBufferedParser:
+
+    __slots__ = ("chunks", "size")
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        self.chunks.append(chunk)
+
+    @property
+    def method_name(self):
+        # Known only once the buffered body is decoded
+        return None
+
+    def close(self):
+        return decode_chunks(self.chunks)
+
+
+# Incremental counterpart of XMLRPCHandler.handle, fed with body chunks as they arrive.
+# Values are built by the target as the chunks are parsed, no tree of the body is kept
+class XMLRPCStreamParser:
+
+    __slots__ = ("parser", "target", "size")
+
+    def __init__(self):
+        self.target = MethodCallTarget()
+        self.parser = etree.XMLParser(target=self.target, resolve_entities=False)
+        self.size = 0
+
+    @property
+    def method_name(self):
+        # Set as soon as </methodName> is parsed, usually from the first chunk
+        return self.target.method_name
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+
+        try:
+            self.parser.feed(chunk)
+        except etree.XMLSyntaxError:
+            raise ParseError('Syntax error while parsing an XML document')
+
+    def close(self):
+        try:
+            return self.parser.close()
+        except etree.XMLSyntaxError:
+            raise ParseError('Syntax error while parsing an XML document')
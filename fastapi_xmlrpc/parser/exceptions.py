@@ -5,7 +5,7 @@ from fastapi.exceptions import HTTPException
 
 __all__ = (
     "XMLRPCError", "ApplicationError", "InvalidCharacterError", "ParseError", "ServerError",
-    "SystemError", "TransportError", "UnsupportedEncodingError"
+    "SystemError", "TransportError", "UnsupportedEncodingError", "PayloadTooLarge"
 )
 
 
@@ -64,6 +64,10 @@ class TransportError(XMLRPCError):
     code = -32300
 
 
+class PayloadTooLarge(TransportError):
+    code = -32301
+
+
 __EXCEPTION_CODES = {
     -32000: Exception,
 
@@ -80,6 +84,7 @@ __EXCEPTION_CODES = {
     ApplicationError.code: ApplicationError,
     SystemError.code: SystemError,
     TransportError.code: TransportError,
+    PayloadTooLarge.code: PayloadTooLarge,
 }
 
 __EXCEPTION_TYPES = {value: key for key, value in __EXCEPTION_CODES.items()}
@@ -110,8 +115,7 @@ def xml2py_exception(code: int, fault: str, default_exc_class=XMLRPCError):
     return exc(fault)
 
 
-@py2xml.register(Exception)
-def _(value):
+def exception_fault(value: BaseException) -> dict:
     code, reason = __EXCEPTION_TYPES[Exception], repr(value)
 
     for klass in value.__class__.__mro__:
@@ -119,9 +123,14 @@ def _(value):
             code = __EXCEPTION_TYPES[klass]
             break
 
+    return {"faultCode": code, "faultString": reason}
+
+
+@py2xml.register(Exception)
+def _(value):
     struct = etree.Element("struct")
 
-    for key, value in (("faultCode", code), ("faultString", reason)):
+    for key, value in exception_fault(value).items():
         member = etree.Element("member")
         struct.append(member)
 
@@ -1,15 +1,30 @@
-from aiohttp_xmlrpc.common import schema, py2xml, xml2py
+from typing import AsyncIterator, Iterator
+
+from aiohttp_xmlrpc.common import schema, xml2py
 
 from lxml import etree
 
+from fastapi_xmlrpc.binary import encode_chunks
 from fastapi_xmlrpc.parser.exceptions import ParseError
+from fastapi_xmlrpc.parser.serializer import XML_DECLARATION, dump, escape
+
+
+# Method calling several methods in one request, every entry is {"methodName": ..., "params": [...]}
+MULTICALL_METHOD = "system.multicall"
 
 
 class XMLRPCHandler:
 
+    SUCCESS_HEAD = XML_DECLARATION + b"<methodResponse><params><param><value>"
+    SUCCESS_TAIL = b"</value></param></params></methodResponse>"
+    FAULT_HEAD = XML_DECLARATION + b"<methodResponse><fault><value>"
+    FAULT_TAIL = b"</value></fault></methodResponse>"
+    STREAM_HEAD = SUCCESS_HEAD + b"<array><data>"
+    STREAM_TAIL = b"</data></array>" + SUCCESS_TAIL
+    STREAM_CHUNK_SIZE = 64 * 1024
+
     def __init__(self, xml_body=None):
         self.xml_body = xml_body
-        self.THREAD_POOL_EXECUTOR = None
 
     @classmethod
     def handle(cls, body):
@@ -18,7 +33,15 @@ class XMLRPCHandler:
         except etree.XMLSyntaxError:
             raise ParseError('Syntax error while parsing an XML document')
 
-        full_method_name = xml_request.xpath("//methodName[1]")[0].text
+        return cls.handle_tree(xml_request)
+
+    @staticmethod
+    def handle_tree(xml_request):
+        method_names = xml_request.xpath("//methodName[1]")
+        if not method_names:
+            raise ParseError('methodName not found')
+
+        full_method_name = method_names[0].text
 
         args = list(
                 map(
@@ -31,32 +54,73 @@ class XMLRPCHandler:
 
     @staticmethod
     def _parse_body(xml_string: str):
-        parse = etree.XMLParser(resolve_entities=False)
+        parse = XMLRPCHandler._create_parser()
         root = etree.fromstring(xml_string, parse)
         return root
 
+    @staticmethod
+    def _create_parser():
+        return etree.XMLParser(resolve_entities=False)
+
+    @staticmethod
+    def format_call(method_name: str, args):
+        buffer = bytearray(XML_DECLARATION)
+        buffer += b"<methodCall><methodName>"
+        buffer += escape(method_name)
+        buffer += b"</methodName><params>"
+
+        for arg in args:
+            buffer += b"<param><value>"
+            dump(arg, buffer)
+            buffer += b"</value></param>"
+
+        buffer += b"</params></methodCall>"
+        return bytes(buffer)
+
     @classmethod
     def format_error(cls, exception: Exception):
-        xml_response = etree.Element("methodResponse")
-        xml_fault = etree.Element("fault")
-        xml_value = etree.Element("value")
-        xml_value.append(py2xml(exception))
-        xml_fault.append(xml_value)
-        xml_response.append(xml_fault)
-        return cls.build_xml(xml_response)
+        buffer = bytearray(cls.FAULT_HEAD)
+        dump(exception, buffer)
+        buffer += cls.FAULT_TAIL
+        return bytes(buffer)
 
     @classmethod
     def format_success(cls, body):
-        xml_response = etree.Element("methodResponse")
-        xml_params = etree.Element("params")
-        xml_param = etree.Element("param")
-        xml_value = etree.Element("value")
-
-        xml_value.append(py2xml(body))
-        xml_param.append(xml_value)
-        xml_params.append(xml_param)
-        xml_response.append(xml_params)
-        return cls.build_xml(xml_response)
+        buffer = bytearray(cls.SUCCESS_HEAD)
+        dump(body, buffer)
+        buffer += cls.SUCCESS_TAIL
+        return bytes(buffer)
+
+    @classmethod
+    async def format_success_stream(cls, items: AsyncIterator):
+        # Render an array result element by element, so only one chunk of it is held in memory
+        chunk = bytearray(cls.STREAM_HEAD)
+        empty = True
+
+        async for item in items:
+            empty = False
+            chunk += b"<value>"
+            dump(item, chunk)
+            chunk += b"</value>"
+
+            if len(chunk) >= cls.STREAM_CHUNK_SIZE:
+                yield bytes(chunk)
+                chunk.clear()
+
+        # Same bytes as format_success renders for an empty array
+        if empty:
+            yield cls.format_success([])
+            return
+
+        chunk += cls.STREAM_TAIL
+        yield bytes(chunk)
+
+    @classmethod
+    def format_base64_stream(cls, value) -> Iterator[bytes]:
+        # Render a binary result as <base64>, encoding it chunk by chunk
+        yield cls.SUCCESS_HEAD + b"<base64>"
+        yield from encode_chunks(value)
+        yield b"</base64>" + cls.SUCCESS_TAIL
 
     @staticmethod
     def build_xml(tree):
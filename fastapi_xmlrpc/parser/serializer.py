@@ -0,0 +1,178 @@
+import base64
+import re
+
+from datetime import datetime
+from decimal import Decimal
+from types import GeneratorType
+from typing import Any, Callable
+
+from aiohttp_xmlrpc.common import Binary, TIME_FORMAT
+from pydantic import BaseModel
+
+from fastapi_xmlrpc.binary import BinaryFile, encode_chunks
+from fastapi_xmlrpc.parser.exceptions import exception_fault
+
+__all__ = ("XML_DECLARATION", "dump", "escape", "register")
+
+
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+# Same characters lxml refuses to put into a text node
+INVALID_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+WRITERS: dict[type, Callable[[Any, bytearray], None]] = {}
+
+
+def register(*types: type):
+    def decorator(writer: Callable[[Any, bytearray], None]):
+        for type_ in types:
+            WRITERS[type_] = writer
+        return writer
+
+    return decorator
+
+
+def escape(value: str) -> bytes:
+    if INVALID_CHARS.search(value):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+
+    return value.encode()
+
+
+def dump(value: Any, buffer: bytearray) -> None:
+    # Append the XML-RPC representation of value (the content of a <value> element) to buffer
+    writer = WRITERS.get(value.__class__)
+    if writer is None:
+        writer = _resolve(value.__class__)
+
+    writer(value, buffer)
+
+
+def _resolve(type_: type) -> Callable[[Any, bytearray], None]:
+    for klass in type_.__mro__:
+        if klass in WRITERS:
+            WRITERS[type_] = WRITERS[klass]
+            return WRITERS[type_]
+
+    raise TypeError(("Can't serialise type: {0}."
+                     " Add type {0} via decorator "
+                     "@register({0}) ").format(type_))
+
+
+@register(str)
+def _(value, buffer):
+    buffer += b"<string>"
+    buffer += escape(value)
+    buffer += b"</string>"
+
+
+@register(bytes)
+def _(value, buffer):
+    buffer += b"<string>"
+    buffer += escape(value.decode())
+    buffer += b"</string>"
+
+
+@register(Binary)
+def _(value, buffer):
+    buffer += b"<base64>"
+    buffer += base64.b64encode(value)
+    buffer += b"</base64>"
+
+
+@register(BinaryFile)
+def _(value, buffer):
+    buffer += b"<base64>"
+    for chunk in encode_chunks(value):
+        buffer += chunk
+    buffer += b"</base64>"
+
+
+@register(bool)
+def _(value, buffer):
+    buffer += b"<boolean>1</boolean>" if value else b"<boolean>0</boolean>"
+
+
+@register(int)
+def _(value, buffer):
+    if -2147483648 < value < 2147483647:
+        buffer += b"<i4>"
+        buffer += str(value).encode()
+        buffer += b"</i4>"
+    else:
+        buffer += b"<double>"
+        buffer += str(value).encode()
+        buffer += b"</double>"
+
+
+@register(float, Decimal)
+def _(value, buffer):
+    buffer += b"<double>"
+    buffer += str(value).encode()
+    buffer += b"</double>"
+
+
+@register(datetime)
+def _(value, buffer):
+    buffer += b"<dateTime.iso8601>"
+    buffer += value.strftime(TIME_FORMAT).encode()
+    buffer += b"</dateTime.iso8601>"
+
+
+@register(type(None))
+def _(value, buffer):
+    buffer += b"<nil/>"
+
+
+@register(list, tuple, set, frozenset, GeneratorType)
+def _(value, buffer):
+    start = len(buffer)
+    buffer += b"<array><data>"
+
+    for item in value:
+        buffer += b"<value>"
+        dump(item, buffer)
+        buffer += b"</value>"
+
+    # lxml renders an empty element as self-closing
+    if len(buffer) == start + 13:
+        buffer[start:] = b"<array><data/></array>"
+    else:
+        buffer += b"</data></array>"
+
+
+@register(dict)
+def _(value, buffer):
+    if not value:
+        buffer += b"<struct/>"
+        return
+
+    buffer += b"<struct>"
+
+    for key, item in value.items():
+        buffer += b"<member><name>"
+        buffer += escape(str(key))
+        buffer += b"</name><value>"
+        dump(item, buffer)
+        buffer += b"</value></member>"
+
+    buffer += b"</struct>"
+
+
+@register(BaseModel)
+def _(value, buffer):
+    dump(value.dict(), buffer)
+
+
+@register(Exception)
+def _(value, buffer):
+    dump(exception_fault(value), buffer)
@@ -0,0 +1,167 @@
+from copy import copy, deepcopy
+from typing import Any, Callable, Optional
+
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import get_missing_field_error
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic.fields import (
+    ModelField,
+    MAPPING_LIKE_SHAPES,
+    SHAPE_SINGLETON,
+    SHAPE_GENERIC,
+    SHAPE_LIST,
+    SHAPE_SEQUENCE,
+    SHAPE_ITERABLE,
+    SHAPE_SET,
+    SHAPE_FROZENSET,
+    SHAPE_TUPLE_ELLIPSIS,
+)
+
+from fastapi_xmlrpc.lazy import LazyArray
+
+__all__ = ("DecodePlan",)
+
+
+Converter = Callable[[Any], Any]
+
+SEQUENCE_SHAPES = {
+    SHAPE_LIST: list,
+    SHAPE_SEQUENCE: list,
+    SHAPE_ITERABLE: list,
+    SHAPE_SET: set,
+    SHAPE_FROZENSET: frozenset,
+    SHAPE_TUPLE_ELLIPSIS: tuple,
+}
+
+
+class DecodePlan:
+    # Turns the decoded arguments of a call into the values of the endpoint body parameters
+    # without validation, for trusted clients. Compiled once per route from the pydantic fields
+    # FastAPI builds for the body parameters: structs become models with Model.construct,
+    # scalars of their declared type are used as decoded, others are converted by their field,
+    # arrays and structs are walked only where a model or a scalar is nested in them.
+    # Missing required parameters raise RequestValidationError, like FastAPI does
+
+    __slots__ = ("dependant", "fields", "alias_omitted")
+
+    def __init__(self, route: APIRoute):
+        # Route dependant without body parameters, the other dependencies are still solved by FastAPI
+        self.dependant: Dependant = copy(route.dependant)
+        self.dependant.body_params = []
+
+        body_params = route.dependant.body_params
+        # Same rule as fastapi.dependencies.utils.request_body_to_args
+        self.alias_omitted = len(body_params) == 1 and not getattr(body_params[0].field_info, "embed", None)
+
+        models = {}
+        self.fields = [(field.name, field.alias, field, _field_converter(field, models)) for field in body_params]
+
+    def decode(self, body: Any) -> dict:
+        if self.alias_omitted:
+            name, _, field, converter = self.fields[0]
+            return {name: self._value(field, converter, body, ("body",))}
+
+        values = {}
+        for name, alias, field, converter in self.fields:
+            value = body.get(alias) if isinstance(body, dict) else None
+            values[name] = self._value(field, converter, value, ("body", alias))
+        return values
+
+    @staticmethod
+    def _value(field: ModelField, converter: Optional[Converter], value: Any, loc: tuple) -> Any:
+        if value is None:
+            if field.required:
+                raise RequestValidationError([get_missing_field_error(loc)])
+            return deepcopy(field.default)
+        return value if converter is None else converter(value)
+
+
+def _field_converter(field: ModelField, models: dict) -> Optional[Converter]:
+    # None means values of the field are used as they are
+    if field.shape == SHAPE_SINGLETON:
+        # Unions keep their decoded values, trying the members would be validation
+        if field.sub_fields:
+            return None
+        converter = _type_converter(field, models)
+    elif field.shape in SEQUENCE_SHAPES:
+        item = _field_converter(field.sub_fields[0], models)
+        if item is None:
+            return None
+        container = SEQUENCE_SHAPES[field.shape]
+        converter = lambda value: container(map(item, value)) if isinstance(value, list) else value
+    elif field.shape == SHAPE_GENERIC and field.type_ is LazyArray:
+        # Items are built as the endpoint consumes them
+        item = _field_converter(field.sub_fields[0], models) if field.sub_fields else None
+        converter = lambda value: _lazy(value, item)
+    elif field.shape in MAPPING_LIKE_SHAPES:
+        item = _field_converter(field.sub_fields[0], models)
+        if item is None:
+            return None
+        converter = lambda value: {key: item(v) for key, v in value.items()} if isinstance(value, dict) else value
+    else:
+        return None
+
+    if converter is None or not field.allow_none:
+        return converter
+    return lambda value: None if value is None else converter(value)
+
+
+def _lazy(value: Any, item: Optional[Converter]) -> Any:
+    if isinstance(value, list):
+        value = LazyArray.from_items(value)
+    if isinstance(value, LazyArray):
+        value.convert = item
+    return value
+
+
+def _type_converter(field: ModelField, models: dict) -> Optional[Converter]:
+    type_ = field.type_
+    if not isinstance(type_, type) or type_ is object:
+        return None
+    if issubclass(type_, BaseModel):
+        return _model_converter(type_, models)
+    return _scalar_converter(field)
+
+
+def _scalar_converter(field: ModelField) -> Converter:
+    # Values decoded as the declared type are used as they are, others are converted by the field,
+    # an int param sent as <string>5</string> or a date sent as <dateTime.iso8601>
+    type_ = field.type_
+
+    def convert(value: Any) -> Any:
+        if type(value) is type_:
+            return value
+        value, errors = field.validate(value, {}, loc=("body", field.alias))
+        if errors:
+            raise RequestValidationError([errors])
+        return value
+
+    return convert
+
+
+def _model_converter(model: type[BaseModel], models: dict) -> Converter:
+    # Compiled once per model, the converter is registered before its fields so recursive models terminate
+    converter = models.get(model)
+    if converter is not None:
+        return converter
+
+    fields = []
+
+    def construct(value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+
+        values = {}
+        for name, alias, field_converter in fields:
+            if alias in value:
+                field_value = value[alias]
+                values[name] = field_value if field_converter is None else field_converter(field_value)
+        return model.construct(**values)
+
+    models[model] = construct
+    fields.extend(
+        (name, field.alias, _field_converter(field, models)) for name, field in model.__fields__.items()
+    )
+    return construct
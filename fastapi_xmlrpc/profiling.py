@@ -0,0 +1,200 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import pstats
+import random
+import tracemalloc
+
+from typing import Awaitable, Callable, Optional, Union
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.types import Receive, Scope, Send
+
+__all__ = ("Profiler", "MethodProfile", "token_guard")
+
+
+# Decides if a request may use the admin path, sync or async
+Guard = Callable[[Request], Union[bool, Awaitable[bool]]]
+
+
+class MethodProfile:
+    __slots__ = ("calls", "stats", "peak_memory", "allocations")
+
+    def __init__(self):
+        self.calls = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.peak_memory = 0
+        # Allocation site -> [size, count] allocated by sampled calls and still alive at their end
+        self.allocations: dict[str, list[int]] = {}
+
+
+class Profiler:
+    # Runtime switch of XMLRPCMiddleware. While enabled, responses carry a Server-Timing header
+    # and a fraction of the calls of every sampled method runs under cProfile and tracemalloc.
+    #
+    # The admin path serves the aggregated stats on GET, clears them on DELETE, and takes
+    # enabled=0|1 or method=<name>&rate=<0..1> as query parameters on POST.
+    # It is served only with a guard, requests it doesn't allow get a 403. Without one the path
+    # goes to the application, profiling is then switched with enabled and sample() in code:
+    #
+    #     Profiler(guard=token_guard(os.environ["PROFILE_TOKEN"]))
+
+    __slots__ = ("path", "guard", "enabled", "sample_rates", "limit", "frames", "profiles", "active")
+
+    def __init__(
+            self,
+            path: str = "/debug/profile",
+            *,
+            guard: Optional[Guard] = None,
+            enabled: bool = False,
+            limit: int = 30,
+            frames: int = 1
+    ):
+        self.path = path
+        self.guard = guard
+        self.enabled = enabled
+        self.sample_rates: dict[str, float] = {}
+        # Rows of the dump and tracemalloc frames per allocation site
+        self.limit = limit
+        self.frames = frames
+
+        self.profiles: dict[str, MethodProfile] = {}
+        self.active = False
+
+    def sample(self, method_name: str, rate: float) -> None:
+        if rate > 0:
+            self.sample_rates[method_name] = min(rate, 1.0)
+        else:
+            self.sample_rates.pop(method_name, None)
+
+    def should_sample(self, method_name: str) -> bool:
+        # Only one call is profiled at a time, cProfile and tracemalloc are global to the process
+        rate = self.sample_rates.get(method_name)
+        return self.enabled and not self.active and rate is not None and random.random() < rate
+
+    async def profile(self, method_name: str, awaitable: Awaitable) -> None:
+        # Other tasks running on the event loop while the call awaits are profiled too
+        self.active = True
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        snapshot_before = tracemalloc.take_snapshot()
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await awaitable
+            finally:
+                profile.disable()
+
+                peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+                snapshot_after = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+
+                self._record(method_name, profile, peak_memory, snapshot_before, snapshot_after)
+        finally:
+            self.active = False
+
+    def _record(
+            self,
+            method_name: str,
+            profile: cProfile.Profile,
+            peak_memory: int,
+            snapshot_before: tracemalloc.Snapshot,
+            snapshot_after: tracemalloc.Snapshot
+    ) -> None:
+        method_profile = self.profiles.get(method_name)
+        if method_profile is None:
+            method_profile = self.profiles[method_name] = MethodProfile()
+
+        method_profile.calls += 1
+        method_profile.peak_memory = max(method_profile.peak_memory, peak_memory)
+
+        if method_profile.stats is None:
+            method_profile.stats = pstats.Stats(profile)
+        else:
+            method_profile.stats.add(profile)
+
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        differences = snapshot_after.filter_traces(ignore).compare_to(snapshot_before.filter_traces(ignore), "lineno")
+        for difference in differences:
+            if difference.size_diff <= 0:
+                continue
+            allocation = method_profile.allocations.setdefault(str(difference.traceback), [0, 0])
+            allocation[0] += difference.size_diff
+            allocation[1] += difference.count_diff
+
+    def reset(self) -> None:
+        self.profiles.clear()
+
+    def dump(self, method_name: Optional[str] = None) -> str:
+        output = io.StringIO()
+
+        print(f"enabled: {self.enabled}", file=output)
+        for name, rate in sorted(self.sample_rates.items()):
+            print(f"sampling {name}: {rate:.1%}", file=output)
+
+        for name, method_profile in sorted(self.profiles.items()):
+            if method_name is not None and name != method_name:
+                continue
+
+            print(f"\n== {name}: {method_profile.calls} sampled calls, "
+                  f"peak traced memory {method_profile.peak_memory} B", file=output)
+
+            print("\n-- cProfile, cumulative time", file=output)
+            method_profile.stats.stream = output
+            method_profile.stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.limit)
+
+            print("-- tracemalloc, allocated and alive at the end of the call", file=output)
+            allocations = sorted(method_profile.allocations.items(), key=lambda item: item[1][0], reverse=True)
+            for site, (size, count) in allocations[:self.limit]:
+                print(f"{size:>12} B {count:>8} blocks  {site}", file=output)
+
+        return output.getvalue()
+
+    def serves(self, scope: Scope) -> bool:
+        return self.guard is not None and scope["path"] == self.path
+
+    async def admin(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        params = request.query_params
+
+        allowed = self.guard(request)
+        if asyncio.iscoroutine(allowed):
+            allowed = await allowed
+        if not allowed:
+            return await PlainTextResponse("Forbidden", status_code=403)(scope, receive, send)
+
+        if request.method == "POST":
+            if "enabled" in params:
+                self.enabled = params["enabled"].lower() in ("1", "true", "yes", "on")
+            if "method" in params:
+                try:
+                    self.sample(params["method"], float(params.get("rate", 1.0)))
+                except ValueError:
+                    return await PlainTextResponse("rate must be a number", status_code=400)(scope, receive, send)
+        elif request.method == "DELETE":
+            self.reset()
+        elif request.method not in ("GET", "HEAD"):
+            return await PlainTextResponse("Method Not Allowed", status_code=405)(scope, receive, send)
+
+        await PlainTextResponse(self.dump(params.get("method")))(scope, receive, send)
+
+
+def token_guard(token: str, header: str = "X-Profile-Token") -> Guard:
+    # Allows requests that send token in header
+    if not token:
+        raise ValueError("token must not be empty")
+    expected = token.encode()
+
+    def guard(request: Request) -> bool:
+        return hmac.compare_digest(request.headers.get(header, "").encode(), expected)
+
+    return guard
@@ -1,6 +1,6 @@
 import typing
 
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 
 from fastapi_xmlrpc.parser.parser import XMLRPCHandler
 
@@ -12,3 +12,26 @@ class XMLRPCResponse(Response):
         if isinstance(content, Exception):
             return XMLRPCHandler.format_error(content)
         return XMLRPCHandler.format_success(content)
+
+
+class XMLRPCStreamingResponse(StreamingResponse):
+    media_type = "application/xml"
+
+    def __init__(self, content: typing.AsyncIterator, **kwargs) -> None:
+        super().__init__(XMLRPCHandler.format_success_stream(content), **kwargs)
+
+
+class XMLRPCBinaryResponse(StreamingResponse):
+    # Reading files may block, so the chunks are produced in the threadpool by StreamingResponse
+    media_type = "application/xml"
+
+    def __init__(self, content: typing.Any, **kwargs) -> None:
+        super().__init__(self._chunks(content), **kwargs)
+
+    @staticmethod
+    def _chunks(content: typing.Any) -> typing.Iterator[bytes]:
+        try:
+            yield from XMLRPCHandler.format_base64_stream(content)
+        finally:
+            if hasattr(content, "close"):
+                content.close()
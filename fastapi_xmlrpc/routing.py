@@ -4,7 +4,9 @@ from typing import (
     Any,
     Callable,
     Dict,
+    Hashable,
     List,
+    NamedTuple,
     Optional,
     Sequence,
     Type,
@@ -20,9 +22,82 @@ from fastapi.utils import generate_unique_id
 from starlette.responses import JSONResponse, Response
 from starlette.routing import BaseRoute
 
+from fastapi_xmlrpc.cache import ResponseCache, SingleFlight
+from fastapi_xmlrpc.limits import ConcurrencyLimit, hold_in_threads
+from fastapi_xmlrpc.offload import OffloadPolicy
+
+
+class XmlRpcMethodOptions(NamedTuple):
+    cache: Optional[ResponseCache] = None
+    single_flight: Optional[SingleFlight] = None
+    # Overrides max_body_size of XMLRPCMiddleware for this method
+    max_body_size: Optional[int] = None
+    # Concurrency limits a call must get a slot from, the method limit first, then the namespace limit
+    limits: tuple = ()
+    # Seconds a call may take from dispatch, queue wait included, it is answered with DeadlineExceeded after that
+    timeout: Optional[float] = None
+
+
+class XmlRpcRoute(APIRoute):
+    # Sync endpoints keep the concurrency slots of their call while they run in a worker thread,
+    # see fastapi_xmlrpc.limits.HeldSlots. include_router builds its copies with the same class,
+    # so every route wraps its own dependant and none is changed after it is built
+    def get_route_handler(self) -> Callable:
+        hold_in_threads(self.dependant)
+        return super().get_route_handler()
+
 
 class XmlRpcAPIRouter(APIRouter):
 
+    def __init__(self, *, offload_policy: Optional[OffloadPolicy] = None, **kwargs: Any) -> None:
+        kwargs.setdefault("route_class", XmlRpcRoute)
+        super().__init__(**kwargs)
+        # Moves parsing and serialization of large payloads out of the event loop
+        self.offload_policy = offload_policy
+        # XML-RPC specific options of every xml_rpc route, by route path
+        self.method_options: Dict[str, XmlRpcMethodOptions] = {}
+        # Limits of a single method, by route path
+        self.method_limits: Dict[str, ConcurrencyLimit] = {}
+        # Limits shared by every method of a namespace, by namespace
+        self.namespace_limits: Dict[str, ConcurrencyLimit] = {}
+        # Set once XMLRPCMiddleware took the options of the routes, they can't be changed after that
+        self.frozen = False
+
+    def method_name(self, path: str) -> str:
+        # /prefix/namespace/function -> namespace.function, the prefix isn't a part of the method name
+        return path[len(self.prefix):].lstrip("/").replace("/", ".", 1)
+
+    def limit_namespace(self, namespace: str, max_concurrency: int, max_queue: int = 0) -> ConcurrencyLimit:
+        # At most max_concurrency calls of all methods of namespace run at a time, applies to methods
+        # registered before and after, but must be set before XMLRPCMiddleware is added
+        if self.frozen:
+            raise RuntimeError(f"Limit of {namespace} must be set before XMLRPCMiddleware is added")
+
+        limit = self.namespace_limits[namespace] = ConcurrencyLimit(f'{namespace}.*', max_concurrency, max_queue)
+
+        prefix = f'{self.prefix}/{namespace}/'
+        for path, options in self.method_options.items():
+            if path.startswith(prefix):
+                self.method_options[path] = options._replace(limits=self._limits(path, namespace))
+        return limit
+
+    def _limits(self, path: str, namespace: str) -> tuple:
+        # The method limit first, then the namespace limit
+        limits = (self.method_limits.get(path), self.namespace_limits.get(namespace))
+        return tuple(limit for limit in limits if limit is not None)
+
+    def get_limits(self) -> list[ConcurrencyLimit]:
+        limits = {id(limit): limit for options in self.method_options.values() for limit in options.limits}
+        return list(limits.values())
+
+    def get_cache(self, namespace: str, function_name: str) -> Optional[ResponseCache]:
+        options = self.method_options.get(f'{self.prefix}/{namespace}/{function_name}')
+        return options.cache if options is not None else None
+
+    def get_single_flight(self, namespace: str, function_name: str) -> Optional[SingleFlight]:
+        options = self.method_options.get(f'{self.prefix}/{namespace}/{function_name}')
+        return options.single_flight if options is not None else None
+
     def xml_rpc(
         self,
         namespace: str,
@@ -52,7 +127,36 @@ class XmlRpcAPIRouter(APIRouter):
         generate_unique_id_function: Callable[[APIRoute], str] = Default(
             generate_unique_id
         ),
+        cache_ttl: Optional[float] = None,
+        cache_max_entries: int = 1024,
+        cache_key: Optional[Callable[[list], Hashable]] = None,
+        single_flight: bool = False,
+        max_body_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: int = 0,
+        timeout: Optional[float] = None,
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
+        cache = None
+        if cache_ttl is not None:
+            cache = ResponseCache(
+                f'{namespace}.{function_name}',
+                ttl=cache_ttl,
+                max_entries=cache_max_entries,
+                key=cache_key
+            )
+
+        path = f'{self.prefix}/{namespace}/{function_name}'
+        if max_concurrency is not None:
+            self.method_limits[path] = ConcurrencyLimit(f'{namespace}.{function_name}', max_concurrency, max_queue)
+
+        self.method_options[path] = XmlRpcMethodOptions(
+            cache=cache,
+            single_flight=SingleFlight(f'{namespace}.{function_name}') if single_flight else None,
+            max_body_size=max_body_size,
+            limits=self._limits(path, namespace),
+            timeout=timeout
+        )
+
         return self.api_route(
             path=f'/{namespace}/{function_name}',
             response_model=response_model,
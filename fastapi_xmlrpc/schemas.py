@@ -1,7 +1,38 @@
+import base64
+import binascii
+
 from pydantic import Extra, BaseModel
 
+from fastapi_xmlrpc.binary import BinaryFile
+
 
 class XMLRPCBaseModel(BaseModel):
 
     class Config:
         extra = Extra.forbid
+
+
+class Base64:
+    # Parameter type of <base64> values. Small values are passed as bytes,
+    # large ones as a BinaryFile, a file-like object backed by a spooled temporary file
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value):
+        if isinstance(value, (bytes, bytearray, memoryview, BinaryFile)):
+            return value
+
+        if isinstance(value, str):
+            try:
+                return base64.b64decode(value, validate=True)
+            except binascii.Error:
+                raise ValueError('invalid base64 value')
+
+        raise TypeError('base64 value expected')
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(type="string", format="byte")
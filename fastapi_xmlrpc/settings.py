@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 
 from pydantic import BaseSettings
 
@@ -6,6 +7,8 @@ from pydantic import BaseSettings
 class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     API_VERSION_PREFIX: str = "/v1"
+    # Startup snapshot written by python -m fastapi_xmlrpc.snapshot main:app
+    XMLRPC_SNAPSHOT: Optional[str] = None
 
 
 @lru_cache()
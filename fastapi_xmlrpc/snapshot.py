@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import importlib
+import inspect
+import sys
+import warnings
+
+from importlib import metadata
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Sequence
+
+import orjson
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+__all__ = ("Snapshot", "MethodSnapshot", "route_fingerprint", "load_snapshot", "write_snapshot", "SNAPSHOT_VERSION")
+
+
+# Bumped whenever the layout of the file or of the artifacts changes
+SNAPSHOT_VERSION = 2
+
+# Packages whose code shapes the artifacts, besides the endpoints and their models. Hashed whole,
+# the artifacts are built from more and more of their modules, plans, dispatch, lazy arrays
+GENERATOR_PACKAGES = ("fastapi_xmlrpc", "open_api")
+PACKAGES = ("fastapi", "pydantic")
+
+
+class MethodSnapshot(NamedTuple):
+    method_name: str
+    args: list[str]
+    embed: bool
+    stream: bool
+    binary: bool
+    file_args: frozenset
+    lazy: Optional[int]
+    openapi_extra: dict
+    responses: dict
+
+
+class Snapshot(NamedTuple):
+    # Per route artifacts computed by XMLRPCMiddleware and the rendered OpenAPI document,
+    # written by a build step and loaded by every worker instead of computing them again.
+    #
+    #     python -m fastapi_xmlrpc.snapshot main:app -o xmlrpc-snapshot.json
+
+    fingerprint: str
+    # Route path -> artifacts
+    methods: dict[str, MethodSnapshot]
+    openapi: Optional[dict]
+
+
+def route_fingerprint(routers: Sequence) -> str:
+    # Changes with the routes, the signatures of their endpoints and the source of every module
+    # that defines an endpoint, one of their models or the code generating the artifacts
+    digest = hashlib.sha256(f"{SNAPSHOT_VERSION}".encode())
+    for package in PACKAGES:
+        digest.update(f"{package}={metadata.version(package)}".encode())
+
+    for package_name in GENERATOR_PACKAGES:
+        root = Path(importlib.import_module(package_name).__file__).parent
+        for path in sorted(root.rglob("*.py")):
+            digest.update(f"{package_name}/{path.relative_to(root).as_posix()}".encode())
+            digest.update(path.read_bytes())
+
+    modules = set()
+    for router in routers:
+        digest.update(f"router {router.prefix}".encode())
+        for route in router.routes:
+            endpoint = route.endpoint
+            digest.update(f"{route.path} {endpoint.__module__}.{endpoint.__qualname__}".encode())
+            digest.update(str(inspect.signature(endpoint)).encode())
+            digest.update(repr(getattr(route, "response_model", None)).encode())
+
+            modules.add(endpoint.__module__)
+            for model in _models(route):
+                modules.add(model.__module__)
+
+    for module_name in sorted(modules):
+        if module_name.partition(".")[0] in GENERATOR_PACKAGES:
+            continue
+        digest.update(module_name.encode())
+        path = getattr(sys.modules.get(module_name), "__file__", None)
+        if path is not None:
+            with open(path, "rb") as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def _models(route) -> set:
+    # Models reachable from the parameters and the response model of a route
+    types = [parameter.annotation for parameter in inspect.signature(route.endpoint).parameters.values()]
+    types.append(getattr(route, "response_model", None))
+
+    models = set()
+    while types:
+        annotation = types.pop()
+        types.extend(getattr(annotation, "__args__", ()))
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel) and annotation not in models:
+            models.add(annotation)
+            types.extend(field.outer_type_ for field in annotation.__fields__.values())
+    return models
+
+
+def load_snapshot(path: Optional[str], routers: Sequence) -> Optional[Snapshot]:
+    # None when there is no snapshot, or when it was built from other routes or by another version,
+    # workers then compute everything as without a snapshot
+    if path is None:
+        return None
+
+    try:
+        with open(path, "rb") as file:
+            data = orjson.loads(file.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, orjson.JSONDecodeError) as exc:
+        warnings.warn(f"XML-RPC snapshot {path} can't be read, {exc}", RuntimeWarning)
+        return None
+
+    if data.get("version") != SNAPSHOT_VERSION or data.get("fingerprint") != route_fingerprint(routers):
+        warnings.warn(f"XML-RPC snapshot {path} is stale, artifacts are computed at startup", RuntimeWarning)
+        return None
+
+    methods = {
+        path: MethodSnapshot(**dict(method, file_args=frozenset(method["file_args"])))
+        for path, method in data["methods"].items()
+    }
+    return Snapshot(fingerprint=data["fingerprint"], methods=methods, openapi=data.get("openapi"))
+
+
+def write_snapshot(path: str, app: FastAPI) -> Snapshot:
+    # The middleware stack of app is built on add_middleware, so its routes already carry their artifacts
+    routers = _xmlrpc_routers(app)
+
+    methods = {}
+    for router in routers:
+        for route in router.routes:
+            artifacts = getattr(route, "xmlrpc_artifacts", None)
+            if artifacts is None:
+                raise RuntimeError(f"{route.path} has no XML-RPC artifacts, is XMLRPCMiddleware added to the app?")
+
+            endpoint = artifacts.endpoint
+            methods[route.path] = MethodSnapshot(
+                method_name=endpoint.name,
+                args=endpoint.args,
+                embed=endpoint.embed,
+                stream=endpoint.stream,
+                binary=endpoint.binary,
+                file_args=endpoint.file_args,
+                lazy=endpoint.lazy,
+                # Copied before rendering the OpenAPI document, custom renderers move schemas out of them
+                openapi_extra=orjson.loads(orjson.dumps(artifacts.openapi_extra)),
+                responses=orjson.loads(orjson.dumps(artifacts.responses, option=orjson.OPT_NON_STR_KEYS)),
+            )
+
+    snapshot = Snapshot(fingerprint=route_fingerprint(routers), methods=methods, openapi=app.openapi())
+
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": snapshot.fingerprint,
+        "methods": {path: method._asdict() for path, method in methods.items()},
+        "openapi": snapshot.openapi,
+    }
+    with open(path, "wb") as file:
+        file.write(orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2))
+
+    return snapshot
+
+
+def _default(value: Any):
+    if isinstance(value, frozenset):
+        return sorted(value)
+    raise TypeError
+
+
+def _xmlrpc_routers(app: FastAPI) -> list:
+    from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+
+    for middleware in app.user_middleware:
+        if middleware.cls is XMLRPCMiddleware:
+            router = middleware.options.get("router")
+            return [*([router] if router is not None else []), *middleware.options.get("routers", ())]
+    raise RuntimeError("XMLRPCMiddleware isn't added to the app")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m fastapi_xmlrpc.snapshot",
+        description="Write the XML-RPC startup snapshot of an application"
+    )
+    parser.add_argument("app", help="application import string, module:attribute")
+    parser.add_argument("-o", "--output", default="xmlrpc-snapshot.json")
+    args = parser.parse_args(argv)
+
+    module_name, _, attribute = args.app.partition(":")
+    app = getattr(importlib.import_module(module_name), attribute or "app")
+
+    snapshot = write_snapshot(args.output, app)
+    print(f"{len(snapshot.methods)} methods written to {args.output}, fingerprint {snapshot.fingerprint[:16]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,8 @@ from fastapi.openapi.utils import get_openapi
 from app.main.endpoints.eps import router as eps_router
 from open_api.schemas import default_ref_template
 from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+from fastapi_xmlrpc.settings import settings
+from fastapi_xmlrpc.snapshot import load_snapshot
 from fastapi_xmlrpc.errors import *
 
 
@@ -59,10 +61,16 @@ def custom_openapi():
 def get_application() -> FastAPI:
     application = FastAPI()
 
+    # Artifacts and the OpenAPI document are loaded instead of computed when the snapshot matches the routes
+    snapshot = load_snapshot(settings.XMLRPC_SNAPSHOT, [eps_router])
+
     application.add_middleware(
         XMLRPCMiddleware,
-        router=eps_router
+        router=eps_router,
+        snapshot=snapshot
     )
+    if snapshot is not None:
+        application.openapi_schema = snapshot.openapi
 
     #  required after add_middleware
     application.include_router(eps_router)
@@ -1,21 +1,42 @@
+from hashlib import sha1
 from types import GenericAlias
 from typing import Union, get_args, get_origin, Any, _GenericAlias, Literal
-from uuid import uuid4
 
 from pydantic.main import ModelMetaclass
 
-from open_api.schemas import XMLRPCStructT, IntT, XMLRPCArrayT, XMLRPCValue, StrT, BoolT, create_schema
+from fastapi_xmlrpc.schemas import Base64
+from open_api.schemas import XMLRPCStructT, IntT, XMLRPCArrayT, XMLRPCValue, StrT, BoolT, Base64T, create_schema
 
 
 ALLOWED_TYPES = Literal['array', 'struct']
 
 
+def stable_name(prefix: str, content: Any) -> str:
+    # Same content gives the same model name in every process and on every rebuild
+    return f'{prefix}_{sha1(_describe(content).encode()).hexdigest()[:16]}'
+
+
+def _describe(content: Any) -> str:
+    # Models are described by their module, qualname and fields, classes of the same name stay apart
+    if isinstance(content, ModelMetaclass):
+        fields = ", ".join(
+            f'{name}: {field.outer_type_!r}{"" if field.required else " = ..."}'
+            for name, field in content.__fields__.items()
+        )
+        return f'{content.__module__}.{content.__qualname__}({fields})'
+    if isinstance(content, (tuple, list)):
+        return f'({", ".join(map(_describe, content))})'
+    return repr(content)
+
+
 class SchemaGenerator:
 
     SINGLE_TYPES = {
         int: IntT,
         str: StrT,
-        bool: BoolT
+        bool: BoolT,
+        bytes: Base64T,
+        Base64: Base64T,
     }
 
     IS_OBJECT_INSTANCE = {
@@ -23,6 +44,10 @@ class SchemaGenerator:
         'struct': (ModelMetaclass, dict),
     }
 
+    # Generated models, shared by all generators
+    CALL_SCHEMAS: dict = {}
+    TYPE_SCHEMAS: dict = {}
+
     def __call__(
             self,
             types: list,
@@ -30,10 +55,20 @@ class SchemaGenerator:
             res: bool = False,
             is_fault: bool = False
     ):
+        key = (tuple(types), method_name, res, is_fault)
+        try:
+            return self.CALL_SCHEMAS[key]
+        except KeyError:
+            schema = self.CALL_SCHEMAS[key] = self._create_call_schema(types, method_name, res, is_fault)
+            return schema
+        except TypeError:
+            return self._create_call_schema(types, method_name, res, is_fault)
+
+    def _create_call_schema(self, types: list, method_name: str, res: bool, is_fault: bool):
         s = tuple([XMLRPCValue[self.create_schemas(_)] for _ in types])
 
         param = create_schema(
-            f'param_{uuid4()}',
+            stable_name('param', s),
             param=(list[Union[s]], ...)
         )
 
@@ -41,19 +76,19 @@ class SchemaGenerator:
 
             if is_fault:
                 schema = create_schema(
-                    f'methodResponse_{uuid4()}',
+                    stable_name('methodResponse', ('fault', s)),
                     fault=(s[0], ...)
                 )
 
             else:
                 schema = create_schema(
-                    f'methodResponse_{uuid4()}',
+                    stable_name('methodResponse', ('params', s)),
                     params=(param, ...)
                 )
 
         else:
             schema = create_schema(
-                f'methodCall_{uuid4()}',
+                stable_name('methodCall', (method_name, s)),
                 methodName=(str, method_name),
                 params=(param, ...),
             )
@@ -61,6 +96,15 @@ class SchemaGenerator:
         return schema
 
     def create_schemas(self, obj: Any):
+        try:
+            return self.TYPE_SCHEMAS[obj]
+        except KeyError:
+            schema = self.TYPE_SCHEMAS[obj] = self._create_schemas(obj)
+            return schema
+        except TypeError:
+            return self._create_schemas(obj)
+
+    def _create_schemas(self, obj: Any):
         if self.check_type(obj, 'struct'):
             return self.struct(obj)
 
@@ -97,19 +141,19 @@ class SchemaGenerator:
         members = []
         for field, attribute in obj.__fields__.items():
             data = create_schema(
-                f'element_{uuid4()}',
+                stable_name('element', (obj, field)),
                 name=(str, field),
                 value=(self.create_schemas(attribute.outer_type_), ...)
             )
             members.append(data)
 
         member = create_schema(
-            f'member_{uuid4()}',
+            stable_name('member', obj),
             member=(list[Union[tuple(members)]], ...)
         )
 
         struct_s = create_schema(
-            f'struct_{uuid4()}',
+            stable_name('struct', obj),
             struct=(member, ...)
         )
 
@@ -50,6 +50,7 @@ StrT = create_schema("StrT", string=(str, ...))
 BoolT = create_schema("BoolT", boolean=(bool, ...))
 DoubleT = create_schema("DoubleT", double=(Decimal, ...))
 FloatT = create_schema("FloatT", float=(float, ...))
+Base64T = create_schema("Base64T", base64=(str, ...))
 
 
 class BaseGen(GenericModel, Generic[ValueType]):
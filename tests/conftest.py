@@ -0,0 +1,81 @@
+import json
+
+from typing import Any, Optional, Sequence
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException
+from starlette.testclient import TestClient
+
+from fastapi_xmlrpc.errors import (
+    xmlrpc_error_handler,
+    request_validation_error_handler,
+    http_error_handler
+)
+from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import XMLRPCError
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+class RPC:
+    # XML-RPC calls through a TestClient of the application
+
+    __slots__ = ("app", "client")
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        # Entered, so every request runs on the same event loop, like under a server
+        self.client = TestClient(app).__enter__()
+
+    def close(self) -> None:
+        self.client.__exit__(None, None, None)
+
+    def post(self, method_name: str, *args: Any, path: str = "/RPC2", headers: Optional[dict] = None):
+        return self.client.post(
+            path,
+            data=XMLRPCHandler.format_call(method_name, args),
+            headers={"Content-Type": "text/xml", **(headers or {})}
+        )
+
+    def jsonrpc(self, payload: Any, path: str = "/RPC2", headers: Optional[dict] = None):
+        return self.client.post(
+            path,
+            data=json.dumps(payload),
+            headers={"Content-Type": "application/json-rpc", **(headers or {})}
+        )
+
+    def call(self, method_name: str, *args: Any, **kwargs: Any) -> Any:
+        # The result of the call, faults are raised as the exceptions registered for their codes
+        response = self.post(method_name, *args, **kwargs)
+        assert response.status_code == 200, response.text
+        return decode_method_response(response.content)
+
+
+def build_app(routers, *, prefix: str = "", dependencies: Sequence = (), **options: Any) -> FastAPI:
+    # Same setup as main.get_application
+    app = FastAPI()
+    app.add_middleware(XMLRPCMiddleware, routers=routers, **options)
+    for router in routers:
+        app.include_router(router, prefix=prefix, dependencies=list(dependencies))
+
+    app.add_exception_handler(RequestValidationError, request_validation_error_handler)
+    app.add_exception_handler(XMLRPCError, xmlrpc_error_handler)
+    app.add_exception_handler(HTTPException, http_error_handler)
+    return app
+
+
+@pytest.fixture
+def serve():
+    served = []
+
+    def serve(*routers, **options: Any) -> RPC:
+        rpc = RPC(build_app(routers, **options))
+        served.append(rpc)
+        return rpc
+
+    yield serve
+    for rpc in served:
+        rpc.close()
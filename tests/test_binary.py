@@ -0,0 +1,42 @@
+import hashlib
+import pickle
+
+from aiohttp_xmlrpc.common import Binary
+from fastapi import Body
+
+from fastapi_xmlrpc.binary import BinaryFile, SPOOL_MAX_SIZE
+from fastapi_xmlrpc.offload import OffloadPolicy
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+from fastapi_xmlrpc.schemas import Base64
+
+
+def test_rolled_over_binary_file_pickles_with_its_content():
+    data = bytes(range(256)) * (SPOOL_MAX_SIZE // 256 + 1)
+    value = BinaryFile.from_bytes(data)
+    value.read(10)
+    assert value.file._rolled
+
+    copy = pickle.loads(pickle.dumps(value))
+
+    assert copy.getvalue() == data
+    assert copy.tell() == 0
+    assert value.tell() == 10
+
+
+def test_large_base64_parsed_in_a_process_pool(serve):
+    policy = OffloadPolicy(threshold=1024, use_processes=True, max_workers=1)
+    router = XmlRpcAPIRouter(offload_policy=policy)
+
+    @router.xml_rpc(namespace="files", function_name="size")
+    def size(data: Base64 = Body(...)):
+        assert isinstance(data, BinaryFile)
+        return [data.size, hashlib.sha256(data.getvalue()).hexdigest()]
+
+    data = b"x" * (SPOOL_MAX_SIZE + 1)
+
+    rpc = serve(router)
+    try:
+        assert rpc.call("files.size", Binary(data)) == [len(data), hashlib.sha256(data).hexdigest()]
+    finally:
+        policy.shutdown()
+    assert policy.offloaded["parse"] == 1
@@ -0,0 +1,86 @@
+import gzip
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.metrics import Metrics, UNKNOWN_METHOD
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import PayloadTooLarge
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="text", function_name="echo")
+    def echo(words: list[str] = Body(...)):
+        return words
+
+    @router.xml_rpc(namespace="text", function_name="short", max_body_size=512)
+    def short(words: list[str] = Body(...)):
+        return words
+
+    return router
+
+
+def chunks(data: bytes, size: int = 256):
+    for index in range(0, len(data), size):
+        yield data[index:index + size]
+
+
+def post(rpc, method_name: str, words: list, *, chunked: bool = False, path: str = "/RPC2", encoding=None):
+    body = XMLRPCHandler.format_call(method_name, [words])
+    headers = {"Content-Type": "text/xml"}
+    if encoding is not None:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = encoding
+    return rpc.client.post(path, data=chunks(body) if chunked else body, headers=headers)
+
+
+def assert_too_large(response) -> None:
+    assert response.status_code == 413
+    with pytest.raises(PayloadTooLarge):
+        decode_method_response(response.content)
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_server_limit(serve, chunked):
+    metrics = Metrics()
+    rpc = serve(make_router(), max_body_size=4096, metrics=metrics)
+
+    response = post(rpc, "text.echo", ["word"] * 10, chunked=chunked)
+    assert decode_method_response(response.content) == ["word"] * 10
+
+    assert_too_large(post(rpc, "text.echo", ["word"] * 1000, chunked=chunked))
+    # Refused from the Content-Length header before the method name is known, or as the body is read
+    if chunked:
+        assert metrics.methods["text.echo"].rejected == {"body": 1}
+    else:
+        assert metrics.methods[UNKNOWN_METHOD].rejected == {"header": 1}
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_method_limit(serve, chunked):
+    rpc = serve(make_router())
+
+    assert_too_large(post(rpc, "text.short", ["word"] * 100, chunked=chunked))
+    assert decode_method_response(post(rpc, "text.short", ["word"], chunked=chunked).content) == ["word"]
+    assert decode_method_response(post(rpc, "text.echo", ["word"] * 100, chunked=chunked).content) == ["word"] * 100
+
+
+def test_method_limit_at_its_path(serve):
+    metrics = Metrics()
+    rpc = serve(make_router(), metrics=metrics)
+
+    # Known from the path, the limit applies before the body is read
+    assert_too_large(post(rpc, "text.short", ["word"] * 100, path="/text/short"))
+    assert metrics.methods["text.short"].rejected == {"header": 1}
+
+
+def test_inflated_bodies_are_limited(serve):
+    rpc = serve(make_router(), max_body_size=4096)
+
+    # Small as received, over the limit once inflated
+    assert_too_large(post(rpc, "text.echo", ["word"] * 1000, encoding="gzip"))
@@ -0,0 +1,261 @@
+import asyncio
+import threading
+import time
+
+from fastapi import Body, Depends, Header
+from starlette.exceptions import HTTPException
+
+from fastapi_xmlrpc.cache import CachedResponse, ResponseCache
+from fastapi_xmlrpc.deadline import DeadlineExceeded
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import ServerError
+from fastapi_xmlrpc.parser.serializer import XML_DECLARATION
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def run_concurrently(*calls):
+    results = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            results[index] = call()
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_single_flight_followers_run_on_their_own_after_a_timeout(serve):
+    router = XmlRpcAPIRouter()
+    started = threading.Event()
+    calls = []
+
+    @router.xml_rpc(namespace="reports", function_name="build", single_flight=True, timeout=0.2)
+    async def build(name: str = Body(...)):
+        calls.append(name)
+        if len(calls) == 1:
+            started.set()
+            await asyncio.sleep(1)
+        return name
+
+    rpc = serve(router)
+
+    def follower():
+        started.wait(1)
+        return rpc.call("reports.build", "daily")
+
+    leader, follower = run_concurrently(lambda: rpc.call("reports.build", "daily"), follower)
+
+    assert isinstance(leader, DeadlineExceeded)
+    assert follower == "daily"
+    assert calls == ["daily", "daily"]
+    assert router.get_single_flight("reports", "build").stats()["fallbacks"] == 1
+
+
+def test_single_flight_followers_share_the_fault_of_the_endpoint(serve):
+    router = XmlRpcAPIRouter()
+    started = threading.Event()
+    calls = []
+
+    @router.xml_rpc(namespace="reports", function_name="build", single_flight=True)
+    async def build(name: str = Body(...)):
+        calls.append(name)
+        started.set()
+        await asyncio.sleep(0.2)
+        raise ServerError(f"{name} failed")
+
+    rpc = serve(router)
+
+    def follower():
+        started.wait(1)
+        return rpc.call("reports.build", "daily")
+
+    leader, follower = run_concurrently(lambda: rpc.call("reports.build", "daily"), follower)
+
+    assert isinstance(leader, ServerError) and isinstance(follower, ServerError)
+    assert str(follower) == str(leader)
+    assert calls == ["daily"]
+
+
+def test_cached_calls_skip_the_endpoint(serve):
+    router = XmlRpcAPIRouter()
+    calls = []
+
+    @router.xml_rpc(namespace="reports", function_name="get", cache_ttl=60)
+    def get(name: str = Body(...)):
+        calls.append(name)
+        return {"name": name, "rows": [1, 2, 3]}
+
+    rpc = serve(router)
+
+    assert rpc.call("reports.get", "daily") == {"name": "daily", "rows": [1, 2, 3]}
+    assert rpc.call("reports.get", "daily") == {"name": "daily", "rows": [1, 2, 3]}
+    assert rpc.call("reports.get", "weekly")["name"] == "weekly"
+    assert calls == ["daily", "weekly"]
+    assert router.get_cache("reports", "get").stats()["hits"] == 1
+
+
+def check_token(x_token: str = Header(None)) -> str:
+    if x_token not in ("alice", "bob"):
+        raise HTTPException(403, "Forbidden")
+    return x_token
+
+
+def test_cached_calls_pass_the_dependencies_first(serve):
+    router = XmlRpcAPIRouter()
+    calls = []
+
+    @router.xml_rpc(
+        namespace="reports", function_name="private", cache_ttl=60, dependencies=[Depends(check_token)]
+    )
+    def private(name: str = Body(...)):
+        calls.append(name)
+        return f"{name} report"
+
+    rpc = serve(router)
+
+    assert rpc.post("reports.private", "daily").status_code == 403
+    assert rpc.call("reports.private", "daily", headers={"X-Token": "alice"}) == "daily report"
+
+    # The cache is warm, callers without a valid token are still refused
+    assert rpc.post("reports.private", "daily").status_code == 403
+    assert rpc.post("reports.private", "daily", headers={"X-Token": "mallory"}).status_code == 403
+    assert rpc.call("reports.private", "daily", headers={"X-Token": "bob"}) == "daily report"
+    assert calls == ["daily"]
+
+
+def test_single_flight_followers_pass_the_dependencies_first(serve):
+    router = XmlRpcAPIRouter()
+    started = threading.Event()
+    calls = []
+
+    @router.xml_rpc(
+        namespace="reports", function_name="private", single_flight=True, dependencies=[Depends(check_token)]
+    )
+    async def private(name: str = Body(...)):
+        calls.append(name)
+        started.set()
+        await asyncio.sleep(0.2)
+        return f"{name} report"
+
+    rpc = serve(router)
+
+    def follower(headers):
+        def call():
+            started.wait(1)
+            return rpc.post("reports.private", "daily", headers=headers)
+        return call
+
+    leader, anonymous, member = run_concurrently(
+        lambda: rpc.call("reports.private", "daily", headers={"X-Token": "alice"}),
+        follower({}),
+        follower({"X-Token": "bob"}),
+    )
+
+    # The caller without a token is refused while the call of alice is in flight, bob shares its response
+    assert leader == "daily report"
+    assert anonymous.status_code == 403
+    assert decode_method_response(member.content) == "daily report"
+    assert calls == ["daily"]
+    assert router.get_single_flight("reports", "private").stats()["collapsed"] == 1
+
+
+def test_calls_with_args_that_cant_be_keyed_arent_cached(serve):
+    router = XmlRpcAPIRouter()
+    calls = []
+
+    @router.xml_rpc(namespace="math", function_name="double", cache_ttl=60)
+    def double(value: int = Body(...)):
+        calls.append(value)
+        return str(value * 2)
+
+    # The JSON path can't pass integers beyond 64 bits to the endpoint either
+    rpc = serve(router, direct_dispatch=True)
+    # Integers beyond 32 bits are rendered as <double>, other clients send them as <int>
+    body = XML_DECLARATION + (
+        f"<methodCall><methodName>math.double</methodName>"
+        f"<params><param><value><int>{2 ** 70}</int></value></param></params></methodCall>"
+    ).encode()
+
+    for _ in range(2):
+        response = rpc.client.post("/RPC2", data=body, headers={"Content-Type": "text/xml"})
+        assert decode_method_response(response.content) == str(2 ** 71)
+    assert calls == [2 ** 70, 2 ** 70]
+    assert router.get_cache("math", "double").stats()["entries"] == 0
+
+
+def response(body: bytes) -> CachedResponse:
+    return CachedResponse({"type": "http.response.start", "status": 200, "headers": []}, body)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache("reports.get", ttl=0.05)
+    key = cache.key("reports.get", ["daily"])
+    cache.set(key, response(b"daily"))
+
+    assert cache.get(key) == response(b"daily")
+    time.sleep(0.06)
+    assert cache.get(key) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "evictions": 1}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache("reports.get", ttl=60, max_entries=2)
+    daily, weekly, monthly = (cache.key("reports.get", [name]) for name in ("daily", "weekly", "monthly"))
+
+    cache.set(daily, response(b"daily"))
+    cache.set(weekly, response(b"weekly"))
+    assert cache.get(daily) is not None
+
+    cache.set(monthly, response(b"monthly"))
+    assert cache.get(weekly) is None
+    assert cache.get(daily) is not None
+    assert cache.get(monthly) is not None
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_invalidate_and_clear():
+    cache = ResponseCache("reports.get", ttl=60)
+    for name in ("daily", "weekly"):
+        cache.set(cache.key("reports.get", [name]), response(name.encode()))
+
+    assert cache.invalidate("daily")
+    assert not cache.invalidate("daily")
+    assert not cache.invalidate(2 ** 70)
+    assert cache.get(cache.key("reports.get", ["daily"])) is None
+    assert cache.get(cache.key("reports.get", ["weekly"])) is not None
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_custom_keys():
+    cache = ResponseCache("reports.get", ttl=60, key=lambda args: args[0].lower())
+
+    cache.set(cache.key("reports.get", ["Daily"]), response(b"daily"))
+    assert cache.get(cache.key("reports.get", ["DAILY"])) == response(b"daily")
+
+
+def test_invalidated_calls_run_the_endpoint_again(serve):
+    router = XmlRpcAPIRouter()
+    calls = []
+
+    @router.xml_rpc(namespace="reports", function_name="get", cache_ttl=60)
+    def get(name: str = Body(...)):
+        calls.append(name)
+        return name
+
+    rpc = serve(router)
+    cache = router.get_cache("reports", "get")
+
+    rpc.call("reports.get", "daily")
+    rpc.call("reports.get", "daily")
+    assert cache.invalidate("daily")
+    rpc.call("reports.get", "daily")
+    assert calls == ["daily", "daily"]
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "evictions": 0}
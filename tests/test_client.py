@@ -0,0 +1,85 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from fastapi import Body
+
+from fastapi_xmlrpc.client import XMLRPCClient
+from fastapi_xmlrpc.parser.exceptions import MethodNotFound
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+from tests.conftest import build_app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="math", function_name="add")
+    def add(a: int = Body(...), b: int = Body(...)):
+        return a + b
+
+    @router.xml_rpc(namespace="text", function_name="join")
+    async def join(words: list[str] = Body(...)):
+        return " ".join(words)
+
+    return router
+
+
+@pytest.fixture
+def url():
+    # The application included under a prefix, served by uvicorn in a thread
+    app = build_app([make_router()], prefix="/api")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}/api/RPC2"
+
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.mark.anyio
+async def test_calls_are_dispatched_by_method_name(url):
+    async with XMLRPCClient(url) as client:
+        assert await client.math.add(2, 3) == 5
+        assert await client.map([("math.add", (1, 1)), ("text.join", (["a", "b"],))]) == [2, "a b"]
+        assert await client.multicall([("math.add", (1, 2)), ("text.join", (["c"],))]) == [3, "c"]
+
+        with pytest.raises(MethodNotFound):
+            await client.math.sub(2, 3)
+
+
+@pytest.mark.anyio
+async def test_compressed_calls(url):
+    async with XMLRPCClient(url, compress_threshold=0) as client:
+        assert await client.text.join(["word"] * 1000) == " ".join(["word"] * 1000)
+
+
+def test_method_paths():
+    assert XMLRPCClient("http://host/api/")._url("math.add") == "http://host/api"
+
+    client = XMLRPCClient("http://host/api", method_paths=True)
+    assert client._url("math.add") == "http://host/api/math/add"
+    assert client._url("system.multicall") == "http://host/api"
+
+
+def test_client_does_not_import_the_server():
+    code = "import sys, fastapi_xmlrpc.client; print('fastapi_xmlrpc.middleware' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,97 @@
+import gzip
+import zlib
+
+from typing import Iterator
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.compression import Compression
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="text", function_name="echo")
+    def echo(words: list[str] = Body(...)):
+        return words
+
+    @router.xml_rpc(namespace="text", function_name="stream")
+    def stream(count: int = Body(...)) -> Iterator[str]:
+        for index in range(count):
+            yield f"word {index}"
+
+    return router
+
+
+def deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def chunks(data: bytes, size: int = 1024):
+    # Sent chunked, without a Content-Length, so the body is parsed as it arrives
+    for index in range(0, len(data), size):
+        yield data[index:index + size]
+
+
+WORDS = ["word"] * 2000
+
+
+@pytest.mark.parametrize("encoding, compress", [("gzip", gzip.compress), ("deflate", deflate)])
+@pytest.mark.parametrize("chunked", [False, True])
+def test_compressed_request_bodies(serve, encoding, compress, chunked):
+    rpc = serve(make_router())
+    body = compress(XMLRPCHandler.format_call("text.echo", [WORDS]))
+
+    response = rpc.client.post(
+        "/RPC2",
+        data=chunks(body) if chunked else body,
+        headers={"Content-Type": "text/xml", "Content-Encoding": encoding}
+    )
+    assert response.status_code == 200
+    assert decode_method_response(response.content) == WORDS
+
+
+def test_invalid_request_bodies(serve):
+    rpc = serve(make_router())
+    body = XMLRPCHandler.format_call("text.echo", [WORDS])
+
+    response = rpc.client.post("/RPC2", data=body, headers={"Content-Type": "text/xml", "Content-Encoding": "br"})
+    assert response.status_code == 415
+
+    response = rpc.client.post("/RPC2", data=body, headers={"Content-Type": "text/xml", "Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_compressed_responses(serve, encoding):
+    rpc = serve(make_router(), compression=Compression(minimum_size=1024))
+    headers = {"Accept-Encoding": encoding}
+
+    response = rpc.post("text.echo", WORDS, headers=headers)
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert decode_method_response(response.content) == WORDS
+
+    # Streamed responses are compressed chunk by chunk
+    response = rpc.post("text.stream", 1000, headers=headers)
+    assert response.headers["Content-Encoding"] == encoding
+    assert decode_method_response(response.content) == [f"word {index}" for index in range(1000)]
+
+    # Small responses are sent as they are
+    response = rpc.post("text.echo", ["word"], headers=headers)
+    assert "Content-Encoding" not in response.headers
+    assert decode_method_response(response.content) == ["word"]
+
+
+def test_responses_without_accepted_encoding(serve):
+    rpc = serve(make_router(), compression=Compression(minimum_size=0))
+
+    response = rpc.post("text.echo", WORDS, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert decode_method_response(response.content) == WORDS
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.deadline import DEADLINE_HEADER, DeadlineExceeded, remaining
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="task", function_name="sleep")
+    async def sleep(seconds: float = Body(...)):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    @router.xml_rpc(namespace="task", function_name="bounded", timeout=0.05)
+    async def bounded(seconds: float = Body(...)):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    @router.xml_rpc(namespace="task", function_name="remaining")
+    async def left(seconds: float = Body(...)):
+        return remaining()
+
+    return router
+
+
+def test_method_timeout(serve):
+    rpc = serve(make_router())
+
+    assert rpc.call("task.bounded", 0) == 0
+    with pytest.raises(DeadlineExceeded):
+        rpc.call("task.bounded", 5)
+
+
+def test_client_deadline(serve):
+    rpc = serve(make_router())
+
+    assert rpc.call("task.sleep", 0, headers={DEADLINE_HEADER: "5"}) == 0
+    with pytest.raises(DeadlineExceeded):
+        rpc.call("task.sleep", 5, headers={DEADLINE_HEADER: "0.05"})
+
+    # The earlier of the client deadline and the method timeout applies
+    with pytest.raises(DeadlineExceeded):
+        rpc.call("task.bounded", 5, headers={DEADLINE_HEADER: "10"})
+
+
+def test_remaining_time_is_visible_to_endpoints(serve):
+    rpc = serve(make_router())
+
+    assert rpc.call("task.remaining", 0) is None
+    assert 0 < rpc.call("task.remaining", 0, headers={DEADLINE_HEADER: "10"}) <= 10
+
+
+def test_multicall_entries_within_the_client_deadline(serve):
+    rpc = serve(make_router())
+
+    response = rpc.post(
+        "system.multicall",
+        [{"methodName": "task.bounded", "params": [5]}, {"methodName": "task.sleep", "params": [0]}]
+    )
+    bounded, sleep = decode_method_response(response.content)
+    assert bounded["faultCode"] == DeadlineExceeded.code
+    assert sleep == [0]
+
+    with pytest.raises(DeadlineExceeded):
+        rpc.call("system.multicall", [{"methodName": "task.sleep", "params": [5]}], headers={DEADLINE_HEADER: "0.05"})
+
+
+@pytest.mark.parametrize("value", ["soon", "-1", "nan"])
+def test_invalid_deadline_header(serve, value):
+    rpc = serve(make_router())
+
+    response = rpc.post("task.sleep", 0, headers={DEADLINE_HEADER: value})
+    assert response.status_code == 400
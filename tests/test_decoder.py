@@ -0,0 +1,118 @@
+import os
+
+from datetime import datetime
+
+import pytest
+
+from aiohttp_xmlrpc.common import Binary
+
+from fastapi_xmlrpc.binary import BinaryFile, INLINE_BINARY_SIZE
+from fastapi_xmlrpc.parser import decoder
+from fastapi_xmlrpc.parser.decoder import (
+    XMLRPCBufferedParser,
+    XMLRPCStreamParser,
+    decode_chunks,
+    decode_method_outcome,
+    decode_method_response
+)
+from fastapi_xmlrpc.parser.exceptions import InvalidData, ParseError, exception_fault
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+ARGS = [
+    1, -7, 2.5, True, "text <&> ünïcode", "", None, datetime(2022, 3, 1, 12, 30, 15),
+    Binary(b"\x00\x01binary"), [], {}, [1, ["a", {"b": [None, 2.0]}]], {"name": "x", "items": [{"id": 1}]},
+]
+
+
+def body(*args) -> bytes:
+    return XMLRPCHandler.format_call("ns.method", args)
+
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [data[index:index + size] for index in range(0, len(data), size)]
+
+
+def stream(chunks: list[bytes]):
+    parser = XMLRPCStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_decoders_agree_with_the_tree_decoder(chunk_size):
+    data = body(*ARGS)
+    expected = XMLRPCHandler.handle(data)
+
+    assert expected == ("ns.method", ARGS)
+    assert decode_chunks(split(data, chunk_size)) == expected
+    assert stream(split(data, chunk_size)) == expected
+
+
+def test_method_name_is_known_before_the_body_ends():
+    data = body(*ARGS)
+    parser = XMLRPCStreamParser()
+    parser.feed(data[:data.index(b"<params>")])
+
+    assert parser.method_name == "ns.method"
+
+
+@pytest.mark.parametrize("size", [16, 64 * 1024, INLINE_BINARY_SIZE + 1])
+def test_base64_values_decode_the_same_with_both_parsers(monkeypatch, size):
+    value = os.urandom(size)
+    data = body("name", Binary(value))
+
+    lxml_calls = []
+    decode_with_lxml = decoder._decode_with_lxml
+    monkeypatch.setattr(decoder, "_decode_with_lxml", lambda *args: lxml_calls.append(args) or decode_with_lxml(*args))
+
+    for method_name, args in (decode_chunks(split(data, 4096)), stream(split(data, 4096))):
+        assert method_name == "ns.method"
+        assert args[0] == "name"
+        decoded = args[1]
+        if size > INLINE_BINARY_SIZE:
+            assert isinstance(decoded, BinaryFile) and decoded.getvalue() == value
+        else:
+            assert decoded == value
+
+    # Large base64 values are decoded by lxml, expat is slower for them
+    assert len(lxml_calls) == (len(data) > decoder.EXPAT_BASE64_MAX_SIZE)
+
+
+@pytest.mark.parametrize("parser_class", [XMLRPCBufferedParser, XMLRPCStreamParser])
+@pytest.mark.parametrize("data", [
+    b"<methodCall><methodName>a.b</methodName><params>",
+    b"<methodCall><params></params></methodCall>",
+    b"not xml",
+])
+def test_invalid_bodies_are_parse_errors(parser_class, data):
+    parser = parser_class()
+    with pytest.raises(ParseError):
+        parser.feed(data)
+        parser.close()
+
+
+@pytest.mark.parametrize("decode", [
+    lambda data: decode_chunks([data]),
+    lambda data: decode_chunks([data + b" " * decoder.EXPAT_BASE64_MAX_SIZE]),
+    lambda data: stream([data]),
+])
+def test_documents_with_a_dtd_are_refused(decode):
+    data = (
+        b'<?xml version="1.0"?><!DOCTYPE x [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;">]>'
+        b"<methodCall><methodName>a.b</methodName><params><param><value><string>&b;</string></value></param>"
+        b"<param><value><base64>QQ==</base64></value></param></params></methodCall>"
+    )
+
+    with pytest.raises(ParseError, match="DTD"):
+        decode(data)
+
+
+def test_method_outcome_keeps_the_fault_as_it_was_sent():
+    error = InvalidData("bad value")
+
+    assert decode_method_outcome(XMLRPCHandler.format_success({"a": [1]})) == ({"a": [1]}, None)
+    assert decode_method_outcome(XMLRPCHandler.format_error(error)) == (None, exception_fault(error))
+    with pytest.raises(InvalidData):
+        decode_method_response(XMLRPCHandler.format_error(error))
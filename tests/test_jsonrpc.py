@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+
+from fastapi import Body, Depends, Header
+from starlette.exceptions import HTTPException
+
+from fastapi_xmlrpc.parser.exceptions import InvalidArguments, InvalidData, MethodNotFound, ParseError, ServerError
+from fastapi_xmlrpc.responses import XMLRPCResponse
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="users", function_name="greet")
+    def greet(name: str = Body(...), greeting: str = Body(...)):
+        return f"{greeting} {name}"
+
+    @router.xml_rpc(namespace="users", function_name="fail")
+    def fail(secret: str = Body(...)):
+        if secret == "fault":
+            raise InvalidArguments("bad value")
+        raise KeyError(f"database password is {secret}")
+
+    return router
+
+
+def request(method: str, params, request_id=1) -> dict:
+    return {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+
+
+@pytest.fixture
+def rpc(serve):
+    return serve(make_router())
+
+
+@pytest.mark.parametrize("params", [["alice", "hello"], {"name": "alice", "greeting": "hello"}])
+def test_positional_and_named_params(rpc, params):
+    response = rpc.jsonrpc(request("users.greet", params))
+
+    assert response.status_code == 200
+    assert response.json() == {"jsonrpc": "2.0", "result": "hello alice", "id": 1}
+
+
+def test_errors_carry_the_xmlrpc_fault_codes(rpc):
+    response = rpc.jsonrpc([
+        request("users.missing", [], 1),
+        request("users.fail", ["fault"], 2),
+        request("users.greet", {"name": "alice", "other": 1}, 3),
+        {"jsonrpc": "1.0", "method": "users.greet", "id": 4},
+    ])
+
+    codes = {item["id"]: item["error"]["code"] for item in response.json()}
+    assert codes == {1: MethodNotFound.code, 2: InvalidArguments.code, 3: InvalidArguments.code, None: InvalidData.code}
+
+
+def test_unexpected_errors_are_not_sent_to_the_client(rpc, caplog):
+    with caplog.at_level(logging.ERROR, logger="fastapi_xmlrpc"):
+        response = rpc.jsonrpc(request("users.fail", ["hunter2"]))
+
+    assert response.json()["error"] == {"code": ServerError.code, "message": repr(ServerError("Internal Server Error"))}
+    assert "hunter2" in caplog.text
+
+
+def test_batches_and_notifications(rpc):
+    response = rpc.jsonrpc([
+        request("users.greet", ["alice", "hi"], "a"),
+        {"jsonrpc": "2.0", "method": "users.greet", "params": ["bob", "hi"]},
+        request("users.greet", ["carol", "hi"], "c"),
+    ])
+
+    assert [item["result"] for item in response.json()] == ["hi alice", "hi carol"]
+
+    response = rpc.jsonrpc({"jsonrpc": "2.0", "method": "users.greet", "params": ["bob", "hi"]})
+    assert response.status_code == 204
+
+
+def test_invalid_json_is_a_parse_error(rpc):
+    response = rpc.client.post("/RPC2", data=b"{", headers={"Content-Type": "application/json-rpc"})
+
+    assert response.json()["error"]["code"] == ParseError.code
+
+
+class Unavailable(Exception):
+    pass
+
+
+def test_errors_are_answered_by_the_exception_handlers_of_the_application(serve):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="jobs", function_name="run")
+    def run(name: str = Body(...)):
+        raise Unavailable(name)
+
+    rpc = serve(router)
+
+    async def unavailable(request, exc):
+        return XMLRPCResponse(InvalidData(f"{exc} is unavailable"))
+
+    rpc.app.add_exception_handler(Unavailable, unavailable)
+
+    response = rpc.jsonrpc(request("jobs.run", ["nightly"]))
+    assert response.json()["error"] == {"code": InvalidData.code, "message": repr(InvalidData("nightly is unavailable"))}
+
+
+def test_cached_methods(serve):
+    router = XmlRpcAPIRouter()
+    calls = []
+
+    @router.xml_rpc(namespace="reports", function_name="get", cache_ttl=60)
+    def get(name: str = Body(...)):
+        calls.append(name)
+        return {"name": name, "rows": [1, 2, 3]}
+
+    rpc = serve(router)
+    cache = router.get_cache("reports", "get")
+
+    for params in (["daily"], {"name": "daily"}, ["daily"]):
+        assert rpc.jsonrpc(request("reports.get", params)).json()["result"] == {"name": "daily", "rows": [1, 2, 3]}
+    assert calls == ["daily"]
+
+    # XML-RPC calls have entries of their own, invalidate drops both
+    assert rpc.call("reports.get", "daily") == {"name": "daily", "rows": [1, 2, 3]}
+    assert calls == ["daily", "daily"]
+    assert cache.stats()["entries"] == 2
+
+    assert cache.invalidate("daily")
+    assert cache.stats()["entries"] == 0
+    rpc.jsonrpc(request("reports.get", ["daily"]))
+    assert calls == ["daily", "daily", "daily"]
+
+
+def check_token(x_token: str = Header(None)) -> str:
+    if x_token not in ("alice", "bob"):
+        raise HTTPException(403, "Forbidden")
+    return x_token
+
+
+def test_single_flight_followers_pass_the_dependencies_first(serve):
+    router = XmlRpcAPIRouter()
+    started = threading.Event()
+    calls = []
+
+    @router.xml_rpc(
+        namespace="reports", function_name="private", single_flight=True, dependencies=[Depends(check_token)]
+    )
+    async def private(name: str = Body(...)):
+        calls.append(name)
+        started.set()
+        await asyncio.sleep(0.2)
+        return f"{name} report"
+
+    rpc = serve(router)
+    results = {}
+
+    def call(name, headers):
+        if name != "alice":
+            started.wait(1)
+        results[name] = rpc.jsonrpc(request("reports.private", ["daily"]), headers=headers).json()
+
+    threads = [
+        threading.Thread(target=call, args=item)
+        for item in (("alice", {"X-Token": "alice"}), ("anonymous", {}), ("bob", {"X-Token": "bob"}))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results["alice"]["result"] == results["bob"]["result"] == "daily report"
+    assert results["anonymous"]["error"] == {"code": ServerError.code, "message": repr(ServerError("Forbidden"))}
+    assert calls == ["daily"]
+    assert router.get_single_flight("reports", "private").stats()["collapsed"] == 1
@@ -0,0 +1,99 @@
+import pytest
+
+from fastapi import Body
+from pydantic import BaseModel
+
+from fastapi_xmlrpc.lazy import LazyArray
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import InvalidData, ParseError
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+class Row(BaseModel):
+    id: int
+    name: str
+
+
+def make_router(seen: list) -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="bulk", function_name="import_rows")
+    async def import_rows(source: str = Body(...), rows: LazyArray[Row] = Body(...)):
+        count = 0
+        async for row in rows:
+            assert isinstance(row, Row)
+            seen.append(row.id)
+            count += 1
+        return f"{source} {count}"
+
+    @router.xml_rpc(namespace="bulk", function_name="first")
+    async def first(source: str = Body(...), rows: LazyArray[Row] = Body(...)):
+        async for row in rows:
+            return row.name
+        return None
+
+    return router
+
+
+def rows(count: int) -> list:
+    return [{"id": index, "name": f"row {index}"} for index in range(count)]
+
+
+def chunks(data: bytes, size: int = 1024):
+    for index in range(0, len(data), size):
+        yield data[index:index + size]
+
+
+def post(rpc, method_name: str, *args, chunked: bool = True):
+    body = XMLRPCHandler.format_call(method_name, args)
+    return rpc.client.post("/RPC2", data=chunks(body) if chunked else body, headers={"Content-Type": "text/xml"})
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_items_are_consumed_in_order(serve, chunked):
+    seen = []
+    rpc = serve(make_router(seen))
+
+    response = post(rpc, "bulk.import_rows", "csv", rows(5000), chunked=chunked)
+    assert decode_method_response(response.content) == "csv 5000"
+    assert seen == list(range(5000))
+
+
+def test_endpoint_may_stop_early(serve):
+    rpc = serve(make_router([]))
+
+    assert decode_method_response(post(rpc, "bulk.first", "csv", rows(5000)).content) == "row 0"
+    assert decode_method_response(post(rpc, "bulk.first", "csv", []).content) is None
+
+
+def test_invalid_items_fail_the_call(serve):
+    seen = []
+    rpc = serve(make_router(seen))
+    items = [*rows(100), {"id": "not a number", "name": "bad"}, *rows(100)]
+
+    with pytest.raises(InvalidData):
+        decode_method_response(post(rpc, "bulk.import_rows", "csv", items).content)
+    # Items before the invalid one were already consumed
+    assert seen == list(range(100))
+
+
+def test_truncated_body_fails_the_call(serve):
+    rpc = serve(make_router([]))
+    body = XMLRPCHandler.format_call("bulk.import_rows", ["csv", rows(5000)])
+
+    response = rpc.client.post("/RPC2", data=chunks(body[:len(body) // 2]), headers={"Content-Type": "text/xml"})
+    with pytest.raises(ParseError):
+        decode_method_response(response.content)
+
+
+def test_multicall_and_jsonrpc_get_the_decoded_list(serve):
+    seen = []
+    rpc = serve(make_router(seen))
+
+    response = post(rpc, "system.multicall", [{"methodName": "bulk.import_rows", "params": ["csv", rows(10)]}])
+    assert decode_method_response(response.content) == [["csv 10"]]
+
+    response = rpc.jsonrpc({"jsonrpc": "2.0", "id": 1, "method": "bulk.import_rows", "params": ["json", rows(10)]})
+    assert response.json()["result"] == "json 10"
+    assert seen == [*range(10), *range(10)]
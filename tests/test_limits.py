@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.deadline import DeadlineExceeded
+from fastapi_xmlrpc.parser.exceptions import ServerError
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+class Tracker:
+    # Most calls seen running at the same time
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+        self.done = threading.Event()
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.running -= 1
+        self.done.set()
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_calls_over_the_queue_are_shed(serve, direct_dispatch):
+    router = XmlRpcAPIRouter()
+    release = threading.Event()
+
+    @router.xml_rpc(namespace="jobs", function_name="run", max_concurrency=1)
+    def run(name: str = Body(...)):
+        release.wait(5)
+        return name
+
+    rpc = serve(router, direct_dispatch=direct_dispatch)
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(rpc.call("jobs.run", "first")))
+    first.start()
+    limit = router.get_limits()[0]
+    while not limit.running:
+        time.sleep(0.001)
+
+    try:
+        with pytest.raises(ServerError, match="overloaded"):
+            rpc.call("jobs.run", "second")
+    finally:
+        release.set()
+    first.join()
+    assert results == ["first"]
+    assert limit.stats()["shed"] == 1
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_timed_out_sync_call_holds_its_slot_until_its_thread_is_done(serve, direct_dispatch):
+    router = XmlRpcAPIRouter()
+    tracker = Tracker()
+
+    @router.xml_rpc(namespace="jobs", function_name="run", max_concurrency=1, timeout=0.05)
+    def run(name: str = Body(...)):
+        with tracker:
+            time.sleep(0.3)
+        return name
+
+    rpc = serve(router, direct_dispatch=direct_dispatch)
+    limit = router.get_limits()[0]
+
+    with pytest.raises(DeadlineExceeded):
+        rpc.call("jobs.run", "first")
+    assert limit.running == 1
+
+    with pytest.raises(ServerError, match="overloaded"):
+        rpc.call("jobs.run", "second")
+
+    assert tracker.done.wait(1)
+    # The release is scheduled on the event loop when the thread is done
+    for _ in range(100):
+        if not limit.running:
+            break
+        time.sleep(0.01)
+    assert limit.running == 0
+    assert tracker.most == 1
+
+
+def test_namespace_limits_apply_to_methods_registered_before_and_after():
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="jobs", function_name="run", max_concurrency=2)
+    def run(name: str = Body(...)):
+        return name
+
+    router.limit_namespace("jobs", 4)
+
+    @router.xml_rpc(namespace="jobs", function_name="stop")
+    def stop(name: str = Body(...)):
+        return name
+
+    # Setting it again replaces the namespace limit, the limit of the method stays
+    limit = router.limit_namespace("jobs", 3)
+    method_limit = router.method_limits["/jobs/run"]
+
+    assert router.method_options["/jobs/run"].limits == (method_limit, limit)
+    assert router.method_options["/jobs/stop"].limits == (limit,)
+    assert (method_limit.max_concurrency, limit.max_concurrency) == (2, 3)
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_namespace_limit_is_shared_by_its_methods(serve, direct_dispatch):
+    router = XmlRpcAPIRouter()
+    router.limit_namespace("jobs", 1)
+    release = threading.Event()
+
+    @router.xml_rpc(namespace="jobs", function_name="run")
+    def run(name: str = Body(...)):
+        release.wait(5)
+        return name
+
+    @router.xml_rpc(namespace="jobs", function_name="stop")
+    def stop(name: str = Body(...)):
+        return name
+
+    rpc = serve(router, direct_dispatch=direct_dispatch)
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(rpc.call("jobs.run", "first")))
+    first.start()
+    limit = router.namespace_limits["jobs"]
+    while not limit.running:
+        time.sleep(0.001)
+
+    try:
+        with pytest.raises(ServerError, match="overloaded"):
+            rpc.call("jobs.stop", "first")
+    finally:
+        release.set()
+    first.join()
+    assert results == ["first"]
+    assert rpc.call("jobs.stop", "first") == "first"
+
+
+def test_namespace_limits_cant_be_set_once_the_middleware_is_added(serve):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="jobs", function_name="run")
+    def run(name: str = Body(...)):
+        return name
+
+    serve(router)
+
+    with pytest.raises(RuntimeError, match="before XMLRPCMiddleware"):
+        router.limit_namespace("jobs", 1)
+    assert router.method_options["/jobs/run"].limits == ()
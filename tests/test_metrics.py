@@ -0,0 +1,55 @@
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.metrics import CONTENT_TYPE, Metrics, UNKNOWN_METHOD
+from fastapi_xmlrpc.parser.exceptions import InvalidArguments, MethodNotFound
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="math", function_name="div", max_concurrency=2)
+    def div(a: int = Body(...), b: int = Body(...)):
+        if b == 0:
+            raise InvalidArguments("division by zero")
+        return a // b
+
+    return router
+
+
+def test_calls_are_measured_per_method(serve):
+    metrics = Metrics()
+    rpc = serve(make_router(), metrics=metrics)
+
+    assert rpc.call("math.div", 6, 3) == 2
+    with pytest.raises(InvalidArguments):
+        rpc.call("math.div", 1, 0)
+    with pytest.raises(MethodNotFound):
+        rpc.call("math.mul", 1, 0)
+
+    div = metrics.methods["math.div"]
+    assert div.latency.count == 2
+    assert div.request_size.count == div.response_size.count == 2
+    assert all(div.phases[phase].count == 2 for phase in ("parse", "dispatch", "serialize"))
+    assert div.faults == {InvalidArguments.code: 1}
+
+    # Unknown methods share one label
+    assert set(metrics.methods) == {"math.div", UNKNOWN_METHOD}
+    assert metrics.methods[UNKNOWN_METHOD].faults == {MethodNotFound.code: 1}
+
+
+def test_metrics_are_served(serve):
+    metrics = Metrics("/internal/metrics")
+    rpc = serve(make_router(), metrics=metrics)
+    rpc.call("math.div", 6, 3)
+
+    response = rpc.client.get("/internal/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith(CONTENT_TYPE)
+
+    text = response.text
+    assert 'xmlrpc_request_duration_seconds_count{method="math.div"} 1' in text
+    assert 'xmlrpc_phase_duration_seconds_count{method="math.div",phase="parse"} 1' in text
+    assert 'xmlrpc_concurrency_running{limit="math.div"} 0' in text
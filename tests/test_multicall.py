@@ -0,0 +1,146 @@
+import asyncio
+import logging
+
+import pytest
+
+from fastapi import Body, Depends, FastAPI, Header
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException
+
+from fastapi_xmlrpc.parser.exceptions import (
+    InvalidArguments,
+    InvalidData,
+    MethodNotFound,
+    ServerError,
+    exception_fault as fault
+)
+from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+from fastapi_xmlrpc.responses import XMLRPCResponse
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+from tests.conftest import RPC
+
+
+def make_router(running: list) -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="math", function_name="double")
+    async def double(value: int = Body(...)):
+        running.append(value)
+        await asyncio.sleep(0.01)
+        most = len(running)
+        running.remove(value)
+        return [value * 2, most]
+
+    @router.xml_rpc(namespace="math", function_name="fail")
+    def fail(secret: str = Body(...)):
+        if secret == "fault":
+            raise InvalidArguments("bad value")
+        raise KeyError(f"database password is {secret}")
+
+    return router
+
+
+def test_entries_are_answered_in_order_with_their_faults(serve):
+    rpc = serve(make_router([]))
+
+    results = rpc.call("system.multicall", [
+        {"methodName": "math.double", "params": [2]},
+        {"methodName": "math.missing", "params": []},
+        {"methodName": "math.fail", "params": ["fault"]},
+        {"methodName": "math.double", "params": ["two"]},
+        {"methodName": "system.multicall", "params": [[]]},
+        "not a struct",
+    ])
+
+    assert results[0][0][0] == 4
+    assert results[1] == fault(MethodNotFound("Method not found"))
+    assert results[2] == fault(InvalidArguments("bad value"))
+    assert results[3]["faultCode"] == InvalidData.code
+    assert results[4]["faultCode"] == InvalidArguments.code
+    assert results[5]["faultCode"] == InvalidArguments.code
+
+
+def test_entries_run_concurrently_up_to_the_limit(serve):
+    rpc = serve(make_router([]), multicall_concurrency=3)
+
+    results = rpc.call("system.multicall", [{"methodName": "math.double", "params": [i]} for i in range(10)])
+
+    assert [value for (value, _), in results] == [i * 2 for i in range(10)]
+    assert max(most for (_, most), in results) == 3
+
+
+def test_unexpected_errors_are_not_sent_to_the_client(serve, caplog):
+    rpc = serve(make_router([]))
+
+    with caplog.at_level(logging.ERROR, logger="fastapi_xmlrpc"):
+        result, = rpc.call("system.multicall", [{"methodName": "math.fail", "params": ["hunter2"]}])
+
+    assert result == fault(ServerError("Internal Server Error"))
+    assert "hunter2" in caplog.text
+
+
+def test_multicall_expects_an_array(serve):
+    rpc = serve(make_router([]))
+
+    with pytest.raises(InvalidArguments):
+        rpc.call("system.multicall", "calls")
+
+
+class Unavailable(Exception):
+    pass
+
+
+def check_token(x_token: str = Header(None)):
+    if x_token != "secret":
+        raise HTTPException(403, "Forbidden")
+
+
+def test_entries_are_answered_by_the_exception_handlers_of_the_application(serve):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="jobs", function_name="run")
+    def run(name: str = Body(...)):
+        raise Unavailable(name)
+
+    @router.xml_rpc(namespace="jobs", function_name="stop", dependencies=[Depends(check_token)])
+    def stop(name: str = Body(...)):
+        return name
+
+    rpc = serve(router)
+
+    async def unavailable(request, exc):
+        if str(exc) == "nightly":
+            return XMLRPCResponse(ServerError(f"{exc} is unavailable"))
+        return JSONResponse({"unavailable": str(exc)})
+
+    rpc.app.add_exception_handler(Unavailable, unavailable)
+
+    results = rpc.call("system.multicall", [
+        {"methodName": "jobs.run", "params": ["nightly"]},
+        {"methodName": "jobs.run", "params": ["hourly"]},
+        {"methodName": "jobs.stop", "params": ["nightly"]},
+    ])
+
+    # The same answers as single calls, the fault of the handler, its JSON response as the result
+    # and the plain text response of http_error_handler as a ServerError
+    assert results == [
+        fault(ServerError("nightly is unavailable")),
+        [{"unavailable": "hourly"}],
+        fault(ServerError("Forbidden")),
+    ]
+
+
+def test_faults_without_a_handler_are_sent_as_they_are():
+    router = make_router([])
+    app = FastAPI()
+    app.add_middleware(XMLRPCMiddleware, router=router)
+    app.include_router(router)
+
+    rpc = RPC(app)
+    try:
+        result, = rpc.call("system.multicall", [{"methodName": "math.fail", "params": ["fault"]}])
+    finally:
+        rpc.close()
+
+    assert result == fault(InvalidArguments("bad value"))
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.offload import OffloadPolicy
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router(namespace: str, offload_policy=None) -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter(offload_policy=offload_policy)
+
+    @router.xml_rpc(namespace=namespace, function_name="echo")
+    def echo(rows: list[str] = Body(...)):
+        return rows
+
+    return router
+
+
+@pytest.fixture
+def policy():
+    policy = OffloadPolicy(threshold=1024)
+    yield policy
+    policy.shutdown()
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_each_method_uses_the_policy_of_its_router(serve, policy, direct_dispatch):
+    rpc = serve(make_router("heavy", policy), make_router("light"), direct_dispatch=direct_dispatch)
+    rows = ["x" * 100] * 100
+
+    assert rpc.call("light.echo", rows, path="/light/echo") == rows
+    assert rpc.call("light.echo", rows) == rows
+    assert policy.offloaded == {"parse": 0, "serialize": 0}
+
+    assert rpc.call("heavy.echo", rows, path="/heavy/echo") == rows
+    assert policy.offloaded == {"parse": 1, "serialize": 1}
+
+    # Parsed before the method is known, the routers don't share a policy
+    assert rpc.call("heavy.echo", rows) == rows
+    assert policy.offloaded == {"parse": 1, "serialize": 2}
+
+
+def test_shared_policy_applies_to_bodies_posted_to_other_paths(serve, policy):
+    rpc = serve(make_router("first", policy), make_router("second", policy))
+    rows = ["x" * 100] * 100
+
+    assert rpc.call("second.echo", rows) == rows
+    assert policy.offloaded == {"parse": 1, "serialize": 1}
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_executor_is_shut_down_with_the_application(serve, use_processes):
+    policy = OffloadPolicy(threshold=1024, use_processes=use_processes)
+    rpc = serve(make_router("heavy", policy))
+    rows = ["x" * 100] * 100
+
+    assert rpc.call("heavy.echo", rows) == rows
+    executor = policy.executor
+    assert executor is not None
+
+    rpc.close()
+    assert policy.executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(len, rows)
+
+
+def test_executors_passed_in_are_left_running(serve):
+    executor = ThreadPoolExecutor(max_workers=1)
+    policy = OffloadPolicy(threshold=1024, executor=executor)
+    rpc = serve(make_router("heavy", policy))
+
+    assert rpc.call("heavy.echo", ["x" * 2000]) == ["x" * 2000]
+    rpc.close()
+
+    assert policy.executor is executor
+    assert executor.submit(len, "abc").result() == 3
+    executor.shutdown()
@@ -0,0 +1,100 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+
+import pytest
+
+from fastapi import Body
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+from fastapi_xmlrpc.parser.exceptions import InvalidData
+from fastapi_xmlrpc.plan import DecodePlan
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+from fastapi_xmlrpc.schemas import XMLRPCBaseModel
+
+
+class Color(Enum):
+    red = "red"
+    green = "green"
+
+
+class Item(XMLRPCBaseModel):
+    id: int
+    tags: list[str] = []
+
+
+class Event(XMLRPCBaseModel):
+    day: date
+    color: Optional[Color] = None
+
+
+def make_router(calls: list) -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="items", function_name="add")
+    def add(count: int = Body(...), ids: list[int] = Body(...), item: Item = Body(...), note: str = Body("")):
+        calls.append((count, ids, item, note))
+        return count
+
+    return router
+
+
+def test_trusted_arguments_match_the_validated_ones(serve):
+    trusted, validated = [], []
+    args = ("5", ["1", 2], {"id": "7", "tags": ["a", 1]}, 3)
+
+    assert serve(make_router(trusted), trusted_clients=True).call("items.add", *args) == 5
+    assert serve(make_router(validated)).call("items.add", *args) == 5
+
+    assert trusted == validated == [(5, [1, 2], Item(id=7, tags=["a", "1"]), "3")]
+
+
+@pytest.mark.parametrize("trusted_clients", [False, True])
+def test_missing_required_argument_is_a_fault(serve, trusted_clients):
+    calls = []
+    rpc = serve(make_router(calls), trusted_clients=trusted_clients)
+
+    with pytest.raises(InvalidData, match="field required"):
+        rpc.call("items.add", 5, [1])
+    assert calls == []
+
+
+@pytest.mark.parametrize("trusted_clients", [False, True])
+def test_unconvertible_argument_is_a_fault(serve, trusted_clients):
+    calls = []
+    rpc = serve(make_router(calls), trusted_clients=trusted_clients)
+
+    with pytest.raises(InvalidData):
+        rpc.call("items.add", "five", [1], {"id": 1})
+    assert calls == []
+
+
+def test_single_argument_missing(serve):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="items", function_name="get")
+    def get(item_id: int = Body(...)):
+        return item_id
+
+    rpc = serve(router, trusted_clients=True)
+
+    assert rpc.call("items.get", "3") == 3
+    with pytest.raises(InvalidData, match="field required"):
+        rpc.call("items.get")
+
+
+def test_scalars_are_converted_by_their_fields():
+    def endpoint(day: date = Body(...), events: list[Event] = Body(...), color: Optional[Color] = Body(None)):
+        pass
+
+    plan = DecodePlan(APIRoute("/", endpoint))
+    values = plan.decode({"day": datetime(2022, 3, 1, 12), "events": [{"day": "2022-03-02", "color": "red"}]})
+
+    assert values["day"] == date(2022, 3, 1) and type(values["day"]) is date
+    assert values["events"][0].day == date(2022, 3, 2)
+    assert values["events"][0].color is Color.red
+    assert values["color"] is None
+
+    with pytest.raises(RequestValidationError):
+        plan.decode({"day": "not a day", "events": []})
@@ -0,0 +1,64 @@
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.profiling import Profiler, token_guard
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="users", function_name="echo")
+    def echo(name: str = Body(...)):
+        return name
+
+    return router
+
+
+def test_admin_path_is_not_served_without_a_guard(serve):
+    profiler = Profiler()
+    rpc = serve(make_router(), profiler=profiler)
+
+    # Left to the application, its 404 handler answers with a fault
+    for method in ("GET", "POST", "DELETE"):
+        response = rpc.client.request(method, "/debug/profile?enabled=1")
+        assert b"MethodNotFound" in response.content or response.status_code in (404, 405)
+    assert not profiler.enabled
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile-Token": "wrong"}])
+def test_admin_path_refuses_requests_the_guard_does_not_allow(serve, headers):
+    profiler = Profiler(guard=token_guard("secret"))
+    rpc = serve(make_router(), profiler=profiler)
+
+    for method in ("GET", "POST", "DELETE"):
+        response = rpc.client.request(method, "/debug/profile?enabled=1", headers=headers)
+        assert response.status_code == 403
+    assert not profiler.enabled
+
+
+def test_admin_path_with_the_token(serve):
+    profiler = Profiler(guard=token_guard("secret"))
+    rpc = serve(make_router(), profiler=profiler)
+    headers = {"X-Profile-Token": "secret"}
+
+    response = rpc.client.post("/debug/profile?enabled=1&method=users.echo&rate=1", headers=headers)
+    assert response.status_code == 200
+    assert profiler.enabled and profiler.sample_rates == {"users.echo": 1.0}
+
+    assert rpc.call("users.echo", "alice") == "alice"
+    assert "server-timing" in rpc.post("users.echo", "alice").headers
+
+    response = rpc.client.get("/debug/profile", headers=headers)
+    assert "== users.echo: 2 sampled calls" in response.text
+
+
+def test_async_guard(serve):
+    async def guard(request):
+        return request.headers.get("X-Admin") == "1"
+
+    rpc = serve(make_router(), profiler=Profiler(guard=guard))
+
+    assert rpc.client.get("/debug/profile").status_code == 403
+    assert rpc.client.get("/debug/profile", headers={"X-Admin": "1"}).status_code == 200
@@ -0,0 +1,169 @@
+import pytest
+
+from fastapi import APIRouter, Body, Depends, FastAPI, Header
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+from fastapi_xmlrpc.middleware import XMLRPCMiddleware
+from fastapi_xmlrpc.parser.exceptions import MethodNotFound, ServerError
+from fastapi_xmlrpc.responses import XMLRPCResponse
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+from tests.conftest import RPC
+
+
+def check_token(x_token: str = Header(None)):
+    if x_token != "secret":
+        raise HTTPException(403, "Forbidden")
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="users", function_name="echo")
+    def echo(name: str = Body(...)):
+        return name
+
+    return router
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_include_router_dependencies_apply(serve, direct_dispatch):
+    rpc = serve(make_router(), dependencies=[Depends(check_token)], direct_dispatch=direct_dispatch)
+
+    assert rpc.post("users.echo", "alice").status_code == 403
+    assert rpc.call("users.echo", "alice", headers={"X-Token": "secret"}) == "alice"
+
+
+def current_user():
+    return "alice"
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_dependency_overrides_apply(serve, direct_dispatch):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="users", function_name="whoami")
+    def whoami(greeting: str = Body(...), user: str = Depends(current_user)):
+        return f"{greeting} {user}"
+
+    rpc = serve(router, direct_dispatch=direct_dispatch)
+    rpc.app.dependency_overrides[current_user] = lambda: "bob"
+
+    assert rpc.call("users.whoami", "hello") == "hello bob"
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_application_exception_handlers_apply(serve, direct_dispatch):
+    class Unavailable(Exception):
+        pass
+
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="users", function_name="fail")
+    def fail(name: str = Body(...)):
+        raise Unavailable(name)
+
+    rpc = serve(router, direct_dispatch=direct_dispatch)
+    rpc.app.add_exception_handler(Unavailable, lambda request, exc: JSONResponse({"unavailable": str(exc)}))
+
+    assert rpc.call("users.fail", "alice") == {"unavailable": "alice"}
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_http_exception_handler_of_the_application(serve, direct_dispatch):
+    rpc = serve(make_router(), dependencies=[Depends(check_token)], direct_dispatch=direct_dispatch)
+
+    async def forbidden(request, exc):
+        return XMLRPCResponse(ServerError(exc.detail))
+
+    rpc.app.add_exception_handler(HTTPException, forbidden)
+
+    with pytest.raises(ServerError, match="Forbidden"):
+        rpc.call("users.echo", "alice")
+
+
+def test_json_dispatch_goes_through_the_inner_middleware():
+    seen = []
+
+    class Recorder:
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            if scope["type"] == "http":
+                seen.append((scope["path"], dict(scope["headers"])[b"content-type"]))
+            await self.app(scope, receive, send)
+
+    router = make_router()
+    app = FastAPI()
+    # Added before XMLRPCMiddleware, so it is between XMLRPCMiddleware and the router of the application
+    app.add_middleware(Recorder)
+    app.add_middleware(XMLRPCMiddleware, router=router)
+    app.include_router(router, prefix="/api")
+
+    rpc = RPC(app)
+    try:
+        assert rpc.call("users.echo", "alice") == "alice"
+    finally:
+        rpc.close()
+
+    assert seen == [("/api/users/echo", b"application/json")]
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_routes_of_other_routers_with_the_same_endpoint_are_not_bound(direct_dispatch):
+    router = make_router()
+    echo = router.routes[0].endpoint
+
+    # The endpoint of users.echo, at a path ending with its path, behind a dependency the method doesn't have
+    legacy = APIRouter(prefix="/legacy", dependencies=[Depends(check_token)])
+    legacy.add_api_route("/users/echo", echo, methods=["POST"])
+
+    app = FastAPI()
+    app.add_middleware(XMLRPCMiddleware, router=router, direct_dispatch=direct_dispatch)
+    app.include_router(legacy)
+    app.include_router(router)
+
+    rpc = RPC(app)
+    try:
+        assert rpc.call("users.echo", "alice") == "alice"
+    finally:
+        rpc.close()
+
+
+@pytest.mark.parametrize("direct_dispatch", [False, True])
+def test_methods_of_routers_the_application_didnt_include_are_not_served(direct_dispatch):
+    included, excluded = make_router(), XmlRpcAPIRouter()
+
+    @excluded.xml_rpc(namespace="admin", function_name="drop")
+    def drop(name: str = Body(...)):
+        return name
+
+    app = FastAPI()
+    app.add_middleware(XMLRPCMiddleware, routers=[included, excluded], direct_dispatch=direct_dispatch)
+    app.include_router(included)
+
+    rpc = RPC(app)
+    try:
+        assert rpc.call("users.echo", "alice") == "alice"
+        with pytest.raises(MethodNotFound):
+            rpc.call("admin.drop", "users")
+    finally:
+        rpc.close()
+
+
+def test_binding_leaves_the_routes_of_the_application_as_they_are(serve):
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="jobs", function_name="run", max_concurrency=1)
+    def run(name: str = Body(...)):
+        return name
+
+    rpc = serve(router)
+    routes = [route for route in rpc.app.routes if isinstance(route, APIRoute)]
+    calls = [(route.dependant, route.dependant.call, route.app) for route in routes]
+
+    assert rpc.call("jobs.run", "nightly") == "nightly"
+    assert [(route.dependant, route.dependant.call, route.app) for route in routes] == calls
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+from pathlib import Path
+
+from pydantic import BaseModel, create_model
+
+from open_api.schema_generator import SchemaGenerator, stable_name
+
+
+class Tag(BaseModel):
+    name: str
+
+
+class Row(BaseModel):
+    id: int
+    tags: list[Tag] = []
+
+
+def names(schema) -> list[str]:
+    return sorted(schema.schema(ref_template="#/components/schemas/{model}")["definitions"])
+
+
+def test_call_schemas_are_memoized():
+    schema = SchemaGenerator()([Row, str], method_name="rows.save")
+
+    assert SchemaGenerator()([Row, str], method_name="rows.save") is schema
+    assert SchemaGenerator()([Row, str], method_name="rows.load") is not schema
+    assert SchemaGenerator()([Row], res=True) is SchemaGenerator()([Row], res=True)
+    assert (tuple([Row, str]), "rows.save", False, False) in SchemaGenerator.CALL_SCHEMAS
+
+
+def test_type_schemas_are_memoized():
+    generator = SchemaGenerator()
+
+    assert generator.create_schemas(Row) is SchemaGenerator().create_schemas(Row)
+    assert generator.create_schemas(list[Tag]) is generator.create_schemas(list[Tag])
+    assert SchemaGenerator.TYPE_SCHEMAS[Row] is generator.create_schemas(Row)
+
+
+def test_models_of_the_same_name_get_their_own_names():
+    first = create_model("Item", __module__="billing.models", id=(int, ...))
+    second = create_model("Item", __module__="stock.models", id=(int, ...))
+    third = create_model("Item", __module__="stock.models", id=(int, ...), name=(str, ...))
+
+    assert len({stable_name("struct", model) for model in (first, second, third)}) == 3
+    assert len({SchemaGenerator().create_schemas(model) for model in (first, second, third)}) == 3
+
+
+def test_names_are_the_same_in_every_process():
+    # Imported by the name pytest gave this module, it is a part of the names
+    script = (
+        "from open_api.schema_generator import SchemaGenerator\n"
+        f"from {__name__} import Row, names\n"
+        "print(' '.join(names(SchemaGenerator()([Row, str], method_name='rows.save'))))\n"
+    )
+    root = Path(__file__).parent.parent
+    # Other hash seeds, names must not depend on the order of sets or on id()
+    for seed in ("1", "2"):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=root,
+            env={"PYTHONHASHSEED": seed, "PYTHONPATH": os.pathsep.join(sys.path)},
+            capture_output=True,
+            check=True,
+            text=True
+        ).stdout
+        assert output.split() == names(SchemaGenerator()([Row, str], method_name="rows.save"))
@@ -0,0 +1,79 @@
+import math
+
+from datetime import datetime
+
+import pytest
+
+from aiohttp_xmlrpc.common import Binary, py2xml
+from lxml import etree
+
+from fastapi_xmlrpc.parser.exceptions import InvalidData, ServerError
+from fastapi_xmlrpc.parser.parser import XMLRPCHandler
+
+
+def element(tag: str, *children) -> etree.Element:
+    node = etree.Element(tag)
+    node.extend(children)
+    return node
+
+
+def lxml_success(value) -> bytes:
+    # How format_success rendered responses before the serializer, through py2xml and lxml
+    params = element("params", element("param", element("value", py2xml(value))))
+    return XMLRPCHandler.build_xml(element("methodResponse", params))
+
+
+def lxml_error(exc: Exception) -> bytes:
+    return XMLRPCHandler.build_xml(element("methodResponse", element("fault", element("value", py2xml(exc)))))
+
+
+VALUES = {
+    "int": 42,
+    "negative int": -7,
+    "large int": 2 ** 40,
+    "int bounds": [-2147483648, -2147483647, 2147483646, 2147483647],
+    "bool": [True, False],
+    "float": 1.5,
+    "small float": 1e-300,
+    "nan": math.nan,
+    "inf": [math.inf, -math.inf],
+    "str": "text",
+    "escaped str": "<a href='x'>&amp; \"b\"</a>\r\n\t",
+    "unicode str": "ünïcödé ✓ 𝄞",
+    "empty str": "",
+    "none": None,
+    "bytes": b"plain bytes",
+    "binary": Binary(b"\x00\x01\xfe\xff" * 100),
+    "empty binary": Binary(b""),
+    "datetime": datetime(2024, 2, 29, 23, 59, 1),
+    "empty array": [],
+    "empty struct": {},
+    "array": [1, "two", 3.0, None, True],
+    "tuple": (1, 2),
+    "struct": {"a": 1, "b": "two", "c": [1, 2]},
+    "non str keys": {1: "one", 2.5: "two and a half"},
+    "nested": {"rows": [{"id": 1, "tags": ["a", "b"], "meta": {}}, {"id": 2, "tags": [], "meta": {"k": [[]]}}]},
+    "deep": [[[[[["leaf"]]]]]],
+}
+
+
+@pytest.mark.parametrize("value", VALUES.values(), ids=VALUES.keys())
+def test_success_matches_lxml(value):
+    assert XMLRPCHandler.format_success(value) == lxml_success(value)
+
+
+@pytest.mark.parametrize("exc", [
+    InvalidData("Invalid data"),
+    ServerError("<&> in a fault"),
+    ValueError("not an XMLRPCError"),
+], ids=repr)
+def test_fault_matches_lxml(exc):
+    assert XMLRPCHandler.format_error(exc) == lxml_error(exc)
+
+
+@pytest.mark.parametrize("value", ["bad \x00 null", "bad \x1f control", {"key": "\x0b"}])
+def test_invalid_characters_are_refused_like_lxml(value):
+    with pytest.raises(ValueError):
+        lxml_success(value)
+    with pytest.raises(ValueError):
+        XMLRPCHandler.format_success(value)
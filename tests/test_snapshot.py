@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from fastapi import Body
+
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+from fastapi_xmlrpc.snapshot import load_snapshot, route_fingerprint, write_snapshot
+
+from tests.conftest import RPC, build_app
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="math", function_name="add")
+    def add(a: int = Body(...), b: int = Body(...)):
+        return a + b
+
+    return router
+
+
+def test_workers_load_the_written_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    written = write_snapshot(path, build_app([make_router()]))
+
+    router = make_router()
+    snapshot = load_snapshot(path, [router])
+    assert snapshot is not None
+    assert snapshot.fingerprint == written.fingerprint
+    assert snapshot.methods == written.methods
+
+    rpc = RPC(build_app([router], snapshot=snapshot))
+    try:
+        assert rpc.call("math.add", 2, 3) == 5
+    finally:
+        rpc.close()
+
+
+@pytest.mark.parametrize("module", ["dispatch.py", "plan.py", "parser/decoder.py"])
+def test_fingerprint_changes_with_the_package_source(monkeypatch, module):
+    routers = [make_router()]
+    fingerprint = route_fingerprint(routers)
+
+    read_bytes = Path.read_bytes
+
+    def edited(path: Path) -> bytes:
+        source = read_bytes(path)
+        return source + b"\n# edited\n" if path.as_posix().endswith(f"fastapi_xmlrpc/{module}") else source
+
+    monkeypatch.setattr(Path, "read_bytes", edited)
+    assert route_fingerprint(routers) != fingerprint
+
+
+def test_stale_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    write_snapshot(path, build_app([make_router()]))
+
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="math", function_name="add")
+    def add(a: int = Body(...), b: int = Body(...), c: int = Body(0)):
+        return a + b + c
+
+    with pytest.warns(RuntimeWarning, match="stale"):
+        assert load_snapshot(path, [router]) is None
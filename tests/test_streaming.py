@@ -0,0 +1,81 @@
+from typing import AsyncIterator, Iterator
+
+import pytest
+
+from fastapi import Body
+from fastapi.responses import JSONResponse
+
+from fastapi_xmlrpc.parser.decoder import decode_method_response
+from fastapi_xmlrpc.parser.exceptions import InvalidArguments
+from fastapi_xmlrpc.routing import XmlRpcAPIRouter
+
+
+class Exhausted(Exception):
+    pass
+
+
+def rows(count: int, fail: bool = False):
+    if fail:
+        raise Exhausted(f"no rows after {count}")
+    if count < 0:
+        raise InvalidArguments("count must not be negative")
+    return [{"id": index, "name": f"row {index}", "tags": ["a", "b"]} for index in range(count)]
+
+
+def make_router() -> XmlRpcAPIRouter:
+    router = XmlRpcAPIRouter()
+
+    @router.xml_rpc(namespace="rows", function_name="stream")
+    def stream(count: int = Body(...), fail: bool = Body(False)) -> Iterator[dict]:
+        yield from rows(count, fail)
+
+    @router.xml_rpc(namespace="rows", function_name="stream_async")
+    async def stream_async(count: int = Body(...), fail: bool = Body(False)) -> AsyncIterator[dict]:
+        for row in rows(count, fail):
+            yield row
+
+    @router.xml_rpc(namespace="rows", function_name="list")
+    def list_rows(count: int = Body(...), fail: bool = Body(False)):
+        return rows(count, fail)
+
+    return router
+
+
+@pytest.fixture
+def rpc(serve):
+    rpc = serve(make_router())
+    rpc.app.add_exception_handler(Exhausted, lambda request, exc: JSONResponse({"exhausted": str(exc)}))
+    return rpc
+
+
+@pytest.mark.parametrize("method_name", ["rows.stream", "rows.stream_async"])
+@pytest.mark.parametrize("count", [0, 1, 5000])
+def test_streamed_result_matches_the_buffered_one(rpc, method_name, count):
+    streamed = rpc.post(method_name, count, False)
+    buffered = rpc.post("rows.list", count, False)
+
+    assert streamed.status_code == buffered.status_code == 200
+    assert streamed.content == buffered.content
+    assert decode_method_response(streamed.content) == rows(count)
+    assert streamed.headers["content-type"] == buffered.headers["content-type"]
+
+
+@pytest.mark.parametrize("method_name", ["rows.stream", "rows.stream_async"])
+@pytest.mark.parametrize("args", [(-1, False), (3, True)])
+def test_errors_before_the_first_item_match_the_buffered_ones(rpc, method_name, args):
+    streamed = rpc.post(method_name, *args)
+    buffered = rpc.post("rows.list", *args)
+
+    assert streamed.status_code == buffered.status_code == 200
+    assert streamed.content == buffered.content
+    assert b"<fault>" in streamed.content or b"exhausted" in streamed.content
+
+
+@pytest.mark.parametrize("method_name", ["rows.stream", "rows.stream_async"])
+def test_streamed_results_in_multicall(rpc, method_name):
+    calls = [{"methodName": method_name, "params": [2, False]}, {"methodName": method_name, "params": [-1, False]}]
+
+    result, fault = rpc.call("system.multicall", calls)
+
+    assert result == [rows(2)]
+    assert fault["faultString"] == repr(InvalidArguments("count must not be negative"))